@@ -6,25 +6,270 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from utils.config import Config # This will import the Config class from the config module
 from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from email.utils import parsedate_to_datetime
 from pytz import timezone  
+from contextlib import contextmanager
+from utils.instrumentation import record_http, record_cache
+from utils.tracing import span, endpoint_template
+from utils.metrics import registry, api_requests, api_duration
+from auth.models import decode_user, decode_user_page, decode_event_page, iter_user_page
+from auth.breaker import breakers, CircuitOpenError
+from auth.singleflight import singleflight
+from auth.query_cache import UserQueryCache
+from auth.idempotency import WriteJournal, send_with_reconcile
+from auth.cassette import install_cassette
+from auth.audit import AuditLog, audited
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import ijson
+import msgspec
 import logging
 import os
+import threading
+import time
 
 # Initialize a session with retry strategy
 # auth/api.py
 
-# Initialize a session with adjusted retry strategy
+# Initialize a session with adjusted retry strategy.
+# 429 is left to _request so every caller sees the Retry-After pause, not just the one that hit it.
 session = requests.Session()
 retry = Retry(
     total=2,  # Reduced total retries
     backoff_factor=0.5,  # Reduced backoff factor
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"]
+    status_forcelist=[500, 502, 503, 504],
+    # POST is never retried blindly; creates go through send_with_reconcile instead
+    allowed_methods=["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE"]
 )
 adapter = HTTPAdapter(max_retries=retry)
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 
+# Writes that must not be replayed by the retry adapter go through a plain session
+plain_session = requests.Session()
+
+# Record or replay all outbound traffic (see auth/cassette.py)
+if Config.HTTP_CASSETTE:
+    install_cassette((session, plain_session), Config.HTTP_CASSETTE, Config.HTTP_CASSETTE_MODE,
+                     latency=Config.HTTP_REPLAY_LATENCY)
+
+# Priority classes for Authentik traffic, lowest value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_BACKGROUND = 2
+
+_priority = contextvars.ContextVar('api_priority', default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def api_priority(priority):
+    """Run the enclosed Authentik calls in the given priority class."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RequestScheduler:
+    """Token bucket shared by every Authentik call in the process.
+
+    A token is always handed to the highest priority class that is waiting, so
+    interactive single-user operations go ahead of bulk jobs, and bulk jobs go
+    ahead of background sync. A 429 pauses the whole bucket for Retry-After.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = [0, 0, 0]
+        self.cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE):
+        with self.cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    ahead = any(self.waiting[p] for p in range(priority))
+                    if now >= self.paused_until and self.tokens >= 1 and not ahead:
+                        self.tokens -= 1
+                        return
+                    if now < self.paused_until:
+                        delay = self.paused_until - now
+                    elif self.tokens < 1:
+                        delay = (1 - self.tokens) / self.rate
+                    else:
+                        delay = 0.05  # A higher priority caller is about to take this token
+                    self.cond.wait(delay)
+            finally:
+                self.waiting[priority] -= 1
+                self.cond.notify_all()
+
+    def pause(self, seconds):
+        with self.cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.cond.notify_all()
+
+
+scheduler = RequestScheduler(Config.AUTHENTIK_RATE_LIMIT, Config.AUTHENTIK_RATE_BURST)
+
+registry.gauge("app_api_scheduler_waiting", "Authentik calls waiting for a rate-limit token by priority.", ("priority",)) \
+    .set_function(lambda: {(name,): scheduler.waiting[priority] for priority, name in
+                           ((PRIORITY_INTERACTIVE, "interactive"), (PRIORITY_BULK, "bulk"), (PRIORITY_BACKGROUND, "background"))})
+
+# How often a rate-limited Authentik call is re-sent after waiting out Retry-After
+RATE_LIMIT_RETRIES = 3
+
+def _retry_after(response, default=1.0):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(dt_timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return default
+
+def _request(method, url, service="authentik", retry=True, **kwargs):
+    """Send a request and record its timing for the perf overlay.
+
+    Every call goes through the dependency's circuit breaker and raises
+    CircuitOpenError without touching the network while it is open. Authentik
+    calls are paced by the shared scheduler in the caller's priority class and
+    re-sent after a 429 once the Retry-After pause has passed. Each call is a
+    tracing span under the current UI action, named by service, method and
+    endpoint template.
+    """
+    endpoint = endpoint_template(url)
+    start = time.perf_counter()
+    status = "error"
+    with span(f"{service} {method} {endpoint}", service=service, method=method, endpoint=endpoint) as call:
+        try:
+            response = _send(call, method, url, service, retry, **kwargs)
+            status = response.status_code
+            body = response.request.body if response.request is not None else None
+            call.set(status=status, bytes_sent=len(body or b''),
+                     bytes_received=int(response.headers.get('Content-Length') or 0))
+            return response
+        finally:
+            api_requests.inc(service, method, endpoint, status)
+            api_duration.observe(time.perf_counter() - start, service, endpoint)
+
+def _send(call, method, url, service, retry, **kwargs):
+    http = session if retry else plain_session
+    breaker = breakers[service]
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{service} is unavailable (circuit open)")
+        if service == "authentik":
+            scheduler.acquire(_priority.get())
+        start = time.perf_counter()
+        status = None
+        try:
+            response = http.request(method, url, **kwargs)
+            status = response.status_code
+            # 429 re-sends here plus 5xx retries made inside the adapter
+            retries = getattr(response.raw, 'retries', None)
+            call.set(retries=attempt + (len(retries.history) if retries else 0))
+        finally:
+            elapsed = time.perf_counter() - start
+            record_http(method, url, status, elapsed)
+            breaker.record(status is not None and status < 500, elapsed)
+        if service != "authentik" or status != 429 or attempt == RATE_LIMIT_RETRIES:
+            return response
+        delay = _retry_after(response)
+        logging.warning(f"Authentik rate limited {method} {url}; pausing all calls for {delay:.1f}s.")
+        response.close()
+        scheduler.pause(delay)
+
+def _get_key(url, headers, params=None):
+    """Single-flight key for an idempotent GET; the token is part of it so results never cross credentials."""
+    return ("GET", url, tuple(sorted((params or {}).items())), headers.get('Authorization'))
+
+# Journal of non-idempotent writes; also deduplicates double submissions
+write_journal = WriteJournal(Config.WRITE_JOURNAL, Config.DUPLICATE_WINDOW)
+
+# Who changed which user, when and with what outcome; every write below is decorated with @audited
+audit_log = AuditLog(Config.AUDIT_DB)
+
+# Recent list_users results by search term, evicted precisely on writes
+user_query_cache = UserQueryCache(Config.USER_QUERY_CACHE_SIZE, Config.USER_QUERY_CACHE_TTL)
+
+# Callbacks run after every write with (user_id, user, deleted); the local store registers one
+user_write_listeners = []
+
+def _user_changed(user_id, user=None, deleted=False):
+    """Called after every write to a user.
+
+    Pass the record Authentik returned, or deleted=True once the user is gone. With
+    neither (a failed or ambiguous write) only cached queries are evicted.
+    """
+    user_query_cache.invalidate_user(pk=user_id, user=user)
+    for listener in user_write_listeners:
+        try:
+            listener(user_id, user, deleted)
+        except Exception as e:
+            logging.error(f"Failed to apply write for user {user_id} to local store: {e}")
+
+# Webhooks that could not be delivered, re-sent once the receiver answers again
+deferred_webhooks = deque(maxlen=500)
+_webhook_lock = threading.Lock()
+
+registry.gauge("app_webhook_queue_depth", "Webhooks deferred until the receiver recovers.") \
+    .set_function(lambda: len(deferred_webhooks))
+
+def _post_webhook(data):
+    """POST one webhook payload. Returns False if it should be deferred and retried later."""
+    WEBHOOK_URL = Config.WEBHOOK_URL
+    headers = {
+        "Content-Type": "application/json"
+    }
+    try:
+        # Sent without the retry adapter so a slow receiver is not notified twice
+        response = _request("POST", WEBHOOK_URL, service="webhook", retry=False, json=data, headers=headers, timeout=10)
+        response.raise_for_status()
+        
+        logging.info("Webhook notification sent successfully.")
+        return True
+    except CircuitOpenError as e:
+        logging.warning(f"Deferring webhook '{data['event']}': {e}")
+        return False
+    except requests.exceptions.HTTPError as http_err:
+        logging.error(f"HTTP error occurred while sending webhook: {http_err}")
+        logging.error(f"Response status code: {response.status_code}")
+        logging.error(f"Response content: {response.text}")
+        # A 4xx means the receiver rejected the payload; retrying will not help
+        return response.status_code < 500
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error sending webhook notification: {e}")
+        print(f"Final Webhook URL: '{WEBHOOK_URL}'")
+        return False
+
+def flush_deferred_webhooks():
+    """Re-send deferred webhooks in order, stopping at the first one that still fails."""
+    if not _webhook_lock.acquire(blocking=False):
+        return  # Another session is flushing and will deliver these too
+    try:
+        while deferred_webhooks:
+            if not _post_webhook(deferred_webhooks[0]):
+                return
+            deferred_webhooks.popleft()
+    finally:
+        _webhook_lock.release()
+
 # This function sends a webhook notification to the webhook url with the user and event type
 def webhook_notification(event_type, username=None, full_name=None, email=None, intro=None, invited_by=None, password=None):
     """
@@ -34,11 +279,8 @@ def webhook_notification(event_type, username=None, full_name=None, email=None,
     Example: webhook_notification(event_type)
     to run with only partial of the optional parameters, use None for the missing parameters:
     webhook_notification(event_type, username, full_name, None, None, invited_by, None)
+    If the receiver is down the notification is deferred and sent with the next one that gets through.
     """
-    WEBHOOK_URL = Config.WEBHOOK_URL
-    headers = {
-        "Content-Type": "application/json"
-    }
     data = {
         "event": event_type,
         "full_name": full_name or '',
@@ -48,20 +290,9 @@ def webhook_notification(event_type, username=None, full_name=None, email=None,
         "invited_by": invited_by or '',
         "password": password or ''
     }
-    logging.debug(f"Preparing to send POST request to {WEBHOOK_URL} with headers: {headers} and data: {data}")
-    try:
-        # Use session.post instead of requests.post to utilize the retry configuration
-        response = requests.post(WEBHOOK_URL, json=data, headers=headers)
-        response.raise_for_status()
-        
-        logging.info("Webhook notification sent successfully.")
-    except requests.exceptions.HTTPError as http_err:
-        logging.error(f"HTTP error occurred while sending webhook: {http_err}")
-        logging.error(f"Response status code: {response.status_code}")
-        logging.error(f"Response content: {response.text}")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error sending webhook notification: {e}")
-        print(f"Final Webhook URL: '{WEBHOOK_URL}'")
+    logging.debug("Preparing to send POST request to %s with data: %s", Config.WEBHOOK_URL, data)
+    deferred_webhooks.append(data)
+    flush_deferred_webhooks()
 
 
 def shorten_url(long_url, url_type, name=None):
@@ -95,7 +326,7 @@ def shorten_url(long_url, url_type, name=None):
 
 
     try:
-        response = requests.post(Config.SHLINK_URL, json=payload, headers=headers, timeout=10)
+        response = _request("POST", Config.SHLINK_URL, service="shlink", retry=False, json=payload, headers=headers, timeout=10)
         response.raise_for_status()
         response_data = response.json()
 
@@ -128,19 +359,34 @@ def generate_secure_passphrase():
     # Generate the passphrase with the random number as the delimiter
     passphrase = xp.generate_xkcdpassword(wordlist, numwords=2, delimiter=delimiter)
     return passphrase
-def list_events_cached(api_url, headers):
-    response = requests.get(f"{api_url}/events", headers=headers)
-    response.raise_for_status()  # Raise an error for bad responses
-    return response.json()
+def iter_events(auth_api_url, headers, page_size=500, filters=None):
+    """Yield Authentik events newest first, one page at a time.
+
+    Stop iterating once the events are old enough and no further pages are
+    requested. filters are passed through as query parameters (e.g. {'action':
+    'login'}). Errors propagate to the caller.
+    """
+    params = {'ordering': '-created', 'page_size': page_size, 'page': 1}
+    if filters:
+        params.update(filters)
+    while True:
+        response = _request("GET", f"{auth_api_url}/events/events/", headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+        page = decode_event_page(response.content)
+        yield from page.results
+        if not page.pagination or not page.pagination.next:
+            return
+        params['page'] = page.pagination.next
 
+@audited(audit_log, 'reset_password', lambda a: (a['user_id'], None))
 def reset_user_password(auth_api_url, headers, user_id, new_password):
     """Reset a user's password using the correct endpoint and data payload."""
     url = f"{auth_api_url}/core/users/{user_id}/set_password/"
     data = {"password": new_password}
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
+        response = _request("POST", url, retry=False, headers=headers, json=data, timeout=10)
         response.raise_for_status()
-        logging.info(f"Password for user {user_id} reset successfully.")
+        logging.info("Password for user %s reset successfully.", user_id)
         return True
     except requests.exceptions.HTTPError as http_err:
         logging.error(f"HTTP error occurred while resetting password for user {user_id}: {http_err}")
@@ -151,9 +397,30 @@ def reset_user_password(auth_api_url, headers, user_id, new_password):
         logging.error(f"Error resetting password for user {user_id}: {e}")
         return False
 
+def find_user_by_username(auth_api_url, headers, username):
+    """Return the user with exactly this username, or None. Request errors propagate."""
+    response = _request("GET", f"{auth_api_url}/core/users/", headers=headers, params={'username': username}, timeout=10)
+    response.raise_for_status()
+    return next((user for user in decode_user_page(response.content).results if user.username == username), None)
+
+@audited(audit_log, 'create_user',
+         lambda a, r: (r[0].pk, r[0].username) if r and r[0] else (None, a['username']),
+         succeeded=lambda r: bool(r and r[0]), detail=lambda a: {"invited_by": a['invited_by']})
 def create_user(username, full_name, email, invited_by=None, intro=None):
-    """Create a new user in Authentik."""
-    
+    """Create a new user in Authentik.
+
+    A repeated submission of the same user within DUPLICATE_WINDOW seconds returns
+    the first one's result instead of creating "username1".
+    """
+    inputs = {"username": username, "name": full_name, "email": email, "invited_by": invited_by, "intro": intro}
+    return write_journal.run(
+        'create_user', inputs,
+        lambda key: _create_user(key, username, full_name, email, invited_by, intro),
+        succeeded=lambda result: result[0] is not None,
+        ref=lambda result: result[0].pk,
+    )
+
+def _create_user(key, username, full_name, email, invited_by=None, intro=None):
     # Generate a temporary password using a secure passphrase
     temp_password = generate_secure_passphrase()
 
@@ -167,12 +434,12 @@ def create_user(username, full_name, email, invited_by=None, intro=None):
     
     while True:
         user_search_url = f"{Config.AUTHENTIK_API_URL}/core/users/?username={username}"
-        response = session.get(user_search_url, headers=headers, timeout=10)
+        response = _request("GET", user_search_url, headers=headers, timeout=10)
         response.raise_for_status()
-        users = response.json().get('results', [])
+        users = decode_user_page(response.content).results
         
         # Explicitly check for exact username match
-        if not any(user['username'] == username for user in users):
+        if not any(user.username == username for user in users):
             break  # Unique username found
         else:
             username = f"{original_username}{counter}"
@@ -197,29 +464,37 @@ def create_user(username, full_name, email, invited_by=None, intro=None):
     # Generate API URL and headers
     user_api_url = f"{Config.AUTHENTIK_API_URL}/core/users/"
 
-    try:
-        # API request to create the user
-        response = requests.post(user_api_url, headers=headers, json=user_data, timeout=10)
+    def send():
+        response = _request("POST", user_api_url, retry=False, headers=headers, json=user_data, timeout=10)
         response.raise_for_status()
-        user = response.json()
+        return decode_user(response.content)
 
-        # Ensure 'user' is a dictionary
-        if not isinstance(user, dict):
-            logging.error("Unexpected response format: user is not a dictionary.")
+    def reconcile():
+        # The username was free a moment ago, so a match with our email is this write
+        existing = find_user_by_username(Config.AUTHENTIK_API_URL, headers, username)
+        return existing if existing is not None and existing.email == email else None
+
+    try:
+        # API request to create the user; ambiguous failures are checked against Authentik before retrying
+        try:
+            user = send_with_reconcile(send, reconcile, attempts=Config.WRITE_RETRIES)
+        except msgspec.DecodeError as e:
+            logging.error(f"Unexpected response format for created user: {e}")
             return None, 'default_pass_issue'
 
-        logging.info(f"User created: {user.get('username')}")
+        logging.info(f"User created: {user.username} (write {key})")
+        _user_changed(user.pk, user)
 
         # Reset the user's password
-        reset_result = reset_user_password(Config.AUTHENTIK_API_URL, headers, user['pk'], temp_password)
+        reset_result = reset_user_password(Config.AUTHENTIK_API_URL, headers, user.pk, temp_password)
         if not reset_result:
-            logging.error(f"Failed to reset the password for user {user.get('username')}. Returning default_pass_issue.")
+            logging.error(f"Failed to reset the password for user {user.username}. Returning default_pass_issue.")
             return user, 'default_pass_issue'
         return user, temp_password  # Return the user and the temp password
     except requests.exceptions.HTTPError as http_err:
         logging.error(f"HTTP error occurred while creating user: {http_err}")
         try:
-            logging.error(f"Response: {response.text}")
+            logging.error(f"Response: {http_err.response.text}")
         except Exception:
             pass
         return None, 'default_pass_issue'
@@ -231,46 +506,82 @@ def create_user(username, full_name, email, invited_by=None, intro=None):
 # List Users Function is needed and works better than the new methos session.get(f"{auth_api_url}/users/", headers=headers, timeout=10)
  # auth/api.py
 
-def list_users(auth_api_url, headers, search_term=None):
-    """List users, optionally filtering by a search term, handling pagination to fetch all users."""
-    try:
-        params = {
-            'page_size': 750  # Adjust based on API limits
-        }
-        if search_term:
-            params['search'] = search_term
-
-        users = []
-        url = f"{auth_api_url}/core/users/"
+def iter_users(auth_api_url, headers, search_term=None, page_size=750, filters=None):
+    """Yield users page by page as each response body streams in.
 
-        while url:
-            response = session.get(url, headers=headers, params=params, timeout=10)
+    Nothing is buffered beyond the record being parsed, so callers can write each
+    user to the local store as it arrives. filters are passed through as Authentik
+    query parameters (e.g. {'type': 'external', 'is_active': 'false'}). Errors
+    propagate to the caller.
+    """
+    params = {
+        'page_size': page_size  # Adjust based on API limits
+    }
+    if search_term:
+        params['search'] = search_term
+    if filters:
+        params.update(filters)
+
+    url = f"{auth_api_url}/core/users/"
+    while url:
+        response = _request("GET", url, headers=headers, params=params, timeout=10, stream=True)
+        try:
             response.raise_for_status()
-            data = response.json()
-            users.extend(data.get('results', []))
-            url = data.get('next')  # Next page URL
+            response.raw.decode_content = True
+            page_info = {}
+            yield from iter_user_page(response.raw, page_info)
+        finally:
+            response.close()
+
+        if page_info.get('url'):
+            # DRF-style absolute URL already carries the query string
+            url, params = page_info['url'], {}
+        elif page_info.get('next'):
+            # Authentik returns the next page number
+            params['page'] = page_info['next']
+        else:
+            url = None
 
-            # After the first request, clear params to avoid sending them again
-            params = {}
+def list_users(auth_api_url, headers, search_term=None):
+    """List users, optionally filtering by a search term, handling pagination to fetch all users.
 
-        logging.info(f"Total users fetched: {len(users)}")
-        return users
-    except requests.exceptions.RequestException as e:
+    Results are cached per search term until their TTL passes or a write touches
+    them. Concurrent identical calls from other sessions share one fetch.
+    """
+    key = _get_key(f"{auth_api_url}/core/users/", headers, {'search': search_term or ''})
+    cached = user_query_cache.get(key)
+    record_cache('list_users', cached is not None)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        # Taken before the request so a write landing meanwhile keeps this result out of the cache
+        generation = user_query_cache.generation
+        return generation, list(iter_users(auth_api_url, headers, search_term))
+    try:
+        generation, users = singleflight.do('list_users', key, fetch)
+    except (requests.exceptions.RequestException, msgspec.DecodeError, ijson.JSONError) as e:
         logging.error(f"Error listing users: {e}")
         return []
+    logging.info(f"Total users fetched: {len(users)}")
+    user_query_cache.put(key, users, generation, term=search_term)
+    return users
        
 def list_users_cached(auth_api_url, headers):
     """List users with caching to reduce API calls."""
-    try:
-        response = session.get(f"{auth_api_url}/core/users/", headers=headers, timeout=10)
-        response.raise_for_status()
-        users = response.json().get('results', [])
-        return users
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error listing users: {e}")
-        return []
+    def fetch():
+        try:
+            response = _request("GET", f"{auth_api_url}/core/users/", headers=headers, timeout=10)
+            response.raise_for_status()
+            return decode_user_page(response.content).results
+        except (requests.exceptions.RequestException, msgspec.DecodeError) as e:
+            logging.error(f"Error listing users: {e}")
+            return []
+    return singleflight.do('list_users_cached', _get_key(f"{auth_api_url}/core/users/", headers), fetch)
 
 
+@audited(audit_log, 'create_invite', lambda a: (None, None), succeeded=lambda r: bool(r and r[0]),
+         detail=lambda a: {"label": a['label'], "expires": a['expires']})
 def create_invite(headers, label, expires=None):
     """
     Create an invitation for a user.
@@ -305,10 +616,27 @@ def create_invite(headers, label, expires=None):
     # Authentik API invitation endpoint
     invite_api_url = f"{Config.AUTHENTIK_API_URL}/stages/invitation/invitations/"
 
-    try:
-        response = requests.post(invite_api_url, headers=headers, json=data, timeout=10)
+    def send():
+        response = _request("POST", invite_api_url, retry=False, headers=headers, json=data, timeout=10)
         response.raise_for_status()
-        response_data = response.json()
+        return response.json()
+
+    def reconcile():
+        response = _request("GET", invite_api_url, headers=headers, params={'name': label}, timeout=10)
+        response.raise_for_status()
+        # Authentik normalises the timestamp, so compare to the minute
+        return next((invite for invite in response.json().get('results', [])
+                     if invite.get('name') == label and str(invite.get('expires', ''))[:16] == expires[:16]), None)
+
+    return write_journal.run(
+        'create_invite', {"label": label, "expires": expires},
+        lambda key: _send_invite(key, label, expires, send, reconcile),
+        succeeded=lambda result: result[0] is not None,
+    )
+
+def _send_invite(key, label, expires, send, reconcile):
+    try:
+        response_data = send_with_reconcile(send, reconcile, attempts=Config.WRITE_RETRIES)
 
         # Get the invite ID and construct the full URL
         invite_id = response_data.get('pk')
@@ -322,74 +650,155 @@ def create_invite(headers, label, expires=None):
         return short_invite_link, expires
 
     except requests.exceptions.HTTPError as http_err:
-        logging.error(f"HTTP error occurred: {http_err}")
+        logging.error(f"HTTP error occurred while creating invite {key}: {http_err}")
         try:
-            logging.info("API Response: %s", response.json())
+            logging.info("API Response: %s", http_err.response.json())
         except Exception:
-            logging.info("API Response: %s", response.text)
+            logging.info("API Response: %s", getattr(http_err.response, 'text', None))
     except Exception as err:
-        logging.error(f"An error occurred: {err}")
-        try:
-            logging.info("API Response: %s", response.text)
-        except Exception:
-            pass
+        logging.error(f"An error occurred while creating invite {key}: {err}")
 
     return None, None
 
 
+@audited(audit_log, 'update_status', lambda a: (a['user_id'], None), succeeded=lambda r: r is not None,
+         detail=lambda a: {"is_active": a['is_active']})
 def update_user_status(auth_api_url, headers, user_id, is_active):
     url = f"{auth_api_url}/core/users/{user_id}/"
     data = {"is_active": is_active}
     try:
-        response = session.patch(url, headers=headers, json=data, timeout=10)
+        response = _request("PATCH", url, headers=headers, json=data, timeout=10)
         response.raise_for_status()
-        logging.info(f"User {user_id} status updated to {'active' if is_active else 'inactive'}.")
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        logging.info("User %s status updated to %s.", user_id, 'active' if is_active else 'inactive')
+        user = decode_user(response.content)
+        _user_changed(user_id, user)
+        return user
+    except (requests.exceptions.RequestException, msgspec.DecodeError) as e:
         logging.error(f"Error updating user status: {e}")
+        # The write may still have been applied
+        _user_changed(user_id)
         return None
 
+@audited(audit_log, 'delete_user', lambda a: (a['user_id'], None))
 def delete_user(auth_api_url, headers, user_id):
     url = f"{auth_api_url}/core/users/{user_id}/"
     try:
-        response = session.delete(url, headers=headers, timeout=10)
+        response = _request("DELETE", url, headers=headers, timeout=10)
+        # A 404 means the user is gone as well
+        _user_changed(user_id, deleted=response.status_code in (204, 404))
         if response.status_code == 204:
-            logging.info(f"User {user_id} deleted successfully.")
+            logging.info("User %s deleted successfully.", user_id)
             return True
         else:
             logging.error(f"Failed to delete user {user_id}. Status Code: {response.status_code}")
             return False
     except requests.exceptions.RequestException as e:
         logging.error(f"Error deleting user: {e}")
+        # The delete may still have been applied
+        _user_changed(user_id)
         return False
 
 
-def update_user_intro(auth_api_url, headers, user_id, intro_text):
+def authentik_reachable(auth_api_url, headers):
+    """Cheap health check: whether Authentik answers a one-user listing without a server error."""
+    try:
+        response = _request("GET", f"{auth_api_url}/core/users/", headers=headers, params={'page_size': 1}, timeout=5)
+        return response.status_code < 500
+    except requests.exceptions.RequestException:
+        return False
+
+def get_user(auth_api_url, headers, user_id):
+    """Fetch a single user record, or None if it cannot be read."""
     url = f"{auth_api_url}/core/users/{user_id}/"
-    data = {"attributes": {"intro": intro_text}}
     try:
-        response = session.patch(url, headers=headers, json=data, timeout=10)
+        response = _request("GET", url, headers=headers, timeout=10)
         response.raise_for_status()
-        logging.info(f"Intro for user {user_id} updated successfully.")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error updating user intro: {e}")
+        return decode_user(response.content)
+    except (requests.exceptions.RequestException, msgspec.DecodeError) as e:
+        logging.error(f"Error fetching user {user_id}: {e}")
         return None
 
-def update_user_invited_by(auth_api_url, headers, user_id, invited_by):
+def update_user_attributes(auth_api_url, headers, user_id, attributes=None, is_active=None, current=None):
+    """Update a user's attributes and/or active state with a single PATCH.
+
+    Authentik replaces the whole attributes dict on PATCH, so the changes are merged
+    into the user's current attributes first. Pass the local snapshot record as
+    current to avoid fetching the user.
+    """
+    data = {}
+    if attributes:
+        if current is None:
+            current = get_user(auth_api_url, headers, user_id)
+            if current is None:
+                return None
+        data['attributes'] = {**current.attributes, **attributes}
+    if is_active is not None:
+        data['is_active'] = is_active
+    if not data:
+        return current
+    changed = sorted(attributes or {}) + (['is_active'] if is_active is not None else [])
+    return update_user_fields(auth_api_url, headers, user_id, data, changed)
+
+@audited(audit_log, 'update_user', lambda a: (a['user_id'], None), succeeded=lambda r: r is not None,
+         detail=lambda a: {"changed": a['changed'] or sorted(a['fields']),
+                           **{key: value for key, value in a['fields'].items() if key != 'attributes'}})
+def update_user_fields(auth_api_url, headers, user_id, fields, changed=None):
+    """PATCH top-level user fields (e.g. type, name, email). Returns the updated User or None."""
     url = f"{auth_api_url}/core/users/{user_id}/"
-    data = {"attributes": {"invited_by": invited_by}}
     try:
-        response = session.patch(url, headers=headers, json=data, timeout=10)
+        response = _request("PATCH", url, headers=headers, json=fields, timeout=10)
         response.raise_for_status()
-        logging.info(f"'Invited By' for user {user_id} updated successfully.")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error updating 'Invited By': {e}")
+        logging.info("User %s updated: %s.", user_id, ', '.join(changed or sorted(fields)))
+        user = decode_user(response.content)
+        _user_changed(user_id, user)
+        return user
+    except (requests.exceptions.RequestException, msgspec.DecodeError) as e:
+        logging.error(f"Error updating user {user_id}: {e}")
+        # The write may still have been applied
+        _user_changed(user_id)
         return None
 
+def update_user_intro(auth_api_url, headers, user_id, intro_text, current=None):
+    return update_user_attributes(auth_api_url, headers, user_id, {"intro": intro_text}, current=current)
+
+def update_user_invited_by(auth_api_url, headers, user_id, invited_by, current=None):
+    return update_user_attributes(auth_api_url, headers, user_id, {"invited_by": invited_by}, current=current)
+
+def stage_user_update(updates, user_id, attributes=None, is_active=None):
+    """Add an edit to a pending {user_id: update} dict so all edits to a user go out in one PATCH."""
+    update = updates.setdefault(user_id, {})
+    if attributes:
+        update.setdefault('attributes', {}).update(attributes)
+    if is_active is not None:
+        update['is_active'] = is_active
+    return updates
+
+def apply_user_updates(auth_api_url, headers, updates, current=None, max_workers=None):
+    """Send staged updates concurrently, one PATCH per user.
+
+    current maps user_id to the local record used for merging attributes.
+    Returns {user_id: updated User or None}.
+    """
+    current = current or {}
+    def run(user_id, update):
+        return user_id, update_user_attributes(
+            auth_api_url, headers, user_id,
+            update.get('attributes'), update.get('is_active'), current.get(user_id)
+        )
+    with ThreadPoolExecutor(max_workers=max_workers or Config.BULK_CONCURRENCY) as pool:
+        # Each worker runs in a copy of the caller's context to keep its priority class and batching
+        futures = [
+            pool.submit(contextvars.copy_context().run, run, user_id, update)
+            for user_id, update in updates.items()
+        ]
+        return dict(future.result() for future in futures)
+
+@audited(audit_log, 'recovery_link', lambda a: (None, a['username']))
 def generate_recovery_link(username):
-    """Generate a recovery link for a user."""
+    """Generate a recovery link for a user; a repeat click within the window returns the same link."""
+    return write_journal.run('recovery_link', {"username": username}, lambda key: _generate_recovery_link(username))
+
+def _generate_recovery_link(username):
     headers = {
         'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
         'Content-Type': 'application/json'
@@ -397,26 +806,27 @@ def generate_recovery_link(username):
     try:
         # First, get the user ID by username
         user_search_url = f"{Config.AUTHENTIK_API_URL}/core/users/?search={username}"
-        response = session.get(user_search_url, headers=headers, timeout=10)
+        response = _request("GET", user_search_url, headers=headers, timeout=10)
         response.raise_for_status()
-        users = response.json().get('results', [])
+        users = decode_user_page(response.content).results
         if not users:
             logging.error(f"No user found with username: {username}")
             return None
-        user_id = users[0]['pk']
+        user_id = users[0].pk
 
         # Now, generate the recovery link using POST
         recovery_api_url = f"{Config.AUTHENTIK_API_URL}/core/users/{user_id}/recovery/"
-        response = requests.post(recovery_api_url, headers=headers, timeout=10)
+        response = _request("POST", recovery_api_url, retry=False, headers=headers, timeout=10)
         response.raise_for_status()
         recovery_link = response.json().get('link')
-        logging.info(f"Recovery link generated for user: {username}")
+        logging.info("Recovery link generated for user: %s", username)
         return recovery_link
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Error generating recovery link for {username}: {e}")
         return None
 
+@audited(audit_log, 'force_password_reset', lambda a: (None, a['username']))
 def force_password_reset(username):
     """Force a password reset for a user."""
     headers = {
@@ -426,17 +836,17 @@ def force_password_reset(username):
     try:
         # First, get the user ID by username
         user_search_url = f"{Config.AUTHENTIK_API_URL}/core/users/?search={username}"
-        response = session.get(user_search_url, headers=headers, timeout=10)
+        response = _request("GET", user_search_url, headers=headers, timeout=10)
         response.raise_for_status()
-        users = response.json().get('results', [])
+        users = decode_user_page(response.content).results
         if not users:
             logging.error(f"No user found with username: {username}")
             return False
-        user_id = users[0]['pk']
+        user_id = users[0].pk
 
         # Now, force the password reset using POST
         reset_api_url = f"{Config.AUTHENTIK_API_URL}/core/users/{user_id}/force_password_reset/"
-        response = requests.post(reset_api_url, headers=headers, timeout=10)
+        response = _request("POST", reset_api_url, retry=False, headers=headers, timeout=10)
         response.raise_for_status()
     except response.json().get('detail'):
         logging.error(f"Error forcing password reset for {username}: {response.json().get('detail')}")
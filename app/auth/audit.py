@@ -0,0 +1,258 @@
+# auth/audit.py
+import atexit
+import contextvars
+import inspect
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+SUCCESS = "success"
+FAILURE = "failure"
+ERROR = "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    actor TEXT NOT NULL,
+    action TEXT NOT NULL,
+    target_pk INTEGER,
+    target TEXT,
+    outcome TEXT NOT NULL,
+    duration_ms REAL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS audit_target_pk ON audit (target_pk, ts);
+CREATE INDEX IF NOT EXISTS audit_target ON audit (target, ts);
+CREATE INDEX IF NOT EXISTS audit_actor ON audit (actor, ts);
+CREATE INDEX IF NOT EXISTS audit_ts ON audit (ts);
+CREATE TRIGGER IF NOT EXISTS audit_no_update BEFORE UPDATE ON audit
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS audit_no_delete BEFORE DELETE ON audit
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+"""
+
+# Queued by flush() to make the writer commit without waiting out the batch interval
+_FLUSH = object()
+
+# Who is acting: set per rerun from the proxy's user header, per CLI run from the OS user
+_actor = contextvars.ContextVar('audit_actor', default='system')
+
+
+def set_actor(actor):
+    _actor.set(actor or 'system')
+
+
+def current_actor():
+    return _actor.get()
+
+
+@contextmanager
+def audit_actor(actor):
+    token = _actor.set(actor)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+class AuditLog:
+    """Append-only SQLite log of every write to Authentik.
+
+    record() only enqueues; a writer thread inserts entries in batches of up to
+    batch_size, one transaction per batch, at least every flush_interval seconds.
+    Triggers reject UPDATE and DELETE. Queries read through their own connection
+    (WAL mode), so they never wait for a batch to commit.
+    """
+
+    def __init__(self, path, batch_size=200, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=10000)
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ready = False
+        # Optional pk -> username lookup so entries name the account even after it is deleted
+        self.resolve_username = None
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        if not self._ready:
+            connection.executescript(_SCHEMA)
+            self._ready = True
+        return connection
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def username_for(self, pk):
+        if pk is None or self.resolve_username is None:
+            return None
+        try:
+            return self.resolve_username(pk)
+        except Exception:
+            return None
+
+    def record(self, action, target_pk=None, target=None, outcome=SUCCESS, duration=None, detail=None, actor=None):
+        if target is None:
+            target = self.username_for(target_pk)
+        entry = (time.time(), actor or _actor.get(), action, target_pk, target, outcome,
+                 round(duration * 1000, 2) if duration is not None else None,
+                 json.dumps(detail, default=str) if detail else None)
+        with self._flushed:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            logging.error("Audit queue full; dropped %s on %s", action, target_pk or target)
+            self._done(1)
+            return
+        if self._thread is None:
+            self._start()
+
+    def _done(self, count):
+        with self._flushed:
+            self._pending -= count
+            self._flushed.notify_all()
+
+    def _run(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _FLUSH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch = [entry for entry in batch if entry is not _FLUSH]
+            if not batch:
+                continue
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO audit (ts, actor, action, target_pk, target, outcome, duration_ms, detail) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            except sqlite3.Error as e:
+                logging.error(f"Failed to write {len(batch)} audit entries: {e}")
+            finally:
+                self._done(len(batch))
+
+    def flush(self, timeout=5.0):
+        """Wait until everything recorded so far is committed."""
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            if self._pending <= 0:
+                return True
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass
+        with self._flushed:
+            while self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def query(self, user=None, pk=None, actor=None, action=None, since=None, until=None, limit=500):
+        """Newest-first entries for a username and/or pk (either matches); times are unix seconds."""
+        self.flush(timeout=1.0)
+        clauses, params = [], []
+        targets = []
+        if user:
+            targets.append("target = ?")
+            params.append(user)
+        if pk is not None:
+            targets.append("target_pk = ?")
+            params.append(int(pk))
+        if targets:
+            clauses.append(f"({' OR '.join(targets)})")
+        if actor:
+            clauses.append("actor = ?")
+            params.append(actor)
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        connection = self._connect()
+        try:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute(
+                f"SELECT * FROM audit {where} ORDER BY ts DESC LIMIT ?", params + [limit]).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            connection.close()
+
+    def distinct(self, column):
+        """Known values of actor or action, for filter pickers."""
+        if column not in ('actor', 'action'):
+            raise ValueError(column)
+        connection = self._connect()
+        try:
+            return [row[0] for row in connection.execute(f"SELECT DISTINCT {column} FROM audit ORDER BY 1")]
+        finally:
+            connection.close()
+
+
+def audited(log, action, target, succeeded=bool, detail=None):
+    """Record every call of the decorated write in log.
+
+    target(arguments) returns (pk, username) from the bound call arguments, either
+    may be None; target can also take the result as a second argument when the pk
+    is only known afterwards. detail(arguments) returns a small JSON-able dict; it
+    must never include passwords. The outcome is success or failure according to
+    succeeded(result), or error if the call raised.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+        wants_result = len(inspect.signature(target).parameters) > 1
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            # Named before the call: after a delete the username can no longer be looked up
+            before = (None, None) if wants_result else target(arguments)
+            before_name = before[1] if before[1] is not None else log.username_for(before[0])
+            start = time.perf_counter()
+            outcome, result = ERROR, None
+            try:
+                result = func(*args, **kwargs)
+                outcome = SUCCESS if succeeded(result) else FAILURE
+                return result
+            finally:
+                try:
+                    pk, name = target(arguments, result) if wants_result else (before[0], before_name)
+                    log.record(action, pk, name, outcome, time.perf_counter() - start,
+                               detail(arguments) if detail else None)
+                except Exception as e:
+                    logging.error(f"Could not audit {action}: {e}")
+        return wrapper
+    return decorate
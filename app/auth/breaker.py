@@ -0,0 +1,119 @@
+# auth/breaker.py
+import logging
+import threading
+import time
+from collections import deque
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling a dependency whose circuit is open.
+
+    It subclasses RequestException so existing error handling degrades the same
+    way it does for a timeout, only without waiting for one.
+    """
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one outbound dependency.
+
+    Errors (exceptions and 5xx) and calls slower than slow_call_seconds count as
+    failures. When at least min_calls were made in the window and the failure rate
+    reaches failure_rate, the circuit opens for cooldown_seconds. After that a single
+    trial call is let through (half-open); it closes the circuit or re-opens it.
+    """
+
+    def __init__(self, name, slow_call_seconds, failure_rate=0.5, min_calls=5,
+                 window_seconds=60, cooldown_seconds=30):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.calls = deque()  # (timestamp, failed)
+        self.lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.calls and self.calls[0][0] < now - self.window_seconds:
+            self.calls.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.trial_in_flight = False
+        logging.warning(f"Circuit for {self.name} opened; failing fast for {self.cooldown_seconds}s.")
+
+    def allow(self):
+        """Return True if a call may be made now."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record(self, ok, seconds):
+        """Record the outcome of a call that allow() let through."""
+        failed = not ok or seconds > self.slow_call_seconds
+        with self.lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self.trial_in_flight = False
+                    self.calls.clear()
+                    logging.info(f"Circuit for {self.name} closed.")
+                return
+            self.calls.append((now, failed))
+            self._trim(now)
+            if self.state == CLOSED and len(self.calls) >= self.min_calls:
+                failures = sum(1 for _, f in self.calls if f)
+                if failures / len(self.calls) >= self.failure_rate:
+                    self._open(now)
+
+    def cooling_down(self):
+        """Whether the circuit is open and its cooldown has not passed yet.
+
+        Unlike allow() this never changes state, so it is safe for deciding whether
+        a trial call is worth making.
+        """
+        with self.lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.cooldown_seconds
+
+    def status(self):
+        with self.lock:
+            now = time.monotonic()
+            self._trim(now)
+            failures = sum(1 for _, f in self.calls if f)
+            return {
+                "dependency": self.name,
+                "state": self.state,
+                "calls": len(self.calls),
+                "failures": failures,
+                "retry_in_s": max(0, round(self.cooldown_seconds - (now - self.opened_at))) if self.state == OPEN else 0,
+            }
+
+
+breakers = {
+    "authentik": CircuitBreaker("authentik", slow_call_seconds=8),
+    "shlink": CircuitBreaker("shlink", slow_call_seconds=3),
+    "webhook": CircuitBreaker("webhook", slow_call_seconds=5),
+}
+
+
+def breaker_status():
+    return [breaker.status() for breaker in breakers.values()]
@@ -0,0 +1,163 @@
+# auth/cassette.py
+import io
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+RECORD = "record"
+REPLAY = "replay"
+
+REDACTED = "REDACTED"
+# Header and JSON body keys whose values never reach a cassette (compared case-insensitively)
+SENSITIVE_HEADERS = {'authorization', 'x-api-key', 'cookie', 'set-cookie', 'x-authentik-signature'}
+SENSITIVE_KEYS = {'password', 'new_password', 'token', 'key', 'api_key', 'secret', 'webhook_secret'}
+# Dropped from recorded responses: bodies are stored decoded, so these would no longer be true
+_HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+# Several adapters may append to the same cassette
+_write_lock = threading.Lock()
+
+
+def redact(value):
+    """A copy of a JSON-like value with sensitive keys masked at any depth."""
+    if isinstance(value, dict):
+        return {key: REDACTED if key.lower() in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def redact_body(body):
+    """A text body with sensitive JSON fields replaced; non-JSON text is kept as is."""
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    try:
+        return json.dumps(redact(json.loads(body)), ensure_ascii=False)
+    except ValueError:
+        return body
+
+
+def redact_headers(headers):
+    return {name: REDACTED if name.lower() in SENSITIVE_HEADERS else value for name, value in headers.items()}
+
+
+def _key(method, url):
+    parts = urlsplit(url)
+    return method.upper(), parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter that records exchanges to a cassette or serves them back.
+
+    A cassette is a JSONL file with one request/response exchange per line, written
+    as each exchange completes. Tokens and passwords are redacted on the way in, and
+    response bodies are stored decoded so they replay byte for byte.
+
+    In record mode requests go out through the wrapped adapter (keeping its retry
+    policy) and only the final response is written. In replay mode nothing touches
+    the network: exchanges are matched on method and path plus query, in recorded
+    order, then on method and path alone; the last match repeats once a key runs
+    out. latency scales the recorded time per exchange (0 replays at full speed,
+    1 with the recorded latency). An unmatched request raises ConnectionError, as
+    an unreachable server would.
+    """
+
+    def __init__(self, path, mode, inner=None, latency=0.0):
+        super().__init__()
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.inner = inner or HTTPAdapter()
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._exact = defaultdict(list)
+        self._by_path = defaultdict(list)
+        self._next = defaultdict(int)
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                exchange = json.loads(line)
+                method, path_query = _key(exchange['method'], exchange['url'])
+                self._exact[(method, path_query)].append(exchange)
+                self._by_path[(method, path_query.split('?', 1)[0])].append(exchange)
+        logging.info(f"Loaded {sum(len(v) for v in self._exact.values())} exchanges from cassette {self.path}")
+
+    def send(self, request, **kwargs):
+        if self.mode == REPLAY:
+            return self._replay(request)
+        return self._record(request, **kwargs)
+
+    def _record(self, request, **kwargs):
+        start = time.perf_counter()
+        response = self.inner.send(request, **kwargs)
+        body = response.content  # Decoded; streaming callers get it back below
+        elapsed = time.perf_counter() - start
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in _HOP_HEADERS}
+        exchange = {
+            "method": request.method,
+            "url": request.url,
+            "request": {"headers": redact_headers(request.headers), "body": redact_body(request.body)},
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": redact_headers(headers),
+            "body": redact_body(body),
+            "elapsed": round(elapsed, 6),
+        }
+        with _write_lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+        return self._build(request, response.status_code, response.reason, headers, body)
+
+    def _replay(self, request):
+        method, path_query = _key(request.method, request.url)
+        with self._lock:
+            for key, table in (((method, path_query), self._exact), ((method, path_query.split('?', 1)[0]), self._by_path)):
+                candidates = table.get(key)
+                if candidates:
+                    cursor = (table is self._exact, key)
+                    index = self._next[cursor]
+                    self._next[cursor] = index + 1
+                    exchange = candidates[min(index, len(candidates) - 1)]
+                    break
+            else:
+                raise requests.exceptions.ConnectionError(
+                    f"No recorded exchange for {method} {path_query} in {self.path}", request=request)
+        if self.latency:
+            time.sleep(exchange['elapsed'] * self.latency)
+        body = (exchange['body'] or '').encode('utf-8')
+        return self._build(request, exchange['status'], exchange['reason'], exchange['headers'], body)
+
+    def _build(self, request, status, reason, headers, body):
+        raw = HTTPResponse(body=io.BytesIO(body), headers={**headers, 'Content-Length': str(len(body))},
+                           status=status, reason=reason, preload_content=False, decode_content=False)
+        return self.build_response(request, raw)
+
+    def close(self):
+        self.inner.close()
+        super().close()
+
+
+def install_cassette(sessions, path, mode, latency=0.0):
+    """Route every request made through sessions via a CassetteAdapter.
+
+    Recording wraps each session's own adapters; replay shares one adapter so all
+    sessions consume the cassette in the order it was recorded.
+    """
+    shared = CassetteAdapter(path, mode, latency=latency) if mode == REPLAY else None
+    for http in sessions:
+        for prefix in ("http://", "https://"):
+            http.mount(prefix, shared or CassetteAdapter(path, mode, inner=http.get_adapter(prefix), latency=latency))
+    logging.warning(f"HTTP cassette {mode} mode: {path}")
@@ -0,0 +1,286 @@
+# auth/events.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from auth.api import iter_events
+from auth.singleflight import singleflight
+from utils.config import Config
+from utils.metrics import registry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    ts REAL NOT NULL,
+    action TEXT NOT NULL,
+    user_pk INTEGER,
+    username TEXT,
+    model TEXT,
+    model_pk TEXT,
+    client_ip TEXT,
+    context TEXT
+);
+CREATE INDEX IF NOT EXISTS events_user_pk ON events (user_pk, ts);
+CREATE INDEX IF NOT EXISTS events_username ON events (username, ts);
+CREATE INDEX IF NOT EXISTS events_action ON events (action, ts);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_model ON events (model, seq);
+CREATE TABLE IF NOT EXISTS login_months (
+    user_pk INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    PRIMARY KEY (user_pk, month)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS login_months_month ON login_months (month);
+CREATE TABLE IF NOT EXISTS cursors (
+    name TEXT PRIMARY KEY,
+    ts REAL,
+    seq INTEGER
+);
+"""
+
+# Months since year 0 (year * 12 + month - 1, UTC), the unit of cohort analytics
+_MONTH = "CAST(strftime('%Y', ts, 'unixepoch') AS INTEGER) * 12 + CAST(strftime('%m', ts, 'unixepoch') AS INTEGER) - 1"
+_LOGIN_MONTHS = (f"INSERT OR IGNORE INTO login_months (user_pk, month) SELECT user_pk, {_MONTH} FROM events "
+                 "WHERE action = 'login' AND user_pk IS NOT NULL AND seq > ?")
+
+_PACK = 100000  # user_pk * _PACK + month fits one integer; month indexes stay below it until year 8333
+
+USER_MODEL = "authentik_core.user"
+MODEL_ACTIONS = ("model_created", "model_updated", "model_deleted")
+
+events_ingested = registry.counter("app_events_ingested_total", "Authentik events added to the local event store.")
+
+
+def _timestamp(created):
+    return datetime.fromisoformat(created).timestamp()
+
+
+def _row(event):
+    """Flatten an Event into an events row; model details get their own columns."""
+    context = dict(event.context)
+    model = context.pop('model', None) or {}
+    return (
+        event.pk,
+        _timestamp(event.created),
+        event.action,
+        event.user.get('pk'),
+        event.user.get('username'),
+        f"{model.get('app')}.{model.get('model_name')}" if model else None,
+        str(model['pk']) if model.get('pk') is not None else None,
+        event.client_ip,
+        json.dumps(context, separators=(',', ':'), default=str) if context else None,
+    )
+
+
+class EventStore:
+    """Local SQLite copy of Authentik's event log.
+
+    Events are appended in the order they happened (seq), with one row per event
+    and indexes by user, action and time. login_months keeps which months each
+    user logged in, updated with every append, for cohort analytics. Named
+    cursors record how far a reader has got: 'ingest' is the newest event fetched
+    from Authentik, 'cdc' the last event applied to the local user directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        if not self._ready:
+            connection.executescript(_SCHEMA)
+            # Stores created before login_months existed are filled in once
+            if not connection.execute("SELECT 1 FROM login_months LIMIT 1").fetchone():
+                with connection:
+                    connection.execute(_LOGIN_MONTHS, (0,))
+            self._ready = True
+        return connection
+
+    def _read(self, sql, params=()):
+        connection = self._connect()
+        try:
+            connection.row_factory = sqlite3.Row
+            return [dict(row) for row in connection.execute(sql, params)]
+        finally:
+            connection.close()
+
+    def cursor(self, name):
+        """(ts, seq) of a named cursor, or None if it was never set."""
+        rows = self._read("SELECT ts, seq FROM cursors WHERE name = ?", (name,))
+        return (rows[0]['ts'], rows[0]['seq']) if rows else None
+
+    def set_cursor(self, name, ts=None, seq=None):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO cursors (name, ts, seq) VALUES (?, ?, ?)", (name, ts, seq))
+        finally:
+            connection.close()
+
+    def append(self, events):
+        """Store events given oldest first, skipping ones already stored; returns how many were new."""
+        rows = [_row(event) for event in events]
+        if not rows:
+            return 0
+        with self._lock:
+            connection = self._connect()
+            try:
+                with connection:
+                    last = connection.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+                    before = connection.total_changes
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO events (id, ts, action, user_pk, username, model, model_pk, "
+                        "client_ip, context) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                    added = connection.total_changes - before
+                    connection.execute(_LOGIN_MONTHS, (last,))
+                    newest = max(row[1] for row in rows)
+                    connection.execute(
+                        "INSERT INTO cursors (name, ts, seq) VALUES ('ingest', ?, (SELECT MAX(seq) FROM events)) "
+                        "ON CONFLICT (name) DO UPDATE SET ts = MAX(ts, excluded.ts), seq = excluded.seq", (newest,))
+            finally:
+                connection.close()
+        events_ingested.inc(amount=added)
+        return added
+
+    def known(self, ids):
+        """Which of these event ids are already stored."""
+        ids = list(ids)
+        if not ids:
+            return set()
+        rows = self._read(f"SELECT id FROM events WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return {row['id'] for row in rows}
+
+    def last_seq(self, until=None):
+        """Newest seq overall, or of the newest event at or before the unix time until."""
+        if until is None:
+            rows = self._read("SELECT MAX(seq) AS seq FROM events")
+        else:
+            rows = self._read("SELECT MAX(seq) AS seq FROM events WHERE ts <= ?", (until,))
+        return rows[0]['seq'] or 0
+
+    def changes(self, after_seq, model=USER_MODEL, limit=5000):
+        """Model events for model stored after after_seq, oldest first."""
+        return self._read(
+            "SELECT seq, ts, action, model_pk FROM events WHERE model = ? AND seq > ? "
+            f"AND action IN ({','.join('?' * len(MODEL_ACTIONS))}) ORDER BY seq LIMIT ?",
+            (model, after_seq, *MODEL_ACTIONS, limit))
+
+    def query(self, username=None, action=None, since=None, until=None, limit=500):
+        """Newest-first events, filtered by username, action and unix time range."""
+        clauses, params = [], []
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._read(
+            f"SELECT ts, action, username, user_pk, model, model_pk, client_ip, context FROM events {where} "
+            "ORDER BY ts DESC LIMIT ?", params + [limit])
+
+    def daily_counts(self, actions, since):
+        """[{'day', 'action', 'events', 'users'}] per local calendar day since the unix time since."""
+        return self._read(
+            "SELECT date(ts, 'unixepoch', 'localtime') AS day, action, COUNT(*) AS events, "
+            "COUNT(DISTINCT user_pk) AS users FROM events "
+            f"WHERE action IN ({','.join('?' * len(actions))}) AND ts >= ? GROUP BY day, action ORDER BY day",
+            (*actions, since))
+
+    def top_users(self, action, since, limit=10):
+        return self._read(
+            "SELECT username, COUNT(*) AS events, MAX(ts) AS last FROM events "
+            "WHERE action = ? AND ts >= ? GROUP BY user_pk ORDER BY events DESC LIMIT ?",
+            (action, since, limit))
+
+    def count_users(self, action, since):
+        """Distinct users with an action since the unix time since."""
+        return self._read("SELECT COUNT(DISTINCT user_pk) AS users FROM events WHERE action = ? AND ts >= ?",
+                          (action, since))[0]['users']
+
+    def login_months(self, since_month=0):
+        """(user_pk, month) for every month from since_month on that each user logged in, as an n x 2 array.
+
+        Pairs come back as one packed string, which parses far faster than a row
+        per pair.
+        """
+        connection = self._connect()
+        try:
+            packed = connection.execute(
+                f"SELECT group_concat(user_pk * {_PACK} + month) FROM login_months WHERE month >= ?",
+                (since_month,)).fetchone()[0]
+        finally:
+            connection.close()
+        values = np.fromstring(packed, dtype=np.int64, sep=',') if packed else np.empty(0, dtype=np.int64)
+        return np.column_stack(np.divmod(values, _PACK))
+
+    def distinct_actions(self):
+        return [row['action'] for row in self._read("SELECT DISTINCT action FROM events ORDER BY 1")]
+
+
+event_store = EventStore(Config.EVENTS_DB)
+_last_ingest = 0.0
+
+
+def ingest_events(auth_api_url, headers, max_age=0.0, backfill_days=None):
+    """Fetch events newer than the ingest cursor into the store; returns how many were added.
+
+    Pages are read newest first and paging stops at the first already-stored
+    event older than the cursor, so a run with nothing new costs one request. The
+    first run goes back backfill_days (EVENTS_BACKFILL_DAYS). Runs within
+    max_age seconds of the last one return 0 without a request, and concurrent
+    callers share one run.
+    """
+    global _last_ingest
+    if max_age and time.monotonic() - _last_ingest < max_age:
+        return 0
+
+    def fetch():
+        global _last_ingest
+        cursor = event_store.cursor('ingest')
+        if cursor and cursor[0] is not None:
+            stop_before = cursor[0]
+        else:
+            days = Config.EVENTS_BACKFILL_DAYS if backfill_days is None else backfill_days
+            stop_before = time.time() - days * 86400
+        page_size = 100 if cursor else 500
+        fresh, page = [], []
+        for event in iter_events(auth_api_url, headers, page_size=page_size):
+            ts = _timestamp(event.created)
+            if ts < stop_before:
+                break
+            page.append(event)
+            if len(page) >= page_size:
+                new = _unseen(page)
+                fresh.extend(new)
+                if len(new) < len(page):
+                    page = []
+                    break
+                page = []
+        fresh.extend(_unseen(page))
+        fresh.reverse()
+        added = event_store.append(fresh)
+        _last_ingest = time.monotonic()
+        if added:
+            logging.info("Stored %d new Authentik events.", added)
+        return added
+
+    return singleflight.do('ingest_events', ('ingest_events', auth_api_url), fetch)
+
+
+def _unseen(events):
+    known = event_store.known(event.pk for event in events)
+    return [event for event in events if event.pk not in known]
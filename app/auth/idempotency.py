@@ -0,0 +1,190 @@
+# auth/idempotency.py
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import requests
+
+
+class _Write:
+    __slots__ = ('key', 'op', 'fingerprint', 'started', 'state', 'result', 'error', 'done')
+
+    def __init__(self, op, fingerprint):
+        self.key = str(uuid.uuid4())
+        self.op = op
+        self.fingerprint = fingerprint
+        self.started = time.monotonic()
+        self.state = 'pending'
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class WriteJournal:
+    """Client-side idempotency for Authentik writes.
+
+    Each write gets a generated key that is appended to the journal file before the
+    request is sent, and again with its outcome. Identical submissions (same
+    operation and inputs) within window_seconds of one that is pending or succeeded
+    are not sent again; they wait for and return the first one's result. Inputs are
+    only stored as a hash, so passwords never reach the journal.
+
+    The file only has to cover the window: it is compacted to the entries still
+    inside it at start-up and every COMPACT_EVERY appends. Keys are not sent to
+    Authentik, so a write a crashed process left pending cannot be matched
+    server-side; start-up logs each one as having an unknown outcome (the audit
+    log shows whether it was attempted) instead of replaying it.
+    """
+
+    COMPACT_EVERY = 1000
+
+    def __init__(self, path, window_seconds):
+        self.path = path
+        self.window_seconds = window_seconds
+        self._recent = {}  # fingerprint -> _Write
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._appended = 0
+        self._recover()
+
+    def _append(self, write, ref=None):
+        line = {"ts": time.time(), "key": write.key, "op": write.op,
+                "fingerprint": write.fingerprint, "state": write.state}
+        if ref is not None:
+            line["ref"] = ref
+        try:
+            with self._file_lock, open(self.path, 'a') as file:
+                file.write(json.dumps(line) + "\n")
+                self._appended += 1
+        except OSError as e:
+            logging.error(f"Failed to write to journal {self.path}: {e}")
+
+    def _read(self):
+        entries = []
+        try:
+            with open(self.path) as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue  # A line cut short by a crash
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _recover(self):
+        """Log writes a previous process started but never finished, then compact the file."""
+        try:
+            last = {}
+            for entry in self._read():
+                last[entry.get('key')] = entry
+        except OSError as e:
+            logging.error(f"Failed to read journal {self.path}: {e}")
+            return
+        for entry in last.values():
+            if entry.get('state') == 'pending':
+                logging.warning(f"Journal {self.path}: {entry.get('op')} write {entry.get('key')} started at "
+                                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.get('ts', 0)))} "
+                                "has no recorded outcome; check Authentik before submitting it again.")
+        self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only the entries still inside the window, or still in flight."""
+        with self._lock:
+            in_flight = {write.key for write in self._recent.values() if not write.done.is_set()}
+        cutoff = time.time() - self.window_seconds
+        with self._file_lock:
+            self._appended = 0
+            try:
+                entries = self._read()
+                kept = [entry for entry in entries if entry.get('ts', 0) >= cutoff or entry.get('key') in in_flight]
+                if len(kept) == len(entries):
+                    return
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w') as file:
+                        file.writelines(json.dumps(entry) + "\n" for entry in kept)
+                    os.replace(tmp_path, self.path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            except OSError as e:
+                logging.error(f"Failed to compact journal {self.path}: {e}")
+
+    def _prune(self, now):
+        for fingerprint in [f for f, w in self._recent.items()
+                            if now - w.started > self.window_seconds and w.done.is_set()]:
+            del self._recent[fingerprint]
+
+    def run(self, op, inputs, fn, succeeded=lambda result: result is not None, ref=None):
+        """Run fn(key) unless an identical write is in flight or succeeded within the window."""
+        fingerprint = hashlib.sha256(json.dumps([op, inputs], sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            prior = self._recent.get(fingerprint)
+            duplicate = (prior is not None and prior.state != 'failed'
+                         and now - prior.started <= self.window_seconds)
+            if not duplicate:
+                write = self._recent[fingerprint] = _Write(op, fingerprint)
+                self._append(write)
+
+        if duplicate:
+            logging.warning(f"Duplicate {op} submission within {self.window_seconds}s; reusing the first result.")
+            prior.done.wait()
+            if prior.error is not None:
+                raise prior.error
+            return prior.result
+
+        try:
+            write.result = fn(write.key)
+            write.state = 'done' if succeeded(write.result) else 'failed'
+            return write.result
+        except Exception as e:
+            write.error = e
+            write.state = 'failed'
+            raise
+        finally:
+            self._append(write, ref(write.result) if ref and write.state == 'done' else None)
+            write.done.set()
+            if self._appended >= self.COMPACT_EVERY:
+                self._compact()
+
+
+def _ambiguous(error):
+    """Whether the server may have applied a write that raised this error."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def send_with_reconcile(send, reconcile, attempts=3, backoff=0.5):
+    """Send a non-idempotent write, checking Authentik before every retry.
+
+    After an ambiguous failure (timeout, dropped connection, 5xx) reconcile() looks
+    for the object the write would have created. If it exists that is the result;
+    otherwise the write is sent again. If reconcile itself fails the original error
+    is raised rather than risking a duplicate.
+    """
+    for attempt in range(attempts):
+        try:
+            return send()
+        except requests.exceptions.RequestException as e:
+            if not _ambiguous(e):
+                raise
+            try:
+                found = reconcile()
+            except requests.exceptions.RequestException as reconcile_error:
+                logging.error(f"Could not reconcile ambiguous write: {reconcile_error}")
+                raise e
+            if found is not None:
+                logging.info("Ambiguous write had been applied; using the existing object.")
+                return found
+            if attempt == attempts - 1:
+                raise
+            logging.warning(f"Write failed ({e}); not applied server-side, retrying.")
+            time.sleep(backoff * 2 ** attempt)
@@ -0,0 +1,133 @@
+# auth/migration.py
+import contextvars
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from auth.api import iter_users, update_user_fields
+
+# User list filters Authentik applies server-side; anything else is checked client-side
+SERVER_FILTERS = {'type', 'is_active', 'is_superuser', 'username', 'email', 'name', 'path'}
+
+
+def parse_assignments(pairs):
+    """Turn ["type=internal", "attributes.flag=true"] into a dict; values are JSON when they parse."""
+    parsed = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep or not key:
+            raise ValueError(f"Expected key=value, got '{pair}'")
+        try:
+            parsed[key] = json.loads(value)
+        except ValueError:
+            parsed[key] = value
+    return parsed
+
+
+def _get(user, key):
+    if key.startswith('attributes.'):
+        return user.attributes.get(key.split('.', 1)[1])
+    return getattr(user, key, None)
+
+
+def _patch_for(user, changes):
+    """The PATCH body that applies changes to user, or {} if it already has those values."""
+    fields = {}
+    attributes = {}
+    for key, value in changes.items():
+        if _get(user, key) == value:
+            continue
+        if key.startswith('attributes.'):
+            attributes[key.split('.', 1)[1]] = value
+        else:
+            fields[key] = value
+    if attributes:
+        # Authentik replaces the whole attributes dict on PATCH
+        fields['attributes'] = {**user.attributes, **attributes}
+    return fields
+
+
+class Checkpoint:
+    """Append-only file of completed pks, so an interrupted migration resumes where it stopped."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as file:
+                self.done = {int(line) for line in file if line.strip()}
+
+    def add(self, pk):
+        if not self.path:
+            return
+        with self._lock:
+            with open(self.path, 'a') as file:
+                file.write(f"{pk}\n")
+            self.done.add(pk)
+
+
+def migrate_users(auth_api_url, headers, where, changes, concurrency=4, checkpoint=None,
+                  dry_run=False, limit=None):
+    """PATCH every user matching where with changes, concurrently and resumably.
+
+    where and changes map field names (or attributes.<key>) to values. Filters
+    Authentik understands are sent as query parameters so only matching users are
+    listed; all conditions are re-checked locally. Every match is listed before the
+    first PATCH: the list is paged by page number, and users that stop matching
+    once changed would otherwise shift later pages past users never seen. Requests
+    go through the shared rate-limited scheduler. Returns a summary dict; with
+    dry_run nothing is written.
+    """
+    server_filters = {
+        key: str(value).lower() if isinstance(value, bool) else value
+        for key, value in where.items() if key in SERVER_FILTERS
+    }
+    checkpoint = Checkpoint(checkpoint)
+    summary = {"dry_run": dry_run, "where": where, "set": changes, "matched": 0, "resumed": 0,
+               "unchanged": 0, "migrated": 0, "failed": [], "current_values": Counter(), "sample": []}
+    lock = threading.Lock()
+    in_flight = threading.BoundedSemaphore(concurrency * 2)
+
+    def patch(user, fields):
+        try:
+            updated = update_user_fields(auth_api_url, headers, user.pk, fields)
+            with lock:
+                if updated is None:
+                    summary['failed'].append(user.pk)
+                else:
+                    summary['migrated'] += 1
+            if updated is not None:
+                checkpoint.add(user.pk)
+        finally:
+            in_flight.release()
+
+    matches = [user for user in iter_users(auth_api_url, headers, filters=server_filters)
+               if all(_get(user, key) == value for key, value in where.items())]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for user in matches:
+            summary['matched'] += 1
+            if user.pk in checkpoint.done:
+                summary['resumed'] += 1
+                continue
+            fields = _patch_for(user, changes)
+            if not fields:
+                summary['unchanged'] += 1
+                continue
+            summary['current_values'][json.dumps({key: _get(user, key) for key in changes}, default=str)] += 1
+            if len(summary['sample']) < 10:
+                summary['sample'].append(user.username)
+            if not dry_run:
+                in_flight.acquire()
+                # Workers keep the caller's priority class
+                pool.submit(contextvars.copy_context().run, patch, user, fields)
+            if limit and summary['matched'] - summary['resumed'] - summary['unchanged'] >= limit:
+                break
+
+    summary['current_values'] = dict(summary['current_values'])
+    logging.info(f"Migration {where} -> {changes}: {summary['migrated']} migrated, "
+                 f"{len(summary['failed'])} failed, {summary['unchanged']} already set, {summary['resumed']} resumed.")
+    return summary
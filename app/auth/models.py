@@ -0,0 +1,161 @@
+# auth/models.py
+import ast
+import json
+import ijson
+import msgspec
+from ijson.common import ObjectBuilder
+
+
+class User(msgspec.Struct, frozen=True, gc=False):
+    """The fields of an Authentik user the app actually uses.
+
+    Decoding straight into this struct skips everything else Authentik returns
+    (groups_obj, avatar, uid, path, ...) without building Python objects for it.
+    Instances are immutable so they can be shared between sessions.
+    """
+    pk: int
+    username: str
+    name: str = ""
+    email: str = ""
+    is_active: bool = True
+    last_login: str | None = None
+    date_joined: str | None = None
+    type: str = "internal"
+    attributes: dict = {}
+
+
+class Pagination(msgspec.Struct, gc=False):
+    next: int = 0
+    count: int = 0
+
+
+class UserPage(msgspec.Struct, gc=False):
+    results: list[User] = []
+    pagination: Pagination | None = None
+    next: str | None = None  # DRF-style absolute URL, if the server sends one
+
+
+class Event(msgspec.Struct, gc=False):
+    """An Authentik event (login, model_updated, ...); user is who acted, context.model what changed."""
+    pk: str
+    action: str
+    created: str
+    user: dict = {}
+    app: str = ""
+    client_ip: str | None = None
+    context: dict = {}
+
+
+class EventPage(msgspec.Struct, gc=False):
+    results: list[Event] = []
+    pagination: Pagination | None = None
+
+
+_user_decoder = msgspec.json.Decoder(User)
+_page_decoder = msgspec.json.Decoder(UserPage)
+_event_page_decoder = msgspec.json.Decoder(EventPage)
+
+
+def decode_user(content):
+    """Decode a single user object from response bytes."""
+    return _user_decoder.decode(content)
+
+
+def decode_user_page(content):
+    """Decode a paginated /core/users/ response from response bytes."""
+    return _page_decoder.decode(content)
+
+
+def decode_event_page(content):
+    """Decode a paginated /events/events/ response from response bytes."""
+    return _event_page_decoder.decode(content)
+
+
+_USER_FIELDS = frozenset(User.__struct_fields__)
+
+
+def iter_user_page(stream, page_info):
+    """Yield User records from a /core/users/ response body while it is still arriving.
+
+    Only the fields of User are built for each item; everything else is skipped at
+    the parser level, so peak memory stays at roughly one item. Pagination details
+    are written into page_info ('next' page number, 'url' for DRF-style links) as
+    they are seen.
+    """
+    builder = None
+    keep = False
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix == 'results.item':
+            if event == 'start_map':
+                builder = ObjectBuilder()
+                builder.event(event, value)
+            elif event == 'map_key':
+                keep = value in _USER_FIELDS
+                if keep:
+                    builder.event(event, value)
+            elif event == 'end_map':
+                builder.event(event, value)
+                yield msgspec.convert(builder.value, User)
+                builder = None
+        elif builder is not None:
+            if keep:
+                builder.event(event, value)
+        elif prefix == 'pagination.next' and event == 'number':
+            page_info['next'] = int(value)
+        elif prefix == 'next' and event == 'string':
+            page_info['url'] = value
+
+
+def user_to_dict(user):
+    return msgspec.structs.asdict(user)
+
+
+LOCAL_DB_COLUMNS = list(User.__struct_fields__)
+
+
+def user_to_row(user):
+    """Flatten a User into a local DB row in LOCAL_DB_COLUMNS order."""
+    return [
+        json.dumps(value, ensure_ascii=False) if field == 'attributes' else value
+        for field, value in zip(LOCAL_DB_COLUMNS, msgspec.structs.astuple(user))
+    ]
+
+
+def _clean(value):
+    # pandas gives NaN for empty CSV cells
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _parse_attributes(value):
+    value = _clean(value)
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        # Older local DB files stored the Python repr of the dict
+        parsed = ast.literal_eval(value)
+        return parsed if isinstance(parsed, dict) else {}
+    except (ValueError, SyntaxError):
+        return {}
+
+
+def user_from_row(row):
+    """Build a User from a local DB row (a dict from DataFrame.to_dict)."""
+    return User(
+        pk=int(row['pk']),
+        username=str(row['username']),
+        name=_clean(row.get('name')) or "",
+        email=_clean(row.get('email')) or "",
+        is_active=bool(_clean(row.get('is_active'))),
+        last_login=_clean(row.get('last_login')),
+        date_joined=_clean(row.get('date_joined')),
+        type=_clean(row.get('type')) or "internal",
+        attributes=_parse_attributes(row.get('attributes')),
+    )
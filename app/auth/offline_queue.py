@@ -0,0 +1,243 @@
+# auth/offline_queue.py
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import requests
+from utils.config import Config
+from utils.metrics import registry
+from auth.audit import audit_actor, current_actor
+from auth.breaker import breakers, CLOSED
+from auth.api import (
+    authentik_reachable,
+    create_user,
+    delete_user,
+    find_user_by_username,
+    get_user,
+    update_user_attributes,
+    webhook_notification,
+    api_priority,
+    PRIORITY_BACKGROUND
+)
+
+PENDING = "pending"
+DONE = "done"
+CONFLICT = "conflict"
+FAILED = "failed"
+
+# Finished operations kept for display after replay
+MAX_FINISHED = 200
+
+
+class _StillDown(Exception):
+    """Authentik became unreachable again during replay."""
+
+
+def _headers():
+    return {
+        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
+        'Content-Type': 'application/json'
+    }
+
+
+class PendingOps:
+    """Durable, ordered queue of writes made while Authentik was unreachable.
+
+    Operations are stored with their inputs in a JSON file (rewritten atomically)
+    and replayed oldest first once Authentik answers a health check again. Replay
+    stops at the first operation that hits the outage, so order is preserved.
+    Operations whose target changed in the meantime (username taken, user deleted
+    or edited) are marked as conflicts for an admin to retry or discard instead
+    of being applied. Passwords are never queued; created users get theirs on replay.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read pending operations from {self.path}: {e}")
+            return []
+
+    def _save(self, ops):
+        finished = [op for op in ops if op['state'] != PENDING]
+        if len(finished) > MAX_FINISHED:
+            drop = {op['id'] for op in finished[:len(finished) - MAX_FINISHED]}
+            ops = [op for op in ops if op['id'] not in drop]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(ops, file)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def enqueue(self, op, args, summary):
+        """Record a write for later replay and return its id."""
+        entry = {
+            "id": str(uuid.uuid4()),
+            "queued_at": time.time(),
+            "op": op,
+            "args": args,
+            "summary": summary,
+            "state": PENDING,
+            "detail": None,
+            "actor": current_actor(),
+        }
+        with self._lock:
+            ops = self._load()
+            ops.append(entry)
+            self._save(ops)
+        logging.info(f"Queued {op} while Authentik is unavailable: {summary}")
+        return entry['id']
+
+    def list(self):
+        with self._lock:
+            return self._load()
+
+    def pending_count(self):
+        return sum(1 for op in self.list() if op['state'] == PENDING)
+
+    def _update(self, op_id, **fields):
+        with self._lock:
+            ops = self._load()
+            for op in ops:
+                if op['id'] == op_id:
+                    op.update(fields)
+            self._save(ops)
+
+    def discard(self, op_id):
+        with self._lock:
+            self._save([op for op in self._load() if op['id'] != op_id])
+
+    def retry(self, op_id):
+        """Re-queue a conflicting or failed operation, overriding the conflict check."""
+        self._update(op_id, state=PENDING, detail=None, force=True)
+
+    def should_queue(self):
+        """Whether new writes must be queued: Authentik is down or earlier writes are still waiting."""
+        return breakers['authentik'].status()['state'] != CLOSED or self.pending_count() > 0
+
+    def replay(self):
+        """Replay pending operations in order. Returns the number applied."""
+        if not self._replay_lock.acquire(blocking=False):
+            return 0  # Another session is replaying
+        applied = 0
+        try:
+            headers = _headers()
+            if not authentik_reachable(Config.AUTHENTIK_API_URL, headers):
+                return 0
+            with api_priority(PRIORITY_BACKGROUND):
+                for op in self.list():
+                    if op['state'] != PENDING:
+                        continue
+                    try:
+                        # Audited as the admin who queued the write
+                        with audit_actor(op.get('actor', 'system')):
+                            state, detail = self._apply(op, headers)
+                    except (_StillDown, requests.exceptions.RequestException) as e:
+                        logging.warning(f"Replay of queued operations paused: {e}")
+                        break
+                    self._update(op['id'], state=state, detail=detail, replayed_at=time.time())
+                    logging.info(f"Replayed queued {op['op']} ({op['summary']}): {state}. {detail or ''}")
+                    applied += state == DONE
+        finally:
+            self._replay_lock.release()
+        return applied
+
+    def replay_in_background(self):
+        """Start a replay thread if there is work and the Authentik circuit is not cooling down.
+
+        Once the cooldown has passed, replay's own health check is the breaker's
+        trial call, so queued writes do not wait for unrelated traffic to close it.
+        """
+        if self._replay_lock.locked() or breakers['authentik'].cooling_down():
+            return
+        if self.pending_count():
+            threading.Thread(target=self.replay, name="pending-ops-replay", daemon=True).start()
+
+    def _outage_or(self, headers, state, detail):
+        if not authentik_reachable(Config.AUTHENTIK_API_URL, headers):
+            raise _StillDown("Authentik is unreachable")
+        return state, detail
+
+    def _apply(self, op, headers):
+        args = op['args']
+        force = op.get('force', False)
+        if op['op'] == 'create_user':
+            if not force and find_user_by_username(Config.AUTHENTIK_API_URL, headers, args['username']) is not None:
+                return CONFLICT, f"Username '{args['username']}' was taken while queued."
+            # With force, create_user picks a unique variant as it does interactively
+            user, temp_password = create_user(args['username'], args['full_name'], args['email'],
+                                              args.get('invited_by'), args.get('intro'))
+            if user is None:
+                return self._outage_or(headers, FAILED, "Authentik rejected the new user.")
+            if Config.WEBHOOK_ENABLED and Config.INDIVIDUAL_WEBHOOKS.get("user_created", False):
+                webhook_notification("user_created", user.username, args['full_name'], args['email'],
+                                     args.get('intro'), args.get('invited_by'), temp_password)
+                return DONE, f"Created '{user.username}'; temporary password sent by webhook."
+            return DONE, f"Created '{user.username}'; use Reset User Password to issue credentials."
+
+        if op['op'] == 'update_user':
+            user_id = args['user_id']
+            live = get_user(Config.AUTHENTIK_API_URL, headers, user_id)
+            if live is None:
+                return self._outage_or(headers, CONFLICT, f"User {user_id} no longer exists.")
+            if not force:
+                changed = _changed_since_queued(live, args)
+                if changed:
+                    return CONFLICT, f"Changed in Authentik while queued: {', '.join(changed)}."
+            updated = update_user_attributes(Config.AUTHENTIK_API_URL, headers, user_id,
+                                             args.get('attributes'), args.get('is_active'), current=live)
+            if updated is None:
+                return self._outage_or(headers, FAILED, f"Update of user {user_id} failed.")
+            return DONE, None
+
+        if op['op'] == 'delete_user':
+            user_id = args['user_id']
+            if delete_user(Config.AUTHENTIK_API_URL, headers, user_id):
+                return DONE, None
+            state, detail = self._outage_or(headers, FAILED, f"Delete of user {user_id} failed.")
+            if get_user(Config.AUTHENTIK_API_URL, headers, user_id) is None:
+                return DONE, "Already deleted."
+            return state, detail
+
+        return FAILED, f"Unknown operation {op['op']}."
+
+
+def queued_update_args(user_id, update, current):
+    """Arguments for a queued update, remembering the values it overwrites for conflict checks."""
+    base = {}
+    if current is not None:
+        if 'is_active' in update:
+            base['is_active'] = current.is_active
+        base['attributes'] = {key: current.attributes.get(key) for key in update.get('attributes', {})}
+    return {"user_id": user_id, **update, "base": base}
+
+
+def _changed_since_queued(live, args):
+    """Fields that someone else changed in Authentik after the update was queued."""
+    base = args.get('base', {})
+    changed = []
+    if 'is_active' in base and live.is_active not in (base['is_active'], args.get('is_active')):
+        changed.append('is_active')
+    for key, value in base.get('attributes', {}).items():
+        if live.attributes.get(key) not in (value, args['attributes'].get(key)):
+            changed.append(key)
+    return changed
+
+
+pending_ops = PendingOps(Config.PENDING_OPS)
+registry.gauge("app_pending_ops_depth", "Writes queued while Authentik is unavailable.").set_function(pending_ops.pending_count)
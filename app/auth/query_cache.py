@@ -0,0 +1,82 @@
+# auth/query_cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('term', 'pks', 'value', 'expires')
+
+    def __init__(self, term, value, expires):
+        self.term = (term or '').lower()
+        self.pks = frozenset(user.pk for user in value)
+        self.value = value
+        self.expires = expires
+
+
+def _matches(term, user):
+    """Whether a user could appear in the results for term (mirrors Authentik's search fields)."""
+    if not term:
+        return True
+    fields = (user.username, user.name, user.email, json.dumps(user.attributes, ensure_ascii=False))
+    return any(term in (field or '').lower() for field in fields)
+
+
+class UserQueryCache:
+    """Bounded LRU + TTL cache of list_users results, invalidated on writes.
+
+    Entries remember the pks they contain so a write evicts only the queries it
+    can affect: any result holding the user, plus any query whose term the new
+    or updated user now matches. The generation counter lets a fetch that raced
+    with a write skip storing its possibly stale result.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key, value, generation, term=None):
+        with self._lock:
+            if generation != self.generation or self.maxsize <= 0:
+                return
+            self._entries[key] = _Entry(term, value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, pk=None, user=None):
+        """Evict every cached query a write to this user can affect."""
+        if user is not None:
+            pk = user.pk
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if pk in entry.pks or (user is not None and _matches(entry.term, user))
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -3,12 +3,12 @@ import streamlit as st
 
 def initialize_session_state():
     """
-    Ensure session state initialization for user_list, selected_users, operation_selection,
+    Ensure session state initialization for user_query, selected_users, operation_selection,
     and any additional session state variables.
     """
-    # Initialize user_list if it doesn't exist
-    if 'user_list' not in st.session_state:
-        st.session_state['user_list'] = []
+    # Initialize user_query if it doesn't exist; user records live in the shared directory snapshot
+    if 'user_query' not in st.session_state:
+        st.session_state['user_query'] = None
 
     # Initialize selected_users if it doesn't exist
     if 'selected_users' not in st.session_state:
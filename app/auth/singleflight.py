@@ -0,0 +1,66 @@
+# auth/singleflight.py
+import threading
+from utils.instrumentation import record_cache
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce identical idempotent calls made concurrently by different sessions.
+
+    The first caller for a key runs the function; callers arriving while it is in
+    flight wait for it and get the same result (or exception). Results are shared,
+    so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {}  # name -> {'calls': int, 'coalesced': int}
+
+    def do(self, name, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            counts = self.stats.setdefault(name, {'calls': 0, 'coalesced': 0})
+            counts['calls'] += 1
+            if not leader:
+                counts['coalesced'] += 1
+        record_cache(f"coalesce:{name}", not leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def rates(self):
+        """Per-name call counts and the share of calls that were coalesced."""
+        with self._lock:
+            return [
+                {"call": name, **counts, "rate": round(counts['coalesced'] / counts['calls'], 3)}
+                for name, counts in self.stats.items()
+            ]
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,408 @@
+# app/cli.py
+"""Headless admin CLI built on auth/api.py.
+
+Run from the app directory, e.g.:
+
+    python -m cli sync
+    python -m cli events --apply --follow 10
+    python -m cli lifecycle --deactivate-days 365 --delete-days 90 --dry-run
+    python -m cli search alice --json
+    python -m cli status --deactivate --pk 12 15 --dry-run
+    python -m cli migrate --where type=external --set type=internal --checkpoint migrate.pks
+
+Streamlit is never imported, so commands start quickly and can run from cron.
+"""
+import argparse
+import contextvars
+import csv
+import getpass
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pytz import timezone
+from utils.config import Config
+from auth.audit import set_actor
+from auth.api import (
+    api_priority,
+    apply_user_updates,
+    create_invite,
+    create_user,
+    generate_secure_passphrase,
+    get_user,
+    iter_users,
+    reset_user_password,
+    scheduler,
+    stage_user_update,
+    PRIORITY_BULK
+)
+from auth.migration import migrate_users, parse_assignments
+from auth.models import user_to_dict
+
+
+def _headers():
+    return {
+        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
+        'Content-Type': 'application/json'
+    }
+
+
+def _emit(args, payload, lines):
+    """Print payload as JSON with --json, otherwise the human-readable lines."""
+    if args.json:
+        json.dump(payload, sys.stdout, indent=2, default=str, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        for line in lines:
+            print(line)
+
+
+def _read_records(path):
+    """Rows from a JSON list or a CSV file with a header."""
+    with open(path, newline='') as file:
+        if path.endswith('.json'):
+            return json.load(file)
+        return list(csv.DictReader(file))
+
+
+def _select_users(args):
+    """Users picked by --pk, --search or --file (pk or username column)."""
+    headers = _headers()
+    if args.pk:
+        users = [get_user(Config.AUTHENTIK_API_URL, headers, pk) for pk in args.pk]
+        missing = [pk for pk, user in zip(args.pk, users) if user is None]
+        if missing:
+            logging.warning(f"Skipping users that could not be read: {missing}")
+        return [user for user in users if user is not None]
+    if args.file:
+        wanted = _read_records(args.file)
+        pks = {int(row['pk']) for row in wanted if row.get('pk')}
+        usernames = {row['username'] for row in wanted if row.get('username') and not row.get('pk')}
+        return [user for user in iter_users(Config.AUTHENTIK_API_URL, headers)
+                if user.pk in pks or user.username in usernames]
+    return list(iter_users(Config.AUTHENTIK_API_URL, headers, args.search))
+
+
+def _add_selection(parser):
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--pk', type=int, nargs='+', help="User pks")
+    group.add_argument('--search', help="Authentik search term (username, name, email)")
+    group.add_argument('--file', help="JSON or CSV file with a pk or username column")
+
+
+def _run_concurrently(fn, items, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Workers keep the caller's priority class and audit actor
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def cmd_sync(args):
+    from utils.helpers import sync_LOCAL_DB
+    started = time.perf_counter()
+    count = sync_LOCAL_DB(iter_users(Config.AUTHENTIK_API_URL, _headers()))
+    seconds = round(time.perf_counter() - started, 2)
+    _emit(args, {"users": count, "path": Config.LOCAL_DB, "seconds": seconds},
+          [f"Synced {count} users to {Config.LOCAL_DB} in {seconds}s."])
+
+
+def cmd_events(args):
+    from auth.events import event_store, ingest_events
+    from utils.directory import apply_model_events
+    headers = _headers()
+    while True:
+        started = time.perf_counter()
+        if args.apply:
+            added_before = event_store.last_seq()
+            changed = apply_model_events(Config.AUTHENTIK_API_URL, headers)
+            added = event_store.last_seq() - added_before
+        else:
+            changed, added = None, ingest_events(Config.AUTHENTIK_API_URL, headers, backfill_days=args.days)
+        seconds = round(time.perf_counter() - started, 2)
+        _emit(args, {"events": added, "users_changed": changed, "path": Config.EVENTS_DB, "seconds": seconds},
+              [f"Stored {added} new events in {Config.EVENTS_DB}"
+               + (f" and applied {changed} user changes to {Config.LOCAL_DB}" if args.apply else "")
+               + f" in {seconds}s."])
+        if not args.follow:
+            return
+        time.sleep(args.follow)
+
+
+def cmd_search(args):
+    if args.local:
+        from utils.helpers import search_LOCAL_DB
+        rows = search_LOCAL_DB(args.term).to_dict(orient='records')
+    else:
+        rows = [user_to_dict(user) for user in iter_users(Config.AUTHENTIK_API_URL, _headers(), args.term)]
+    _emit(args, rows, [
+        f"{row['pk']:>6}  {row['username']:<24} {row.get('email') or '':<32} "
+        f"{'active' if row.get('is_active') else 'inactive'}"
+        for row in rows
+    ] + [f"{len(rows)} users."])
+
+
+def cmd_status(args):
+    is_active = args.activate
+    users = [user for user in _select_users(args) if user.is_active != is_active]
+    label = "activate" if is_active else "deactivate"
+    if args.dry_run:
+        _emit(args, {"dry_run": True, "action": label, "users": [user.username for user in users]},
+              [f"Would {label} {user.username} ({user.pk})" for user in users] + [f"{len(users)} users."])
+        return
+    updates = {}
+    for user in users:
+        stage_user_update(updates, user.pk, is_active=is_active)
+    results = apply_user_updates(Config.AUTHENTIK_API_URL, _headers(), updates,
+                                 {user.pk: user for user in users}, max_workers=args.concurrency)
+    failed = [pk for pk, result in results.items() if result is None]
+    _emit(args, {"action": label, "updated": len(results) - len(failed), "failed": failed},
+          [f"{label.title()}d {len(results) - len(failed)} users." + (f" Failed: {failed}" if failed else "")])
+    return 1 if failed else 0
+
+
+def cmd_reset(args):
+    users = _select_users(args)
+    if args.dry_run:
+        _emit(args, {"dry_run": True, "users": [user.username for user in users]},
+              [f"Would reset the password of {user.username} ({user.pk})" for user in users])
+        return
+    headers = _headers()
+
+    def reset(user):
+        password = generate_secure_passphrase()
+        ok = reset_user_password(Config.AUTHENTIK_API_URL, headers, user.pk, password)
+        return {"username": user.username, "pk": user.pk, "password": password if ok else None}
+
+    results = _run_concurrently(reset, users, args.concurrency)
+    failed = [r['username'] for r in results if r['password'] is None]
+    _emit(args, results, [f"{r['username']}: {r['password'] or 'FAILED'}" for r in results])
+    return 1 if failed else 0
+
+
+def cmd_invite(args):
+    expires = (datetime.now(timezone('US/Eastern')) + timedelta(hours=args.hours)).isoformat()
+    labels = [f"{args.label}-{i + 1}" for i in range(args.count)] if args.count > 1 else [args.label]
+    if args.dry_run:
+        _emit(args, {"dry_run": True, "labels": labels, "expires": expires},
+              [f"Would create invite {label} expiring {expires}" for label in labels])
+        return
+    headers = _headers()
+    results = _run_concurrently(
+        lambda label: dict(zip(("label", "link", "expires"), (label, *create_invite(headers, label, expires)))),
+        labels, args.concurrency)
+    _emit(args, results, [f"{r['label']}: {r['link'] or 'FAILED'}" for r in results])
+    return 1 if any(r['link'] is None for r in results) else 0
+
+
+def cmd_export(args):
+    users = [user_to_dict(user) for user in iter_users(Config.AUTHENTIK_API_URL, _headers(), args.search)]
+    if args.output.endswith('.json'):
+        with open(args.output, 'w') as file:
+            json.dump(users, file, indent=2, default=str, ensure_ascii=False)
+    else:
+        from utils.helpers import users_to_frame
+        users_to_frame(users).to_csv(args.output, index=False)
+    _emit(args, {"users": len(users), "path": args.output}, [f"Exported {len(users)} users to {args.output}."])
+
+
+def cmd_import(args):
+    """Create users from a file with username, name (or first_name/last_name), email, invited_by, intro.
+
+    Rows without an email are not created and are reported as failures; no address is made up for them.
+    """
+    rows = _read_records(args.file)
+    planned, rejected = [], []
+    for row in rows:
+        name = row.get('name') or " ".join(p.strip() for p in (row.get('first_name'), row.get('last_name')) if p)
+        username = row.get('username')
+        if not username:
+            logging.warning(f"Skipping row without a username: {row}")
+            continue
+        if not (row.get('email') or '').strip():
+            rejected.append({"requested": username, "username": None, "pk": None, "password": None,
+                             "error": "no email"})
+            continue
+        planned.append({
+            "username": username,
+            "full_name": name,
+            "email": row['email'].strip(),
+            "invited_by": row.get('invited_by') or None,
+            "intro": row.get('intro') or None,
+        })
+    if args.dry_run:
+        _emit(args, {"dry_run": True, "users": planned, "failed": rejected},
+              [f"Would create {p['username']} <{p['email']}>" for p in planned]
+              + [f"{r['requested']}: FAILED ({r['error']})" for r in rejected] + [f"{len(planned)} users."])
+        return 1 if rejected else 0
+
+    def create(p):
+        user, password = create_user(p['username'], p['full_name'], p['email'], p['invited_by'], p['intro'])
+        return {"requested": p['username'], "username": user.username if user else None,
+                "pk": user.pk if user else None, "password": password if user else None}
+
+    results = _run_concurrently(create, planned, args.concurrency) + rejected
+    _emit(args, results, [f"{r['requested']}: {r['username'] or 'FAILED'} {r['password'] or r.get('error') or ''}"
+                          for r in results])
+    return 1 if any(r['username'] is None for r in results) else 0
+
+
+def cmd_migrate(args):
+    try:
+        where = parse_assignments(args.where)
+        changes = parse_assignments(args.set)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    if not changes:
+        sys.exit("error: nothing to --set")
+    summary = migrate_users(Config.AUTHENTIK_API_URL, _headers(), where, changes,
+                            concurrency=args.concurrency, checkpoint=args.checkpoint,
+                            dry_run=args.dry_run, limit=args.limit)
+    verb = "Would migrate" if args.dry_run else "Migrated"
+    count = summary['matched'] - summary['resumed'] - summary['unchanged'] if args.dry_run else summary['migrated']
+    lines = [
+        f"{summary['matched']} users match {where}.",
+        f"{verb} {count}; {summary['unchanged']} already set; {summary['resumed']} done in an earlier run.",
+    ]
+    lines += [f"  {n:>6} currently {values}" for values, n in summary['current_values'].items()]
+    if summary['sample']:
+        lines.append(f"  e.g. {', '.join(summary['sample'])}")
+    if summary['failed']:
+        lines.append(f"Failed: {summary['failed']} (re-run with the same --checkpoint to retry)")
+    _emit(args, summary, lines)
+    return 1 if summary['failed'] else 0
+
+
+def cmd_convert_type(args):
+    args.where = [f"type={args.from_type}"]
+    args.set = [f"type={args.to_type}"]
+    return cmd_migrate(args)
+
+
+def cmd_lifecycle(args):
+    from utils.lifecycle import LifecyclePolicy, run_policy
+    policy = LifecyclePolicy(
+        Config.LIFECYCLE_DEACTIVATE_DAYS if args.deactivate_days is None else args.deactivate_days,
+        Config.LIFECYCLE_DELETE_DAYS if args.delete_days is None else args.delete_days,
+        Config.LIFECYCLE_EXEMPT + (args.exempt or []))
+    if not policy.enabled:
+        sys.exit("error: set --deactivate-days and/or --delete-days (or LIFECYCLE_DEACTIVATE_DAYS/LIFECYCLE_DELETE_DAYS)")
+    report = run_policy(policy, Config.AUTHENTIK_API_URL, _headers(), dry_run=args.dry_run,
+                        max_actions=args.max, trigger="cli")
+    if report is None:
+        sys.exit("error: another lifecycle run is in progress")
+    verb = "Would" if args.dry_run else "Did"
+    lines = [f"{verb} deactivate {len(report['deactivated'])} and delete {len(report['deleted'])} "
+             f"of {report['planned']['deactivate']} + {report['planned']['delete']} due; "
+             f"{report['deferred']} deferred to the next run."]
+    lines += [f"  deactivate {name}" for name in report['deactivated']]
+    lines += [f"  delete {name}" for name in report['deleted']]
+    lines += [f"  skipped {item['username']} ({item['stage']}): {item['reason']}" for item in report['skipped']]
+    lines += [f"  FAILED {item['username']} ({item['stage']}): {item['reason']}" for item in report['failed']]
+    _emit(args, report, lines)
+    return 1 if report['failed'] else 0
+
+
+def _common_options(parser, defaults=True):
+    """Options accepted both before and after the subcommand."""
+    default = (lambda value: value) if defaults else (lambda value: argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', default=default(False), help="Machine-readable output")
+    parser.add_argument('--concurrency', type=int, default=default(Config.BULK_CONCURRENCY),
+                        help="Parallel requests for bulk commands (default: BULK_CONCURRENCY)")
+    parser.add_argument('--rate', type=float, default=default(None),
+                        help="Max Authentik requests per second (default: AUTHENTIK_RATE_LIMIT)")
+    parser.add_argument('--dry-run', action='store_true', default=default(False),
+                        help="Show what would change without writing")
+    parser.add_argument('-v', '--verbose', action='store_true', default=default(False), help="Log every request")
+    return parser
+
+
+def build_parser():
+    parser = _common_options(argparse.ArgumentParser(prog="python -m cli", description="Authentik admin tasks without the UI."))
+    common = _common_options(argparse.ArgumentParser(add_help=False), defaults=False)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, **kwargs):
+        return subparsers.add_parser(name, parents=[common], **kwargs)
+
+    add_command('sync', help="Refresh the local user DB").set_defaults(fn=cmd_sync)
+
+    events = add_command('events', help="Fetch new Authentik events into the local event store")
+    events.add_argument('--apply', action='store_true',
+                        help="Also apply user created/updated/deleted events to the local DB")
+    events.add_argument('--follow', type=float, metavar='SECONDS', help="Keep polling at this interval")
+    events.add_argument('--days', type=float, help="How far back the first fetch goes (default: EVENTS_BACKFILL_DAYS)")
+    events.set_defaults(fn=cmd_events)
+
+    search = add_command('search', help="Search users")
+    search.add_argument('term', nargs='?', default=None)
+    search.add_argument('--local', action='store_true', help="Search the local DB instead of the API")
+    search.set_defaults(fn=cmd_search)
+
+    status = add_command('status', help="Activate or deactivate users")
+    toggle = status.add_mutually_exclusive_group(required=True)
+    toggle.add_argument('--activate', dest='activate', action='store_true')
+    toggle.add_argument('--deactivate', dest='activate', action='store_false')
+    _add_selection(status)
+    status.set_defaults(fn=cmd_status)
+
+    reset = add_command('reset', help="Reset passwords to generated passphrases")
+    _add_selection(reset)
+    reset.set_defaults(fn=cmd_reset)
+
+    invite = add_command('invite', help="Create invite links")
+    invite.add_argument('label')
+    invite.add_argument('--hours', type=float, default=2, help="Hours until the invite expires")
+    invite.add_argument('--count', type=int, default=1, help="Number of invites (labels get a -N suffix)")
+    invite.set_defaults(fn=cmd_invite)
+
+    export = add_command('export', help="Export users to JSON or CSV")
+    export.add_argument('output', help="Output path (.json or .csv)")
+    export.add_argument('--search', help="Only users matching this term")
+    export.set_defaults(fn=cmd_export)
+
+    import_ = add_command('import', help="Create users from a JSON or CSV file")
+    import_.add_argument('file')
+    import_.set_defaults(fn=cmd_import)
+
+    migrate = add_command('migrate', help="Bulk-change a field on every matching user")
+    migrate.add_argument('--where', action='append', default=[], metavar='FIELD=VALUE',
+                         help="Condition, repeatable (e.g. type=external, attributes.intro=null)")
+    migrate.add_argument('--set', action='append', default=[], metavar='FIELD=VALUE', required=True,
+                         help="Change, repeatable (e.g. type=internal, attributes.flag=true)")
+    migrate.add_argument('--checkpoint', help="File of completed pks; re-run with it to resume")
+    migrate.add_argument('--limit', type=int, help="Stop after this many changes")
+    migrate.set_defaults(fn=cmd_migrate)
+
+    convert = add_command('convert-type', help="Change the user type of matching users (see migrate)")
+    convert.add_argument('--from', dest='from_type', default='external')
+    convert.add_argument('--to', dest='to_type', default='internal')
+    convert.add_argument('--checkpoint', help="File of completed pks; re-run with it to resume")
+    convert.add_argument('--limit', type=int, help="Stop after this many changes")
+    convert.set_defaults(fn=cmd_convert_type)
+
+    lifecycle = add_command('lifecycle', help="Deactivate and delete inactive accounts per the lifecycle policy")
+    lifecycle.add_argument('--deactivate-days', type=float,
+                           help="Days without login before deactivation (default: LIFECYCLE_DEACTIVATE_DAYS)")
+    lifecycle.add_argument('--delete-days', type=float,
+                           help="Days after deactivation before deletion (default: LIFECYCLE_DELETE_DAYS)")
+    lifecycle.add_argument('--exempt', nargs='+', metavar='USERNAME', help="Usernames to leave alone")
+    lifecycle.add_argument('--max', type=int, help="Max accounts this run (default: LIFECYCLE_MAX_PER_RUN)")
+    lifecycle.set_defaults(fn=cmd_lifecycle)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if args.rate:
+        scheduler.rate = args.rate
+    set_actor(f"cli:{getpass.getuser()}")
+    # CLI work yields to any interactive sessions sharing the process-wide scheduler
+    with api_priority(PRIORITY_BULK):
+        return args.fn(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
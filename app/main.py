@@ -1,12 +1,22 @@
 # app/main.py
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from utils.config import Config
 from ui.home import render_home_page
 from ui.summary import main as render_summary_page
+from ui.audit import main as render_audit_page
+from ui.lifecycle import main as render_lifecycle_page
 from ui.help_resources import main as render_help_page
 from ui.prompts import main as render_prompts_page
 from ui.user_settings import display_settings as render_user_settings_page
-from utils.helpers import setup_logging
+from utils.logs import setup_logging
+from utils.instrumentation import start_rerun, finish_rerun
+from utils.metrics import start_metrics_server, session_seen
+from utils.directory import start_cdc
+from utils.lifecycle import start_lifecycle_schedule
+from auth.audit import set_actor
+from ui.debug_panel import render_debug_panel
+from ui.service_status import render_service_status
 import logging
 
 # Set page config early
@@ -19,19 +29,42 @@ st.set_page_config(
 # Initialize logging
 setup_logging()
 
+# Side-port Prometheus endpoint; started once per process
+start_metrics_server(Config.METRICS_PORT)
+
+# Keep the local DB current from Authentik user events (CDC_INTERVAL=0 disables)
+start_cdc(Config.CDC_INTERVAL)
+
+# Scheduled inactive-account policy runs (LIFECYCLE_INTERVAL=0 disables)
+start_lifecycle_schedule(Config.LIFECYCLE_INTERVAL)
+
 def main():
+    # Per-rerun instrumentation: ?debug=1 shows the panel, ?profile=1 captures a cProfile
+    show_debug = Config.DEBUG_PANEL or st.query_params.get("debug") == "1"
+    stats = start_rerun(profile=st.query_params.get("profile") == "1")
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        session_seen(ctx.session_id)
+        # Writes are audited under the signed-in admin the proxy reports, else this browser session
+        set_actor(st.context.headers.get(Config.AUDIT_ACTOR_HEADER) or f"session:{ctx.session_id[:8]}")
     try:
         # Add a selectbox for navigation
         page = st.sidebar.selectbox(
             "Select Page",
-            ["Home", "Summary", "Help", "Prompts", "User Settings"]
+            ["Home", "Summary", "Lifecycle", "Audit", "Help", "Prompts", "User Settings"]
         )
+        stats.page = page
+        render_service_status()
 
         # Render the selected page
         if page == "Home":
             render_home_page()
         elif page == "Summary":
             render_summary_page()
+        elif page == "Lifecycle":
+            render_lifecycle_page()
+        elif page == "Audit":
+            render_audit_page()
         elif page == "Help":
             render_help_page()
         elif page == "Prompts":
@@ -41,6 +74,10 @@ def main():
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         logging.error(f"Unexpected error in main: {e}")
+    finally:
+        finish_rerun()
+    if show_debug:
+        render_debug_panel(stats)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,6 @@
 # app/messages.py
 import streamlit as st
-from auth.api import shorten_url, force_password_reset, generate_secure_passphrase, create_invite  # Ensure create_invite is imported
+from auth.api import shorten_url, force_password_reset, generate_secure_passphrase
 from utils.helpers import update_LOCAL_DB
 from pytz import timezone
 from datetime import datetime
@@ -31,7 +31,7 @@ def create_user_message(new_username, temp_password):
     st.code(welcome_message)
     st.session_state['message'] = welcome_message
     update_LOCAL_DB()
-    st.session_state['user_list'] = None  # Clear user list if there was any
+    st.session_state['user_query'] = None  # Clear user list if there was any
     st.success("User created successfully!")
 
 
@@ -49,7 +49,7 @@ def create_recovery_message(username_input, new_password):
     """
     st.code(recovery_message)
     st.session_state['message'] = recovery_message
-    st.session_state['user_list'] = None  # Clear user list if there was any
+    st.session_state['user_query'] = None  # Clear user list if there was any
     st.success("Recovery link generated successfully!")
 
 def multi_recovery_message(user_list):
@@ -73,18 +73,10 @@ def multi_recovery_message(user_list):
         st.session_state['message'] = recovery_message
         st.success(f"Recovery link generated successfully for {username_input}!")
 
-    st.session_state['user_list'] = None  # Clear user list if there was any
+    st.session_state['user_query'] = None  # Clear user list if there was any
 
 def create_invite_message(label, invite_link, invite_expires):
-    """Generate and display the invite message."""
-    # Call create_invite to get the invite link and expiration
-    headers = {
-        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
-        'Content-Type': 'application/json'
-    }
-    
-    invite_link, invite_expires = create_invite(headers, label)
-    
+    """Display the invite message for an invite the caller has already created."""
     if invite_expires:
         eastern = timezone('US/Eastern')
         invite_expires_time = datetime.fromisoformat(invite_expires.replace('Z', '+00:00')).astimezone(eastern)
@@ -103,7 +95,7 @@ def create_invite_message(label, invite_link, invite_expires):
         Login to the wiki with that Irregular Chat Login and visit https://forum.irregularchat.com/t/84/
         """
         st.code(invite_message)
-        st.session_state['user_list'] = None
+        st.session_state['user_query'] = None
         st.success("Invite created successfully!")
     else:
         st.error("Invite creation failed.")
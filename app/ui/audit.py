@@ -0,0 +1,68 @@
+# ui/audit.py
+import time
+from datetime import datetime, timedelta
+import streamlit as st
+import pandas as pd
+from auth.api import audit_log
+from utils.directory import latest_snapshot
+from utils.instrumentation import timed
+
+
+def _lookup_pk(username):
+    """The pk for a username in the local directory, so entries recorded by pk alone match too."""
+    snapshot = latest_snapshot()
+    return next((pk for pk, user in snapshot.users().items() if user.username == username), None)
+
+
+@timed
+def main():
+    st.title("Audit Log")
+    st.caption("Every write made to Authentik from this app: who did it, to which account, and how it went.")
+
+    with st.form("audit_filters"):
+        user_col, actor_col, action_col = st.columns(3)
+        with user_col:
+            user = st.text_input("Account (username or ID)", key="audit_user").strip()
+        with actor_col:
+            actor = st.selectbox("Admin", [""] + audit_log.distinct('actor'), key="audit_actor")
+        with action_col:
+            action = st.selectbox("Action", [""] + audit_log.distinct('action'), key="audit_action")
+        since_col, until_col, limit_col = st.columns(3)
+        with since_col:
+            since = st.date_input("From", value=datetime.now().date() - timedelta(days=30), key="audit_since")
+        with until_col:
+            until = st.date_input("To", value=datetime.now().date(), key="audit_until")
+        with limit_col:
+            limit = st.number_input("Max rows", min_value=10, max_value=10000, value=500, step=100, key="audit_limit")
+        st.form_submit_button("Search")
+
+    pk = int(user) if user.isdigit() else (_lookup_pk(user) if user else None)
+    started = time.perf_counter()
+    entries = audit_log.query(
+        user=user or None,
+        pk=pk,
+        actor=actor or None,
+        action=action or None,
+        since=datetime.combine(since, datetime.min.time()).timestamp(),
+        until=datetime.combine(until + timedelta(days=1), datetime.min.time()).timestamp(),
+        limit=int(limit),
+    )
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(f"{len(entries)} entries in {elapsed:.1f} ms")
+
+    if not entries:
+        st.info("No audit entries match these filters.")
+        return
+    st.dataframe(pd.DataFrame([
+        {
+            "time": datetime.fromtimestamp(entry['ts']).strftime('%Y-%m-%d %H:%M:%S'),
+            "admin": entry['actor'],
+            "action": entry['action'],
+            "account": entry['target'] or "",
+            "id": entry['target_pk'],
+            "outcome": entry['outcome'],
+            "ms": entry['duration_ms'],
+            "detail": entry['detail'] or "",
+        }
+        for entry in entries
+    ]), hide_index=True, use_container_width=True)
@@ -0,0 +1,52 @@
+# ui/cohorts.py
+import time
+import streamlit as st
+from utils.analytics import retention_matrix, inviter_leaderboard
+from utils.instrumentation import timed
+
+
+@timed
+def display_retention(months, invited_only):
+    st.subheader("Cohort Retention")
+    st.caption("Members grouped by the month they joined; each cell is the share who logged in that many months later. "
+               "Cells are blank for months still to come or older than the stored event history.")
+    matrix = retention_matrix(months, invited_only)
+    if matrix.empty:
+        st.info("No members joined in this period.")
+        return
+    percent = st.column_config.NumberColumn(format="%.0f%%")
+    shown = matrix.copy()
+    shown[list(range(months))] = shown[list(range(months))] * 100
+    shown.columns = ["users"] + [f"+{offset}" for offset in range(months)]
+    st.dataframe(shown, use_container_width=True,
+                 column_config={f"+{offset}": percent for offset in range(months)})
+
+
+@timed
+def display_inviters(recent_months):
+    st.subheader("Inviter Leaderboard")
+    st.caption(f"Who brought members in, and how many of them logged in during the last {recent_months} months.")
+    board = inviter_leaderboard(recent_months)
+    if board.empty:
+        st.info("No members have an invited_by attribute.")
+        return
+    board = board.assign(retention=board['retention'] * 100)
+    st.dataframe(board, hide_index=True, use_container_width=True, column_config={
+        "retention": st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100),
+        "first": "first invite",
+        "last": "latest invite",
+    })
+
+
+@timed
+def main():
+    months_col, recent_col, invited_col = st.columns(3)
+    months = months_col.selectbox("Cohorts", [6, 12, 24], index=1, format_func=lambda n: f"Last {n} months",
+                                  key="cohort_months")
+    recent_months = recent_col.selectbox("Recently active", [1, 3, 6], index=1,
+                                         format_func=lambda n: f"Logged in within {n} months", key="cohort_recent")
+    invited_only = invited_col.checkbox("Invited members only", key="cohort_invited_only")
+    started = time.perf_counter()
+    display_retention(months, invited_only)
+    display_inviters(recent_months)
+    st.caption(f"Computed in {(time.perf_counter() - started) * 1000:.0f} ms from the local DB and event store.")
@@ -0,0 +1,54 @@
+# ui/debug_panel.py
+import streamlit as st
+import pandas as pd
+from auth.breaker import breaker_status
+from auth.singleflight import singleflight
+from utils.tracing import histograms
+
+
+def render_debug_panel(stats):
+    """Show where the last rerun spent its time. Opt in with ?debug=1 or DEBUG_PANEL=true."""
+    if stats is None:
+        return
+    with st.sidebar.expander("Performance", expanded=False):
+        st.metric("Rerun", f"{stats.duration * 1000:.0f} ms")
+        st.metric("HTTP calls", f"{len(stats.http_calls)} ({stats.http_seconds * 1000:.0f} ms)")
+
+        if stats.renders:
+            st.caption("Render functions")
+            st.dataframe(pd.DataFrame([
+                {"function": "  " * r['depth'] + r['name'], "ms": round(r['seconds'] * 1000, 1)}
+                for r in stats.renders
+            ]), hide_index=True)
+
+        if stats.http_calls:
+            st.caption("Outbound HTTP")
+            st.dataframe(pd.DataFrame([
+                {"method": c['method'], "url": c['url'], "status": c['status'], "ms": round(c['seconds'] * 1000, 1)}
+                for c in stats.http_calls
+            ]), hide_index=True)
+
+        if stats.cache:
+            st.caption("Cache hits / misses")
+            st.dataframe(pd.DataFrame([
+                {"cache": name, **counts} for name, counts in stats.cache.items()
+            ]), hide_index=True)
+
+        coalescing = singleflight.rates()
+        if coalescing:
+            st.caption("Request coalescing (process-wide)")
+            st.dataframe(pd.DataFrame(coalescing), hide_index=True)
+
+        latencies = histograms.summary()
+        if latencies:
+            st.caption("Latency by span (process-wide)")
+            st.dataframe(pd.DataFrame(latencies[:30]), hide_index=True)
+
+        st.caption("Circuit breakers")
+        st.dataframe(pd.DataFrame(breaker_status()), hide_index=True)
+
+        if stats.profile_report:
+            st.caption("cProfile (top 30 by cumulative time)")
+            st.code(stats.profile_report)
+        else:
+            st.caption("Add ?profile=1 to the URL to capture a cProfile of one rerun.")
@@ -1,7 +1,9 @@
 # ui/forms.py
 import streamlit as st
 from datetime import datetime, timedelta
+from utils.instrumentation import timed
 
+@timed
 def render_create_user_form():
     col1, col2 = st.columns(2)
     with col1:
@@ -17,6 +19,7 @@ def render_create_user_form():
     # send_signal_notification = st.checkbox("Send notification to Signal", value=True, key="send_signal_notification")
     return first_name, last_name, email_input, invited_by, intro
 
+@timed
 def render_invite_form():
     invite_label = st.text_input("Invite Label", key="invite_label")
     expires_default = datetime.now() + timedelta(hours=2)
@@ -1,5 +1,7 @@
 import streamlit as st
+from utils.instrumentation import timed
 
+@timed
 def main():
     st.title("Help & Resources")
 
@@ -8,28 +8,35 @@ from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode, DataReturnMode
 import json
 import pandas as pd
 from utils.config import Config
+from utils.instrumentation import timed, record_cache
+from utils.tracing import span, annotate
 from auth.api import (
     create_user,
     force_password_reset,
     generate_secure_passphrase,
     list_users_cached,
-    update_user_status,
     delete_user,
     reset_user_password,
-    update_user_intro,
-    update_user_invited_by,
+    stage_user_update,
+    apply_user_updates,
     create_invite,
     shorten_url,
     list_users,
-    webhook_notification
+    webhook_notification,
+    api_priority,
+    PRIORITY_BULK
 )
+from auth.offline_queue import pending_ops, queued_update_args
 from ui.forms import render_create_user_form, render_invite_form
+from ui.pending_ops import render_pending_ops
 from utils.helpers import (
     get_existing_usernames,
     create_unique_username,
     update_LOCAL_DB,
-    search_LOCAL_DB
+    search_LOCAL_DB,
+    users_to_frame
 )
+from utils.directory import select_users, resolve_users, batched_store_writes, latest_snapshot
 from messages import (
     create_user_message,
     create_recovery_message,
@@ -74,13 +81,15 @@ def update_username():
     st.session_state['username_input'] = base_username.replace(" ", "-")
 
 
+@timed
 def display_user_list(auth_api_url, headers):
-    if 'user_list' in st.session_state and st.session_state['user_list']:
-        users = st.session_state['user_list']
+    # The session only holds a query descriptor; records come from the shared directory snapshot
+    users = resolve_users(st.session_state.get('user_query'))
+    if users:
         st.subheader("User List")
 
         # Create DataFrame
-        df = pd.DataFrame(users)
+        df = users_to_frame(users)
 
         # Determine the identifier field
         identifier_field = None
@@ -212,50 +221,89 @@ def display_user_list(auth_api_url, headers):
                 elif action == "Add Invited By":
                     invited_by = st.text_input("Enter Invited By", key="add_invited_by_input_top")
 
+                # While Authentik is down (or earlier writes are still queued) edits are queued for replay
+                queue_writes = pending_ops.should_queue()
+                if queue_writes and action == "Reset Password":
+                    st.warning("Authentik is unavailable; passwords can only be reset once it is reachable again.")
+                    return
+
                 try:
                     success_count = 0
-                    for _, user in selected_users.iterrows():
-                        user_id = None
-                        for col in available_identifier_columns:
-                            if col in user and pd.notna(user[col]):
-                                user_id = user[col]
-                                break
-                        if not user_id:
-                            action_message = f"User {user[identifier_field]} does not have a valid ID."
-                            st.error(action_message)
-                            continue
-
-                        # Perform the selected action
-                        if action == "Activate":
-                            result = update_user_status(auth_api_url, headers, user_id, True)
-                        elif action == "Deactivate":
-                            result = update_user_status(auth_api_url, headers, user_id, False)
-                        elif action == "Reset Password":
-                            if new_passwords[user['username']]:
-                                result = reset_user_password(auth_api_url, headers, user_id, new_passwords[user['username']])
-                                if result:
-                                    st.success(f"Password for user {user[identifier_field]} has been reset.")
-                            else:
-                                action_message = "Please enter a new password"
-                                st.warning(action_message)
+                    queued_count = 0
+                    # Status and attribute edits are staged per user and sent as one merged PATCH each
+                    staged_updates = {}
+                    # Bulk actions yield to interactive requests in the shared API scheduler
+                    # Written-through store changes are batched into one local DB write
+                    # Traced as one UI action; every API call below nests under it
+                    with span("ui.bulk_action", action=action, selected=len(selected_users)), \
+                            api_priority(PRIORITY_BULK), batched_store_writes():
+                        for _, user in selected_users.iterrows():
+                            user_id = None
+                            for col in available_identifier_columns:
+                                if col in user and pd.notna(user[col]):
+                                    user_id = int(user[col])
+                                    break
+                            if not user_id:
+                                action_message = f"User {user[identifier_field]} does not have a valid ID."
+                                st.error(action_message)
                                 continue
-                        elif action == "Delete":
-                            result = delete_user(auth_api_url, headers, user_id)
-                        elif action == "Add Intro":
-                            result = update_user_intro(auth_api_url, headers, user_id, intro_text)
-                        elif action == "Add Invited By":
-                            result = update_user_invited_by(auth_api_url, headers, user_id, invited_by)
-                        else:
-                            result = None
-
-                        if result:
-                            success_count += 1
+
+                            # Perform the selected action
+                            if action == "Activate":
+                                stage_user_update(staged_updates, user_id, is_active=True)
+                                continue
+                            elif action == "Deactivate":
+                                stage_user_update(staged_updates, user_id, is_active=False)
+                                continue
+                            elif action == "Reset Password":
+                                if new_passwords[user['username']]:
+                                    result = reset_user_password(auth_api_url, headers, user_id, new_passwords[user['username']])
+                                    if result:
+                                        st.success(f"Password for user {user[identifier_field]} has been reset.")
+                                else:
+                                    action_message = "Please enter a new password"
+                                    st.warning(action_message)
+                                    continue
+                            elif action == "Delete":
+                                if queue_writes:
+                                    pending_ops.enqueue('delete_user', {"user_id": user_id}, f"Delete {user['username']}")
+                                    queued_count += 1
+                                    continue
+                                result = delete_user(auth_api_url, headers, user_id)
+                            elif action == "Add Intro":
+                                stage_user_update(staged_updates, user_id, attributes={"intro": intro_text})
+                                continue
+                            elif action == "Add Invited By":
+                                stage_user_update(staged_updates, user_id, attributes={"invited_by": invited_by})
+                                continue
+                            else:
+                                result = None
+
+                            if result:
+                                success_count += 1
+
+                        if staged_updates:
+                            snapshot = latest_snapshot()
+                            current = {user_id: snapshot.get(user_id) for user_id in staged_updates}
+                            if queue_writes:
+                                for user_id, update in staged_updates.items():
+                                    name = current[user_id].username if current[user_id] else user_id
+                                    pending_ops.enqueue('update_user', queued_update_args(user_id, update, current[user_id]),
+                                                        f"{action} {name}")
+                                    queued_count += 1
+                            else:
+                                results = apply_user_updates(auth_api_url, headers, staged_updates, current)
+                                success_count += sum(1 for result in results.values() if result)
 
                     if action == "Reset Password":
                         multi_recovery_message(selected_users.to_dict(orient='records'))
 
-                    action_message = f"{action} action applied successfully to {success_count} out of {len(selected_users)} selected users."
-                    st.success(action_message)
+                    if queued_count:
+                        action_message = f"Authentik is unavailable; {action} was queued for {queued_count} user(s) and will be applied when it recovers."
+                        st.info(action_message)
+                    else:
+                        action_message = f"{action} action applied successfully to {success_count} out of {len(selected_users)} selected users."
+                        st.success(action_message)
                 except Exception as e:
                     action_message = f"An error occurred while applying {action} action: {e}"
                     st.error(action_message)
@@ -273,6 +321,7 @@ def display_user_list(auth_api_url, headers):
     else:
         st.info("No users found.")
 
+@timed
 def render_home_page():
     # Correctly construct the path to styles.css
     css_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'styles.css'))
@@ -285,9 +334,9 @@ def render_home_page():
         st.error(f"An unexpected error occurred: {e}")
 
     # Initialize session state variables
-    for var in ['message', 'user_list', 'prev_operation']:
+    for var in ['message', 'user_query', 'prev_operation']:
         if var not in st.session_state:
-            st.session_state[var] = "" if var in ['message', 'prev_operation'] else []
+            st.session_state[var] = "" if var in ['message', 'prev_operation'] else None
     
     # Initialize variables
     invite_label = None
@@ -372,11 +421,14 @@ def render_home_page():
             
         )
 
+    render_pending_ops()
+
     # Display user list and actions
-    if operation == "List and Manage Users" and 'user_list' in st.session_state:
+    if operation == "List and Manage Users" and 'user_query' in st.session_state:
         display_user_list(Config.AUTHENTIK_API_URL, headers)
 
 
+@timed
 def handle_form_submission(
     operation, username_input, email_input, invited_by, intro, expires_date,
     expires_time, first_name, last_name, invite_label=None
@@ -385,6 +437,7 @@ def handle_form_submission(
         'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
         'Content-Type': 'application/json'
     }
+    annotate(operation=operation)
     try:
         if operation == "Create User":
             if not first_name and not last_name:
@@ -414,11 +467,20 @@ def handle_form_submission(
             else:
                 full_name = ""  # This should not occur due to the earlier check
 
+            # While Authentik is down (or earlier writes are still queued) the user is created on replay
+            if pending_ops.should_queue():
+                pending_ops.enqueue('create_user', {
+                    "username": new_username, "full_name": full_name, "email": email,
+                    "invited_by": invited_by, "intro": intro
+                }, f"Create user {new_username}")
+                st.info(f"Authentik is unavailable; user '{new_username}' was queued and will be created when it recovers.")
+                return
+
             # Create the user
             new_user, temp_password = create_user(new_username, full_name, email, invited_by, intro)
             if new_user:
                 # Use the username from the created user
-                created_username = new_user.get('username', new_username)
+                created_username = new_user.username
                 create_user_message(created_username, temp_password)
                 # Send a webhook notification
                 st.success(f"User '{created_username}' created successfully with a temporary password.") # show success message to webuser
@@ -476,24 +538,23 @@ def handle_form_submission(
 
             # First, search the local database
             local_users = search_LOCAL_DB(search_query)
+            record_cache('local_db_search', not local_users.empty)
             if not local_users.empty:
-                st.session_state['user_list'] = local_users.to_dict(orient='records')
+                st.session_state['user_query'] = select_users(search_query, pks=local_users['pk'].tolist())
                 st.session_state['message'] = "Users found in local database."
             else:
                 # If not found locally or search query is empty, search using the API
                 users = list_users(Config.AUTHENTIK_API_URL, headers, search_query)
                 if users:
-                    st.session_state['user_list'] = users
+                    st.session_state['user_query'] = select_users(search_query, users=users)
                     st.session_state['message'] = "Users found via API."
                 else:
-                    st.session_state['user_list'] = []
+                    st.session_state['user_query'] = None
                     st.session_state['message'] = "No users found."
 
             # Logging and debugging (optional)
-            logging.debug(f"user_list data: {st.session_state['user_list']}")
-            if st.session_state['user_list']:
-                first_user = st.session_state['user_list'][0]
-                logging.debug(f"First user keys: {first_user.keys()}")
+            if st.session_state['user_query']:
+                logging.debug("user_query for '%s': %d users", search_query, len(st.session_state['user_query']['pks']))
 
     except Exception as e:
         st.error(f"An error occurred during '{operation}': {e}")
@@ -0,0 +1,114 @@
+# ui/lifecycle.py
+import streamlit as st
+import pandas as pd
+from utils.config import Config
+from utils.instrumentation import timed
+from utils.lifecycle import LifecyclePolicy, evaluate, run_policy, recent_reports
+
+# Rows shown per preview table; the counts always cover everyone
+PREVIEW_ROWS = 500
+
+
+def _policy_form():
+    deactivate_col, delete_col = st.columns(2)
+    deactivate_days = deactivate_col.number_input(
+        "Deactivate after days without login (0 = off)", min_value=0,
+        value=int(Config.LIFECYCLE_DEACTIVATE_DAYS), step=30, key="lifecycle_deactivate_days")
+    delete_days = delete_col.number_input(
+        "Delete this many days after deactivation (0 = never)", min_value=0,
+        value=int(Config.LIFECYCLE_DELETE_DAYS), step=30, key="lifecycle_delete_days")
+    exempt = st.text_input("Exempt usernames (comma separated)", value=", ".join(Config.LIFECYCLE_EXEMPT),
+                           key="lifecycle_exempt")
+    return LifecyclePolicy(deactivate_days, delete_days, [name.strip() for name in exempt.split(",") if name.strip()])
+
+
+def _preview_table(rows):
+    if rows.empty:
+        st.caption("Nobody.")
+        return
+    shown = rows.head(PREVIEW_ROWS).assign(
+        last_active=rows['last_active'].dt.strftime('%Y-%m-%d'),
+        deactivated_at=rows['deactivated_at'].dt.strftime('%Y-%m-%d'),
+    )
+    st.dataframe(shown, hide_index=True, use_container_width=True)
+    if len(rows) > PREVIEW_ROWS:
+        st.caption(f"Showing the {PREVIEW_ROWS} longest idle of {len(rows)}.")
+
+
+@timed
+def display_preview(plan):
+    deactivate_col, delete_col = st.columns(2)
+    deactivate_col.metric("Due for deactivation", len(plan.deactivate))
+    delete_col.metric("Due for deletion", len(plan.delete))
+    with st.expander(f"Deactivate ({len(plan.deactivate)})", expanded=False):
+        _preview_table(plan.deactivate)
+    with st.expander(f"Delete ({len(plan.delete)})", expanded=False):
+        _preview_table(plan.delete)
+
+
+@timed
+def display_run(policy, plan):
+    st.subheader("Run")
+    total = len(plan.deactivate) + len(plan.delete)
+    limit_col, dry_run_col = st.columns(2)
+    max_actions = limit_col.number_input("Max accounts this run", min_value=1, value=Config.LIFECYCLE_MAX_PER_RUN,
+                                         step=50, key="lifecycle_max")
+    dry_run = dry_run_col.checkbox("Dry run (report only)", value=True, key="lifecycle_dry_run")
+    confirmed = dry_run or st.checkbox(
+        f"I understand this deactivates {len(plan.deactivate)} and deletes {len(plan.delete)} accounts "
+        f"(up to {min(total, max_actions)} this run)", key="lifecycle_confirm")
+    if st.button("Run now", disabled=not (total and confirmed and policy.enabled), key="lifecycle_run"):
+        headers = {
+            'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
+            'Content-Type': 'application/json'
+        }
+        with st.spinner(f"Processing up to {min(total, max_actions)} accounts at {Config.LIFECYCLE_RATE:g}/s..."):
+            report = run_policy(policy, Config.AUTHENTIK_API_URL, headers, dry_run=dry_run, max_actions=max_actions)
+        if report is None:
+            st.warning("Another lifecycle run is in progress; try again when it finishes.")
+        else:
+            st.success(f"Run {report['id']}: deactivated {len(report['deactivated'])}, deleted {len(report['deleted'])}, "
+                       f"skipped {len(report['skipped'])}, failed {len(report['failed'])}, deferred {report['deferred']}.")
+
+
+@timed
+def display_reports():
+    st.subheader("Recent Runs")
+    reports = recent_reports()
+    if not reports:
+        st.caption("No runs yet.")
+        return
+    st.dataframe(pd.DataFrame([
+        {
+            "started": report['started'],
+            "trigger": report['trigger'],
+            "dry run": report['dry_run'],
+            "deactivated": len(report['deactivated']),
+            "deleted": len(report['deleted']),
+            "skipped": len(report['skipped']),
+            "failed": len(report['failed']),
+            "deferred": report['deferred'],
+            "seconds": report.get('seconds'),
+        }
+        for report in reports
+    ]), hide_index=True, use_container_width=True)
+    with st.expander("Latest report"):
+        st.json(reports[0])
+
+
+@timed
+def main():
+    st.title("Account Lifecycle")
+    st.caption("Deactivate accounts that stopped logging in and delete them after a grace period. Service accounts "
+               "and users with the lifecycle_exempt attribute are never touched.")
+    if Config.LIFECYCLE_INTERVAL:
+        st.caption(f"The policy from the environment runs every {Config.LIFECYCLE_INTERVAL:g} hours.")
+    policy = _policy_form()
+    if not policy.enabled:
+        st.info("The policy is off. Enter the days after which to deactivate and/or delete accounts to preview it.")
+        display_reports()
+        return
+    plan = evaluate(policy)
+    display_preview(plan)
+    display_run(policy, plan)
+    display_reports()
@@ -0,0 +1,39 @@
+# ui/pending_ops.py
+from datetime import datetime
+import streamlit as st
+import pandas as pd
+from auth.offline_queue import pending_ops, PENDING, CONFLICT, FAILED
+
+
+def render_pending_ops():
+    """List writes queued during an Authentik outage, with retry/discard for conflicts."""
+    ops = pending_ops.list()
+    if not ops:
+        return
+    waiting = sum(1 for op in ops if op['state'] == PENDING)
+    needs_attention = [op for op in ops if op['state'] in (CONFLICT, FAILED)]
+    with st.expander(f"Queued operations ({waiting} waiting, {len(needs_attention)} need attention)",
+                     expanded=bool(needs_attention)):
+        st.dataframe(pd.DataFrame([
+            {
+                "queued": datetime.fromtimestamp(op['queued_at']).strftime('%Y-%m-%d %H:%M:%S'),
+                "operation": op['summary'],
+                "state": op['state'],
+                "detail": op['detail'] or "",
+            }
+            for op in reversed(ops)
+        ]), hide_index=True)
+
+        for op in needs_attention:
+            summary_col, retry_col, discard_col = st.columns([6, 1, 1])
+            with summary_col:
+                st.write(f"**{op['summary']}**: {op['detail']}")
+            with retry_col:
+                if st.button("Retry", key=f"retry_op_{op['id']}",
+                             help="Apply anyway (a taken username gets a unique variant)"):
+                    pending_ops.retry(op['id'])
+                    st.rerun()
+            with discard_col:
+                if st.button("Discard", key=f"discard_op_{op['id']}"):
+                    pending_ops.discard(op['id'])
+                    st.rerun()
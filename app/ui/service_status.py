@@ -0,0 +1,20 @@
+# ui/service_status.py
+import streamlit as st
+from auth.breaker import breaker_status, CLOSED
+from auth.api import deferred_webhooks
+from auth.offline_queue import pending_ops
+
+
+def render_service_status():
+    """Warn in the sidebar when a dependency's circuit breaker is not closed."""
+    for status in breaker_status():
+        if status['state'] != CLOSED:
+            retry = f", retrying in {status['retry_in_s']}s" if status['retry_in_s'] else ""
+            st.sidebar.warning(f"{status['dependency'].title()} is unavailable ({status['state']}{retry}).")
+    if deferred_webhooks:
+        st.sidebar.info(f"{len(deferred_webhooks)} webhook notification(s) waiting to be sent.")
+    # Replays queued writes once Authentik answers again; returns immediately when there are none
+    pending_ops.replay_in_background()
+    waiting = pending_ops.pending_count()
+    if waiting:
+        st.sidebar.info(f"{waiting} write(s) queued until Authentik is reachable.")
@@ -1,70 +1,128 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from auth.api import list_users_cached, list_events_cached
+import logging
+from auth.events import event_store, ingest_events
 from utils.config import Config
+from utils.directory import latest_snapshot
+from utils.history import UserMetrics, metrics_history
+from utils.instrumentation import timed
+from ui.cohorts import main as render_cohorts
 
-def fetch_user_data():
-    headers = {
-        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
-        'Content-Type': 'application/json'
-    }
-    return list_users_cached(Config.AUTHENTIK_API_URL, headers)
+LOGIN_ACTIONS = ('login', 'login_failed')
+TREND_LABELS = {
+    'total_users': "Total",
+    'active_users': "Active",
+    'recently_joined': "Joined (30 days)",
+    'recently_deactivated': "Deactivated (30 days)",
+    'inactive_users': "No login in a year",
+}
 
-def calculate_metrics(users):
-    total_users = len(users)
-    active_users = sum(user.get('is_active', False) for user in users)
-    
-    # FIXME: Ensure timezone handling is consistent across all datetime operations
-    now = datetime.now().astimezone()
+@timed
+def fetch_metrics():
+    """The newest metrics snapshot. Before the first sync records one, it is taken from the local DB."""
+    latest = metrics_history.latest()
+    if latest is None:
+        users = latest_snapshot().users().values()
+        latest = metrics_history.latest()  # Loading a missing local DB syncs, which records one
+        if latest is None and users:
+            metrics_history.record(UserMetrics.of(users))
+            latest = metrics_history.latest()
+    return latest
 
-    recently_joined = [
-        user for user in users 
-        if 'date_joined' in user and isinstance(user['date_joined'], str) and
-        datetime.fromisoformat(user['date_joined']).astimezone() > now - timedelta(days=30)
-    ]
-    recently_deactivated = [
-        user for user in users 
-        if not user.get('is_active', False) and 'last_login' in user and isinstance(user['last_login'], str) and
-        datetime.fromisoformat(user['last_login']).astimezone() > now - timedelta(days=30)
-    ]
-    inactive_users = [
-        user for user in users 
-        if 'last_login' not in user or (isinstance(user['last_login'], str) and
-        datetime.fromisoformat(user['last_login']).astimezone() < now - timedelta(days=365))
-    ]
+@timed
+def display_metrics(metrics, previous=None):
+    st.title("User Status Insights and Metrics")
+    if metrics is None:
+        st.info("No metrics yet; they are recorded with every sync of the local DB.")
+        return
+    st.caption(f"As of the sync at {datetime.fromtimestamp(metrics['ts']).strftime('%Y-%m-%d %H:%M')}"
+               + (" (change since 30 days earlier)" if previous else ""))
 
-    return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "recently_joined": len(recently_joined),
-        "recently_deactivated": len(recently_deactivated),
-        "inactive_users": len(inactive_users)
-    }
+    def metric(label, name):
+        delta = metrics[name] - previous[name] if previous else None
+        st.metric(label, metrics[name], delta=delta)
 
-def display_metrics(metrics):
-    st.title("User Status Insights and Metrics")
-    st.metric("Total Users", metrics['total_users'])
-    st.metric("Active Users", metrics['active_users'])
-    st.metric("Recently Joined Users (Last 30 days)", metrics['recently_joined'])
-    st.metric("Recently Deactivated Accounts (Last 30 days)", metrics['recently_deactivated'])
-    st.metric("Inactive Users (No login in last year)", metrics['inactive_users'])
+    metric("Total Users", 'total_users')
+    metric("Active Users", 'active_users')
+    metric("Recently Joined Users (Last 30 days)", 'recently_joined')
+    metric("Recently Deactivated Accounts (Last 30 days)", 'recently_deactivated')
+    metric("Inactive Users (No login in last year)", 'inactive_users')
 
-# FIXME: Review the necessity of fetching event data if not displaying it
-# def fetch_event_data():
-#     headers = {
-#         'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
-#         'Content-Type': 'application/json'
-#     }
-#     return list_events_cached(Config.AUTHENTIK_API_URL, headers)
+@timed
+def display_trends():
+    st.subheader("Trends")
+    ranges = {"3 months": 90, "6 months": 182, "1 year": 365, "All": None}
+    period = st.selectbox("Period", list(ranges), index=1, key="trend_period")
+    days = ranges[period]
+    since = (datetime.now() - timedelta(days=days)).timestamp() if days else None
+    history = pd.DataFrame(metrics_history.daily(since))
+    if len(history) < 2:
+        st.info("Trends appear once metrics from at least two days have been recorded.")
+        return
+    history = history.set_index(pd.to_datetime(history['day']))
+    st.line_chart(history[['total_users', 'active_users']].rename(columns=TREND_LABELS))
+    st.line_chart(history[['recently_joined', 'recently_deactivated', 'inactive_users']].rename(columns=TREND_LABELS))
 
-# FIXME: Commented out event history display; review if needed in the future
-# def display_event_history(events):
-#     st.subheader("Activity History")
-#     for event in events:
-#         st.write(f"Event: {event['action']}, User: {event['user']}, Time: {event['timestamp']}")
-#         # Add more details as needed
+@timed
+def fetch_event_data():
+    """Bring the local event store up to date; at most one Authentik request per EVENTS_REFRESH seconds."""
+    headers = {
+        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
+        'Content-Type': 'application/json'
+    }
+    try:
+        ingest_events(Config.AUTHENTIK_API_URL, headers, max_age=Config.EVENTS_REFRESH)
+    except Exception as e:
+        logging.error(f"Could not fetch new events: {e}")
+        st.warning("Could not fetch new events from Authentik; showing the events stored so far.")
+
+@timed
+def display_login_analytics(days=30):
+    st.subheader(f"Logins (Last {days} days)")
+    since = (datetime.now() - timedelta(days=days)).timestamp()
+    counts = pd.DataFrame(event_store.daily_counts(LOGIN_ACTIONS, since))
+    if counts.empty:
+        st.info("No login events stored yet.")
+        return
+    logins = counts[counts['action'] == 'login']
+    failed = counts[counts['action'] == 'login_failed']
+    total_col, users_col, failed_col = st.columns(3)
+    total_col.metric("Logins", int(logins['events'].sum()))
+    users_col.metric("Users who logged in", event_store.count_users('login', since))
+    failed_col.metric("Failed logins", int(failed['events'].sum()))
+    chart = counts.pivot_table(index='day', columns='action', values='events', fill_value=0)
+    if not logins.empty:
+        chart['unique users'] = logins.set_index('day')['users']
+    st.line_chart(chart.fillna(0))
+    top = pd.DataFrame(event_store.top_users('login', since))
+    if not top.empty:
+        top['last'] = pd.to_datetime(top['last'], unit='s').dt.strftime('%Y-%m-%d %H:%M')
+        st.caption("Most frequent logins")
+        st.dataframe(top, hide_index=True, use_container_width=True)
 
+@timed
+def display_event_history():
+    st.subheader("Activity History")
+    user_col, action_col = st.columns(2)
+    username = user_col.text_input("Username", key="events_user").strip()
+    action = action_col.selectbox("Action", [""] + event_store.distinct_actions(), key="events_action")
+    events = event_store.query(username=username or None, action=action or None, limit=200)
+    if not events:
+        st.info("No events match these filters.")
+        return
+    st.dataframe(pd.DataFrame([
+        {
+            "time": datetime.fromtimestamp(event['ts']).strftime('%Y-%m-%d %H:%M:%S'),
+            "action": event['action'],
+            "user": event['username'] or "",
+            "object": f"{event['model']} {event['model_pk']}" if event['model'] else "",
+            "ip": event['client_ip'] or "",
+        }
+        for event in events
+    ]), hide_index=True, use_container_width=True)
+
+@timed
 def main():
     # Sidebar links
     st.sidebar.markdown("""
@@ -74,13 +132,21 @@ def main():
         - [Admin Prompts for Common Situations](https://irregularpedia.org/index.php/Admin)
         - [Links to Community Chats and Services](https://irregularpedia.org/index.php/Links)
     """)
-    users = fetch_user_data()
-    metrics = calculate_metrics(users)
-    display_metrics(metrics)
-    
-    # FIXME: Event fetching and display are currently disabled
-    # events = fetch_event_data()
-    # display_event_history(events)
+    view = st.sidebar.radio("Summary view", ["Overview", "Cohorts"], key="summary_view")
+    if view == "Cohorts":
+        st.title("Cohorts and Inviters")
+        fetch_event_data()
+        render_cohorts()
+        return
+
+    metrics = fetch_metrics()
+    previous = metrics_history.at(metrics['ts'] - 30 * 86400) if metrics else None
+    display_metrics(metrics, previous)
+    display_trends()
+
+    fetch_event_data()
+    display_login_analytics()
+    display_event_history()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
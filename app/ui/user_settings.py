@@ -3,6 +3,7 @@ import os
 from dotenv import load_dotenv, set_key
 import logging
 import streamlit as st
+from utils.instrumentation import timed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -105,6 +106,7 @@ def save_settings(
     set_key(env_path, "WEBHOOK_SECRET", os.environ["WEBHOOK_SECRET"])
     set_key(env_path, "STREAMLIT_THEME", os.environ["STREAMLIT_THEME"])
 
+@timed
 def display_settings():
     st.title("Automation Settings")
 
@@ -0,0 +1,171 @@
+# utils/analytics.py
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from auth.events import event_store
+from auth.singleflight import singleflight
+from utils.directory import latest_snapshot
+from utils.instrumentation import record_cache
+
+# Results for this many (snapshot, event cursor, arguments) combinations are kept
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def month_label(month):
+    """'2024-03' for a month index (year * 12 + month - 1)."""
+    return f"{month // 12}-{month % 12 + 1:02d}"
+
+
+def current_month():
+    now = datetime.now(timezone.utc)
+    return now.year * 12 + now.month - 1
+
+
+def _version():
+    """What every result depends on: the directory snapshot and the newest stored event."""
+    cursor = event_store.cursor('ingest')
+    return latest_snapshot().version, cursor[1] if cursor else 0
+
+
+def _cached(name, args, compute):
+    """compute() once per data version and arguments; concurrent sessions share one run."""
+    key = (name, _version(), args)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            record_cache(f"analytics:{name}", True)
+            return _cache[key]
+    record_cache(f"analytics:{name}", False)
+    result = singleflight.do(f"analytics:{name}", key, compute)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _users():
+    """pk, cohort month, inviter and active flag of every user in the snapshot with a join date."""
+    records = latest_snapshot().users().values()
+    frame = pd.DataFrame({
+        'pk': np.fromiter((user.pk for user in records), dtype=np.int64, count=len(records)),
+        'date_joined': [user.date_joined for user in records],
+        'invited_by': [user.attributes.get('invited_by') or None for user in records],
+        'is_active': np.fromiter((user.is_active for user in records), dtype=bool, count=len(records)),
+    })
+    joined = pd.to_datetime(frame['date_joined'], utc=True, format='ISO8601', errors='coerce')
+    frame['cohort'] = joined.dt.year * 12 + joined.dt.month - 1
+    frame = frame[joined.notna()].drop(columns='date_joined')
+    frame['cohort'] = frame['cohort'].astype(np.int64)
+    return frame.set_index('pk')
+
+
+_logins = None  # (ingest cursor, DataFrame of user_pk, month)
+_logins_lock = threading.Lock()
+
+
+def _login_months():
+    """Every (user_pk, month) login pair, re-reading only the newest month once more events are stored.
+
+    Events are ingested in time order, so new pairs can only fall in the latest
+    month already seen or later ones.
+    """
+    global _logins
+    cursor = event_store.cursor('ingest')
+    with _logins_lock:
+        if _logins is not None and _logins[0] == cursor:
+            return _logins[1]
+        if _logins is None or _logins[1].empty:
+            frame = pd.DataFrame(event_store.login_months(), columns=['user_pk', 'month'])
+        else:
+            old = _logins[1]
+            since = int(old['month'].max())
+            recent = pd.DataFrame(event_store.login_months(since), columns=['user_pk', 'month'])
+            frame = pd.concat([old[old['month'] < since], recent], ignore_index=True)
+        _logins = (cursor, frame)
+        return frame
+
+
+def _activity(users):
+    """(user_pk, month) logins of users in the snapshot, with each user's cohort."""
+    activity = _login_months().copy()
+    activity['cohort'] = activity['user_pk'].map(users['cohort'])
+    return activity.dropna(subset=['cohort']).astype({'cohort': np.int64})
+
+
+def _frames():
+    def compute():
+        users = _users()
+        return users, _activity(users)
+    return _cached('frames', (), compute)
+
+
+def retention_matrix(months=12, invited_only=False):
+    """Share of each monthly join cohort that logged in 0, 1, 2... months after joining.
+
+    Rows are the last `months` cohorts (oldest first) with their size; columns
+    are months since joining. Months that have not happened yet, and months before
+    the first login in the event store (EVENTS_BACKFILL_DAYS), are NaN: there is
+    no data for them, which is not the same as 0%.
+    """
+    def compute():
+        users, activity = _frames()
+        if invited_only:
+            users = users[users['invited_by'].notna()]
+            activity = activity[activity['user_pk'].isin(users.index)]
+        first = current_month() - months + 1
+        users = users[users['cohort'] >= first]
+        activity = activity[(activity['cohort'] >= first) & (activity['month'] >= activity['cohort'])]
+        sizes = users.groupby('cohort').size()
+        offsets = activity['month'] - activity['cohort']
+        retained = activity.groupby([activity['cohort'], offsets.rename('offset')]).size().unstack(fill_value=0)
+        retained = retained.reindex(index=sizes.index, columns=range(months), fill_value=0)
+        matrix = retained.div(sizes, axis=0)
+        # Cohort c can only have been observed for current_month - c months
+        calendar = sizes.index.to_numpy()[:, None] + np.arange(months)[None, :]
+        future = calendar > current_month()
+        logins = _login_months()['month']
+        # Nothing was stored before the first login month, so those cells are unknown rather than 0
+        before_data = calendar < (logins.min() if not logins.empty else current_month() + 1)
+        matrix = matrix.mask(future | before_data)
+        matrix.index = [month_label(month) for month in sizes.index]
+        matrix.insert(0, 'users', sizes.to_numpy())
+        return matrix
+    return _cached('retention', (months, invited_only), compute)
+
+
+def inviter_leaderboard(recent_months=3, limit=25):
+    """Inviters ranked by how many members they brought in and how many of those still log in.
+
+    recent: invitees who logged in during the last recent_months calendar months.
+    """
+    def compute():
+        users, activity = _frames()
+        invited = users[users['invited_by'].notna()]
+        if invited.empty:
+            return pd.DataFrame(columns=['inviter', 'invited', 'active', 'recent', 'retention', 'first', 'last'])
+        recent_pks = activity.loc[activity['month'] > current_month() - recent_months, 'user_pk'].unique()
+        board = pd.DataFrame({
+            'invited_by': invited['invited_by'],
+            'is_active': invited['is_active'],
+            'recent': invited.index.isin(recent_pks),
+            'cohort': invited['cohort'],
+        }).groupby('invited_by').agg(
+            invited=('is_active', 'size'),
+            active=('is_active', 'sum'),
+            recent=('recent', 'sum'),
+            first=('cohort', 'min'),
+            last=('cohort', 'max'),
+        )
+        board['retention'] = board['recent'] / board['invited']
+        board = board.sort_values(['invited', 'retention'], ascending=False).head(limit)
+        board['first'] = board['first'].map(month_label)
+        board['last'] = board['last'].map(month_label)
+        return board.reset_index(names='inviter')[
+            ['inviter', 'invited', 'active', 'recent', 'retention', 'first', 'last']]
+    return _cached('inviters', (recent_months, limit), compute)
@@ -2,7 +2,6 @@
 import os
 from dotenv import load_dotenv
 import logging
-import streamlit as st
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +22,8 @@ class Config:
     BASE_DOMAIN = os.getenv("BASE_DOMAIN")
     FLOW_ID = os.getenv("FLOW_ID")
     LOCAL_DB = os.getenv("LOCAL_DB", "users.csv")
+    # Seconds to collect write-through edits before the local DB file is rewritten once for all of them (0 writes each)
+    LOCAL_DB_WRITE_DELAY = float(os.getenv("LOCAL_DB_WRITE_DELAY", "2"))
     SHLINK_API_TOKEN = os.getenv("SHLINK_API_TOKEN")
     SHLINK_URL = os.getenv("SHLINK_URL")
     AUTHENTIK_API_URL = os.getenv("AUTHENTIK_API_URL")
@@ -31,6 +32,59 @@ class Config:
     WEBHOOK_URL = os.getenv("WEBHOOK_URL")
     WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
     WEBHOOK_ENABLED = os.getenv("WEBHOOK_ENABLED", "true").lower() == "true"
+    # Shared pacing for all Authentik API calls (requests per second and burst size)
+    AUTHENTIK_RATE_LIMIT = float(os.getenv("AUTHENTIK_RATE_LIMIT", "10"))
+    AUTHENTIK_RATE_BURST = int(os.getenv("AUTHENTIK_RATE_BURST", "20"))
+    # Parallel PATCHes for bulk actions (still paced by AUTHENTIK_RATE_LIMIT)
+    BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+    # list_users results cached per search term (seconds, entries)
+    USER_QUERY_CACHE_TTL = float(os.getenv("USER_QUERY_CACHE_TTL", "60"))
+    USER_QUERY_CACHE_SIZE = int(os.getenv("USER_QUERY_CACHE_SIZE", "128"))
+    # Journal of create/invite/recovery writes (compacted to the window) and the window for deduplicating repeat submissions
+    WRITE_JOURNAL = os.getenv("WRITE_JOURNAL", "write_journal.jsonl")
+    DUPLICATE_WINDOW = float(os.getenv("DUPLICATE_WINDOW", "30"))
+    WRITE_RETRIES = int(os.getenv("WRITE_RETRIES", "3"))
+    # Writes made while Authentik is unreachable, replayed in order once it recovers
+    PENDING_OPS = os.getenv("PENDING_OPS", "pending_ops.json")
+    # Record outbound HTTP exchanges to this cassette, or serve them from it (HTTP_CASSETTE_MODE=replay);
+    # replay latency scales the recorded time per exchange, 0 for full speed
+    HTTP_CASSETTE = os.getenv("HTTP_CASSETTE")
+    HTTP_CASSETTE_MODE = os.getenv("HTTP_CASSETTE_MODE", "record").lower()
+    HTTP_REPLAY_LATENCY = float(os.getenv("HTTP_REPLAY_LATENCY", "0"))
+    # Export tracing spans and latency histograms to a JSONL file or an http(s) collector URL
+    TRACE_EXPORT = os.getenv("TRACE_EXPORT")
+    # Append-only SQLite audit log of every write made to Authentik
+    AUDIT_DB = os.getenv("AUDIT_DB", "audit.db")
+    # Request header carrying the signed-in admin (set by the Authentik proxy outpost)
+    AUDIT_ACTOR_HEADER = os.getenv("AUDIT_ACTOR_HEADER", "X-authentik-username")
+    # Local SQLite copy of Authentik's event log; the first ingest reaches back this many days
+    EVENTS_DB = os.getenv("EVENTS_DB", "events.db")
+    EVENTS_BACKFILL_DAYS = float(os.getenv("EVENTS_BACKFILL_DAYS", "90"))
+    # Seconds between event ingests for the Summary page
+    EVENTS_REFRESH = float(os.getenv("EVENTS_REFRESH", "60"))
+    # Summary metrics recorded after every sync, for the Summary page trend charts
+    METRICS_HISTORY_DB = os.getenv("METRICS_HISTORY_DB", "metrics_history.db")
+    # Tail user model events into the local DB every CDC_INTERVAL seconds (0 disables)
+    CDC_INTERVAL = float(os.getenv("CDC_INTERVAL", "0"))
+    # Inactive-account policy: deactivate after N days without a login, delete M days after that (0 turns a stage off)
+    LIFECYCLE_DEACTIVATE_DAYS = float(os.getenv("LIFECYCLE_DEACTIVATE_DAYS", "0"))
+    LIFECYCLE_DELETE_DAYS = float(os.getenv("LIFECYCLE_DELETE_DAYS", "0"))
+    LIFECYCLE_EXEMPT = [name.strip() for name in os.getenv("LIFECYCLE_EXEMPT", "").split(",") if name.strip()]
+    # Scheduled runs (hours between runs, 0 disables), accounts per run (0 for no cap), writes per second, report file
+    LIFECYCLE_INTERVAL = float(os.getenv("LIFECYCLE_INTERVAL", "0"))
+    LIFECYCLE_MAX_PER_RUN = int(os.getenv("LIFECYCLE_MAX_PER_RUN", "100"))
+    LIFECYCLE_RATE = float(os.getenv("LIFECYCLE_RATE", "2"))
+    LIFECYCLE_REPORTS = os.getenv("LIFECYCLE_REPORTS", "lifecycle_runs.jsonl")
+    # Logging goes through a queue to the console and a size-rotated, gzipped JSON file ("" for console only)
+    LOG_FILE = os.getenv("LOG_FILE", "app.log")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 2 ** 20)))
+    LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Serve Prometheus metrics on this port at /metrics (0 disables)
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    # Show the per-rerun performance panel for every session (otherwise opt in with ?debug=1)
+    DEBUG_PANEL = os.getenv("DEBUG_PANEL", "false").lower() == "true"
     INDIVIDUAL_WEBHOOKS = {
         "user_created": os.getenv("WEBHOOK_USER_CREATED", "true").lower() == "true",
         "password_reset": os.getenv("WEBHOOK_PASSWORD_RESET", "true").lower() == "true",
@@ -106,6 +160,9 @@ def save_settings(
     # Add any additional logic needed to persist these changes
 
 def display_settings():
+    # Imported here so the CLI can use Config without loading Streamlit
+    import streamlit as st
+
     st.title("Automation Settings")
 
     # Group settings into expandable sections
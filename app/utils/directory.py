@@ -0,0 +1,358 @@
+# utils/directory.py
+import atexit
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from types import MappingProxyType
+from auth.api import user_write_listeners, audit_log, user_query_cache, get_user, api_priority, PRIORITY_BACKGROUND
+from auth.events import event_store, ingest_events
+from auth.models import user_from_row
+from utils.config import Config
+from utils.helpers import load_LOCAL_DB, write_LOCAL_DB, local_db_sync_guards
+from utils.metrics import registry
+
+# Sessions resolve against the latest snapshot; a few older ones are kept for get_snapshot()
+MAX_SNAPSHOTS = 3
+
+
+class DirectorySnapshot:
+    """An immutable, process-wide view of the user directory keyed by pk.
+
+    Records are frozen User structs shared as-is. Sessions never copy them; they keep
+    a descriptor with the snapshot version and the pks of their result set, and
+    resolve it here on each rerun.
+    """
+
+    __slots__ = ('version', 'created', 'source', '_users')
+
+    def __init__(self, version, users, source):
+        self.version = version
+        self.created = time.time()
+        self.source = source
+        self._users = MappingProxyType(users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, pk):
+        return pk in self._users
+
+    def get(self, pk):
+        return self._users.get(pk)
+
+    def resolve(self, pks):
+        return [self._users[pk] for pk in pks if pk in self._users]
+
+    def users(self):
+        return self._users
+
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()  # Serializes write-through so snapshot and file change together
+_snapshots = OrderedDict()  # version -> DirectorySnapshot
+_version = 0
+_local_db_mtime = None
+_unflushed = {}  # pk -> user (None if deleted) written through to the snapshot but not yet to the file
+_flush_timer = None
+_syncs = 0  # Full syncs streaming into the local DB right now
+_during_sync = {}  # pk -> user written through since the oldest running sync started
+_pending_changes = contextvars.ContextVar('pending_user_changes', default=None)
+
+
+def _publish(users, source):
+    """Store a new snapshot built from a pk -> record dict. Caller holds the lock."""
+    global _version
+    _version += 1
+    snapshot = DirectorySnapshot(_version, users, source)
+    _snapshots[_version] = snapshot
+    while len(_snapshots) > MAX_SNAPSHOTS:
+        _snapshots.popitem(last=False)
+    logging.info(f"Published directory snapshot v{snapshot.version} ({len(snapshot)} users, {source}).")
+    return snapshot
+
+
+def latest_snapshot():
+    """Return the newest snapshot, reloading from the local DB when the file has changed."""
+    global _local_db_mtime
+    try:
+        mtime = os.path.getmtime(Config.LOCAL_DB)
+    except OSError:
+        mtime = None
+    with _lock:
+        if _snapshots and (mtime is None or mtime == _local_db_mtime):
+            return next(reversed(_snapshots.values()))
+    df = load_LOCAL_DB()
+    users = {}
+    if not df.empty and 'pk' in df.columns:
+        records = (user_from_row(row) for row in df.to_dict(orient='records'))
+        users = {user.pk: user for user in records}
+    with _lock:
+        _local_db_mtime = mtime
+        # The file may have been replaced before pending write-throughs reached it, or by a
+        # sync that fetched those users before they were written
+        _overlay(users, _during_sync.items())
+        _overlay(users, _unflushed.items())
+        return _publish(users, 'local_db')
+
+
+def _overlay(users, changes):
+    for pk, user in changes:
+        if user is None:
+            users.pop(pk, None)
+        else:
+            users[pk] = user
+
+
+def _snapshot_users():
+    with _lock:
+        return len(next(reversed(_snapshots.values()))) if _snapshots else None
+
+
+def _username_for(pk):
+    """Username from the newest snapshot, without reloading it."""
+    with _lock:
+        snapshot = next(reversed(_snapshots.values())) if _snapshots else None
+    user = snapshot.get(pk) if snapshot is not None else None
+    return user.username if user is not None else None
+
+
+audit_log.resolve_username = _username_for
+
+registry.gauge("app_local_db_users", "Users in the newest directory snapshot.").set_function(_snapshot_users)
+
+
+def get_snapshot(version):
+    with _lock:
+        return _snapshots.get(version)
+
+
+def select_users(query, pks=None, users=None):
+    """Build the per-session descriptor for a result set.
+
+    Pass pks for results already in the local snapshot, or users for records fetched
+    from the API; those are merged into a new snapshot so the session only keeps pks.
+    """
+    snapshot = latest_snapshot()
+    if users:
+        pks = [user.pk for user in users]
+        with _lock:
+            base = next(reversed(_snapshots.values()))
+            missing = [user for user in users if user.pk not in base]
+            if missing:
+                merged = dict(base.users())
+                merged.update((user.pk, user) for user in missing)
+                base = _publish(merged, 'api')
+            snapshot = base
+    return {'query': query, 'version': snapshot.version, 'pks': list(pks or [])}
+
+
+def resolve_users(descriptor):
+    """Resolve a session descriptor to the shared user records it references.
+
+    Always resolves against the latest snapshot, so written-through updates show up
+    and deleted users drop out of every session's result set.
+    """
+    if not descriptor or not descriptor.get('pks'):
+        return []
+    return latest_snapshot().resolve(descriptor['pks'])
+
+
+def apply_user_changes(changes):
+    """Write (pk, user) changes through to the snapshot and, debounced, to the local DB file; user None deletes.
+
+    The snapshot changes at once. The file is rewritten LOCAL_DB_WRITE_DELAY
+    seconds later, once for every change made in between, since the CSV can only
+    be replaced whole.
+    """
+    if not changes:
+        return
+    with _write_lock:
+        if not _snapshots and not os.path.exists(Config.LOCAL_DB):
+            return  # Nothing local yet; the next sync will pick the change up
+        latest_snapshot()
+        changes = [(pk if user is None else user.pk, user) for pk, user in changes]
+        with _lock:
+            users = dict(next(reversed(_snapshots.values())).users())
+            _overlay(users, changes)
+            _unflushed.update(changes)
+            if _syncs:
+                _during_sync.update(changes)
+            _publish(users, 'write')
+    logging.info(f"Applied {len(changes)} user change(s) to the local DB.")
+    _schedule_flush()
+
+
+def _schedule_flush():
+    global _flush_timer
+    if not Config.LOCAL_DB_WRITE_DELAY:
+        flush_local_db()
+        return
+    with _lock:
+        if _flush_timer is not None:
+            return
+        _flush_timer = threading.Timer(Config.LOCAL_DB_WRITE_DELAY, flush_local_db)
+        _flush_timer.name = "local-db-flush"
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def flush_local_db():
+    """Rewrite the local DB file from the latest snapshot if write-throughs are pending."""
+    global _local_db_mtime, _flush_timer
+    with _write_lock:
+        with _lock:
+            _flush_timer = None
+            if not _unflushed or _syncs:
+                return  # A running sync flushes when it ends, so its file cannot replace this one
+        write_LOCAL_DB(latest_snapshot().users().values())
+        with _lock:
+            _local_db_mtime = os.path.getmtime(Config.LOCAL_DB)
+            _unflushed.clear()
+
+
+atexit.register(flush_local_db)
+
+
+@contextmanager
+def _keep_writes_during_sync():
+    """Keep edits written through while a full sync streams, which its older rows would undo.
+
+    They stay laid over the file the sync writes and are flushed to it once it ends.
+    """
+    global _syncs
+    with _lock:
+        _syncs += 1
+    try:
+        yield
+    finally:
+        with _write_lock, _lock:
+            _syncs -= 1
+            _unflushed.update(_during_sync)
+            if not _syncs:
+                _during_sync.clear()
+            pending = bool(_unflushed)
+        if pending:
+            _schedule_flush()
+
+
+local_db_sync_guards.append(_keep_writes_during_sync)
+
+
+@contextmanager
+def batched_store_writes():
+    """Collect write-through changes made in this block and apply them once at the end."""
+    changes = []
+    token = _pending_changes.set(changes)
+    try:
+        yield
+    finally:
+        _pending_changes.reset(token)
+        apply_user_changes(changes)
+
+
+def _on_user_write(user_id, user, deleted):
+    if user is None and not deleted:
+        return  # Outcome unknown; leave the row for the next sync
+    change = (user.pk if user is not None else user_id, user)
+    pending = _pending_changes.get()
+    if pending is not None:
+        pending.append(change)
+    else:
+        apply_user_changes([change])
+
+
+user_write_listeners.append(_on_user_write)
+
+
+cdc_changes = registry.counter(
+    "app_cdc_changes_total", "Local DB rows changed from Authentik user model events.", ("change",))
+
+
+def apply_model_events(auth_api_url, headers):
+    """Apply user created/updated/deleted events stored since the 'cdc' cursor to the local DB.
+
+    New events are ingested first. Each user they mention is applied once, as of
+    its latest event: deletes need no request, everything else is one GET of that
+    user. The batch is written through in a single snapshot. A user that cannot
+    be read holds the cursor at its first event so the next run retries it.
+    Returns the number of users changed.
+    """
+    ingest_events(auth_api_url, headers)
+    cursor = event_store.cursor('cdc')
+    if cursor is not None:
+        after = cursor[1]
+    else:
+        # First run: start after the events the local DB file already reflects
+        try:
+            after = event_store.last_seq(until=os.path.getmtime(Config.LOCAL_DB))
+        except OSError:
+            after = event_store.last_seq()
+    events = event_store.changes(after)
+    latest, first_seq = {}, {}
+    for event in events:
+        try:
+            pk = int(event['model_pk'])
+        except (TypeError, ValueError):
+            continue
+        latest[pk] = event['action']
+        first_seq.setdefault(pk, event['seq'])
+
+    held, changed = None, 0
+    with batched_store_writes():
+        for pk, action in latest.items():
+            user, deleted = None, action == 'model_deleted'
+            if not deleted:
+                user = get_user(auth_api_url, headers, pk)
+                if user is None:
+                    held = min(held or first_seq[pk], first_seq[pk])
+                    continue
+            user_query_cache.invalidate_user(pk=pk, user=user)
+            _on_user_write(pk, user, deleted)
+            cdc_changes.inc("deleted" if deleted else "upserted")
+            changed += 1
+
+    if events or cursor is None:
+        end = events[-1]['seq'] if events else after
+        event_store.set_cursor('cdc', seq=end if held is None else held - 1)
+    if latest:
+        logging.info(f"Applied {changed} of {len(latest)} changed user(s) from Authentik events to the local DB.")
+    return changed
+
+
+_cdc_thread = None
+_cdc_lock = threading.Lock()
+
+
+def _tail(interval):
+    headers = {
+        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
+        'Content-Type': 'application/json'
+    }
+    # Background polling yields to interactive sessions and bulk actions sharing the scheduler
+    with api_priority(PRIORITY_BACKGROUND):
+        while True:
+            try:
+                apply_model_events(Config.AUTHENTIK_API_URL, headers)
+            except Exception as e:
+                logging.warning(f"Change capture from Authentik events failed: {e}")
+            time.sleep(interval)
+
+
+def start_cdc(interval):
+    """Keep the local DB current from Authentik model events, polled from a daemon thread.
+
+    Safe to call on every rerun; interval 0 disables it.
+    """
+    global _cdc_thread
+    if not interval:
+        return None
+    with _cdc_lock:
+        if _cdc_thread is None:
+            _cdc_thread = threading.Thread(target=_tail, args=(interval,), name="directory-cdc", daemon=True)
+            _cdc_thread.start()
+            logging.info(f"Tailing Authentik user events into the local DB every {interval:g}s.")
+    return _cdc_thread
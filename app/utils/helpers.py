@@ -1,47 +1,94 @@
 # utils/helpers.py
 import pandas as pd
 import os
+import csv
+import tempfile
+import time
+import msgspec
+from contextlib import ExitStack
 from utils.config import Config
 import logging
-from auth.api import list_users_cached
+from auth.api import iter_users
+from auth.models import LOCAL_DB_COLUMNS, user_to_row
+from utils.instrumentation import timed, record_cache
+from utils.metrics import registry, sync_duration, last_sync
+from utils.history import UserMetrics, metrics_history
 # from auth.encryption import encrypt_data, decrypt_data
 from io import StringIO
 
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler("app.log")
-        ]
-    )
+def users_to_frame(users):
+    """Build a DataFrame from User records."""
+    return pd.DataFrame(msgspec.to_builtins(users))
 
+def write_LOCAL_DB(users):
+    """Write User records to the local DB atomically and return how many were written.
+
+    users may be any iterable, including a generator still streaming from the API.
+    Nothing is replaced if it yields no users or fails part way.
+    """
+    # Each writer uses its own temp file so concurrent sessions cannot interleave rows
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(Config.LOCAL_DB)), suffix='.tmp')
+    try:
+        count = 0
+        with os.fdopen(fd, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(LOCAL_DB_COLUMNS)
+            for user in users:
+                writer.writerow(user_to_row(user))
+                count += 1
+        if count:
+            # Swap in the new file only once every row has been written
+            os.replace(tmp_path, Config.LOCAL_DB)
+        return count
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# Context managers entered around every full sync; utils.directory keeps edits made while one streams
+local_db_sync_guards = []
+
+def sync_LOCAL_DB(users):
+    """Write users to the local DB and record a metrics snapshot of them; returns how many were written.
+
+    The summary counts are taken while the users stream past, so the snapshot
+    costs no extra pass over the directory.
+    """
+    metrics = UserMetrics()
+    with ExitStack() as stack:
+        for guard in local_db_sync_guards:
+            stack.enter_context(guard())
+        count = write_LOCAL_DB(metrics.track(users))
+    if count:
+        metrics_history.record(metrics.counts)
+    return count
+
+@timed
 def update_LOCAL_DB():
+    """Stream every user from Authentik into the local DB, one row at a time."""
+    start = time.perf_counter()
     try:
         headers = {
             'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
             'Content-Type': 'application/json'
         }
-        users = list_users_cached(Config.AUTHENTIK_API_URL, headers)
-        if users:
-            df = pd.DataFrame(users)
-            csv_data = df.to_csv(index=False)
-            # encrypted_data = encrypt_data(csv_data)
-            # with open(Config.LOCAL_DB, 'w') as file:
-            #     file.write(encrypted_data)
-            with open(Config.LOCAL_DB, 'w') as file:
-                file.write(csv_data)
-            logging.info("Local DB updated successfully.")
+        count = sync_LOCAL_DB(iter_users(Config.AUTHENTIK_API_URL, headers))
+        if count:
+            logging.info(f"Local DB updated successfully ({count} users).")
         else:
             logging.warning("No users to update in Local DB.")
+        sync_duration.observe(time.perf_counter() - start, "success")
+        last_sync.set(time.time())
     except Exception as e:
+        sync_duration.observe(time.perf_counter() - start, "error")
         logging.error(f"Failed to update Local DB: {e}")
 
 
+@timed
 def load_LOCAL_DB():
-    if not os.path.exists(Config.LOCAL_DB):
+    exists = os.path.exists(Config.LOCAL_DB)
+    record_cache('local_db_file', exists)
+    if not exists:
         update_LOCAL_DB()
     try:
         with open(Config.LOCAL_DB, 'r') as file:
@@ -68,6 +115,7 @@ def load_LOCAL_DB():
 #     results = df[mask]
 #     return results
 
+@timed
 def search_LOCAL_DB(query):
     df = load_LOCAL_DB()
     if df.empty:
@@ -111,3 +159,12 @@ def create_unique_username(desired_username):
             suffix += 1
         return f"{desired_username}{suffix}"
 
+
+def _local_db_bytes():
+    try:
+        return os.path.getsize(Config.LOCAL_DB)
+    except OSError:
+        return None
+
+
+registry.gauge("app_local_db_bytes", "Size of the local DB file.").set_function(_local_db_bytes)
@@ -0,0 +1,123 @@
+# utils/history.py
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from utils.config import Config
+
+METRICS = ("total_users", "active_users", "recently_joined", "recently_deactivated", "inactive_users")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS metrics_snapshots (
+    ts INTEGER PRIMARY KEY,
+    {', '.join(f'{name} INTEGER NOT NULL' for name in METRICS)}
+);
+"""
+
+
+def _parse(value):
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value).astimezone()
+    except ValueError:
+        return None
+
+
+class UserMetrics:
+    """Summary counts accumulated over users as they stream past.
+
+    recently_joined: joined in the last 30 days; recently_deactivated: inactive
+    and last logged in within 30 days; inactive_users: no login in a year.
+    """
+
+    def __init__(self, now=None):
+        # FIXME: Ensure timezone handling is consistent across all datetime operations
+        now = now or datetime.now().astimezone()
+        self._month_ago = now - timedelta(days=30)
+        self._year_ago = now - timedelta(days=365)
+        self.counts = dict.fromkeys(METRICS, 0)
+
+    def add(self, user):
+        counts = self.counts
+        counts['total_users'] += 1
+        counts['active_users'] += bool(user.is_active)
+        joined = _parse(user.date_joined)
+        if joined is not None and joined > self._month_ago:
+            counts['recently_joined'] += 1
+        last_login = _parse(user.last_login)
+        if last_login is not None:
+            if not user.is_active and last_login > self._month_ago:
+                counts['recently_deactivated'] += 1
+            if last_login < self._year_ago:
+                counts['inactive_users'] += 1
+
+    def track(self, users):
+        """Pass users through unchanged, counting each one."""
+        for user in users:
+            self.add(user)
+            yield user
+
+    @classmethod
+    def of(cls, users):
+        metrics = cls()
+        for user in users:
+            metrics.add(user)
+        return metrics.counts
+
+
+class MetricsHistory:
+    """Summary metrics recorded after every sync, one compact row per snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            connection.executescript(_SCHEMA)
+            self._ready = True
+        return connection
+
+    def _read(self, sql, params=()):
+        connection = self._connect()
+        try:
+            connection.row_factory = sqlite3.Row
+            return [dict(row) for row in connection.execute(sql, params)]
+        finally:
+            connection.close()
+
+    def record(self, counts, ts=None):
+        ts = int(ts if ts is not None else time.time())
+        with self._lock:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.execute(
+                        f"INSERT OR REPLACE INTO metrics_snapshots (ts, {', '.join(METRICS)}) "
+                        f"VALUES (?, {', '.join('?' * len(METRICS))})",
+                        (ts, *(int(counts[name]) for name in METRICS)))
+            finally:
+                connection.close()
+
+    def latest(self):
+        """The newest snapshot as {'ts', metric: value...}, or None before the first sync."""
+        rows = self._read("SELECT * FROM metrics_snapshots ORDER BY ts DESC LIMIT 1")
+        return rows[0] if rows else None
+
+    def at(self, ts):
+        """The newest snapshot taken at or before the unix time ts, if any."""
+        rows = self._read("SELECT * FROM metrics_snapshots WHERE ts <= ? ORDER BY ts DESC LIMIT 1", (int(ts),))
+        return rows[0] if rows else None
+
+    def daily(self, since=None):
+        """The last snapshot of each local calendar day since the unix time since, oldest first."""
+        return self._read(
+            "SELECT date(ts, 'unixepoch', 'localtime') AS day, * FROM metrics_snapshots WHERE ts IN ("
+            "SELECT MAX(ts) FROM metrics_snapshots WHERE ts >= ? GROUP BY date(ts, 'unixepoch', 'localtime')"
+            ") ORDER BY ts", (int(since or 0),))
+
+
+metrics_history = MetricsHistory(Config.METRICS_HISTORY_DB)
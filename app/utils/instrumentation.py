@@ -0,0 +1,152 @@
+# utils/instrumentation.py
+import cProfile
+import contextvars
+import io
+import json
+import logging
+import pstats
+import time
+from functools import wraps
+from utils.tracing import start_span, end_span
+from utils.metrics import cache_requests, rerun_duration
+
+# Structured perf records go to their own logger so they can be filtered or routed separately
+perf_logger = logging.getLogger("perf")
+
+# Streamlit runs each session's script on its own thread, so a rerun's stats live in a context
+# variable; worker pools started with contextvars.copy_context() keep reporting into the same rerun
+_current = contextvars.ContextVar('rerun_stats', default=None)
+
+
+class RerunStats:
+    """Timings collected during a single Streamlit rerun."""
+
+    def __init__(self, page=None):
+        self.page = page
+        self.started = time.perf_counter()
+        self.duration = None
+        self.renders = []      # [{'name', 'depth', 'seconds'}]
+        self.http_calls = []   # [{'method', 'url', 'status', 'seconds'}]
+        self.cache = {}        # {name: {'hits': int, 'misses': int}}
+        self.profile = None
+        self.profile_report = None
+        self.span = None
+        self._depth = 0
+
+    @property
+    def http_seconds(self):
+        return sum(call['seconds'] for call in self.http_calls)
+
+    def to_dict(self):
+        return {
+            "page": self.page,
+            "duration_ms": round((self.duration or 0) * 1000, 2),
+            "renders": [
+                {"name": r['name'], "depth": r['depth'], "ms": round(r['seconds'] * 1000, 2)}
+                for r in self.renders
+            ],
+            "http": {
+                "count": len(self.http_calls),
+                "ms": round(self.http_seconds * 1000, 2),
+                "calls": [
+                    {
+                        "method": c['method'],
+                        "url": c['url'],
+                        "status": c['status'],
+                        "ms": round(c['seconds'] * 1000, 2),
+                    }
+                    for c in self.http_calls
+                ],
+            },
+            "cache": self.cache,
+        }
+
+
+def start_rerun(page=None, profile=False):
+    """Begin collecting stats for the current rerun, optionally under cProfile."""
+    stats = RerunStats(page)
+    # Root span for everything the rerun does; render functions and API calls nest under it
+    stats.span = start_span("rerun")
+    if profile:
+        stats.profile = cProfile.Profile()
+        try:
+            stats.profile.enable()
+        except ValueError as e:
+            # Another profiler (e.g. a concurrent session's capture) is already active
+            logging.warning(f"cProfile capture skipped: {e}")
+            stats.profile = None
+    _current.set(stats)
+    return stats
+
+
+def current_rerun():
+    return _current.get()
+
+
+def finish_rerun():
+    """Stop collecting, write one structured log line and return the stats."""
+    stats = current_rerun()
+    if stats is None:
+        return None
+    stats.duration = time.perf_counter() - stats.started
+    rerun_duration.observe(stats.duration, stats.page or "none")
+    if stats.span is not None:
+        stats.span.set(page=stats.page)
+        end_span(stats.span)
+    if stats.profile is not None:
+        stats.profile.disable()
+        buffer = io.StringIO()
+        pstats.Stats(stats.profile, stream=buffer).sort_stats('cumulative').print_stats(30)
+        stats.profile_report = buffer.getvalue()
+        perf_logger.info(f"cProfile for page {stats.page}:\n{stats.profile_report}")
+    perf_logger.info(json.dumps({"event": "rerun", **stats.to_dict()}))
+    _current.set(None)
+    return stats
+
+
+def timed(func):
+    """Record the wall time of a render function in the current rerun, and trace it as a span."""
+    name = f"{func.__module__}.{func.__name__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = current_rerun()
+        if stats is None:
+            return func(*args, **kwargs)
+        entry = {'name': name, 'depth': stats._depth, 'seconds': 0.0}
+        stats.renders.append(entry)
+        stats._depth += 1
+        span = start_span(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            entry['seconds'] = time.perf_counter() - start
+            stats._depth -= 1
+            end_span(span, error)
+    return wrapper
+
+
+def record_http(method, url, status, seconds):
+    """Record one outbound HTTP call; status is None when the request raised."""
+    stats = current_rerun()
+    if stats is not None:
+        stats.http_calls.append({
+            'method': method,
+            'url': url.split('?', 1)[0],
+            'status': status,
+            'seconds': seconds,
+        })
+
+
+def record_cache(name, hit):
+    """Record a hit or miss against a named cache."""
+    cache_requests.inc(name, "hit" if hit else "miss")
+    stats = current_rerun()
+    if stats is not None:
+        counts = stats.cache.setdefault(name, {'hits': 0, 'misses': 0})
+        counts['hits' if hit else 'misses'] += 1
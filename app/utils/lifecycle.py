@@ -0,0 +1,280 @@
+# utils/lifecycle.py
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from auth.api import (
+    RequestScheduler,
+    api_priority,
+    delete_user,
+    get_user,
+    update_user_attributes,
+    PRIORITY_BULK
+)
+from auth.audit import audit_actor
+from utils.config import Config
+from utils.directory import batched_store_writes, latest_snapshot
+
+# Stamped on users the policy deactivates; the delete countdown starts from it
+DEACTIVATED_AT = 'deactivated_at'
+# Users with this attribute set, and service accounts, are never touched
+EXEMPT_ATTRIBUTE = 'lifecycle_exempt'
+EXEMPT_TYPES = ('service_account', 'internal_service_account')
+
+DAY = 86400
+
+
+class LifecyclePolicy:
+    """Deactivate users after deactivate_days without a login, delete them delete_days after that.
+
+    Users who never logged in count from their join date, and users reactivated
+    after the policy deactivated them from that deactivation. Only users the policy
+    itself deactivated (stamped deactivated_at) are ever deleted. Either stage is
+    off when its days are 0. exempt is a collection of usernames left alone.
+    """
+
+    def __init__(self, deactivate_days=0, delete_days=0, exempt=()):
+        self.deactivate_days = float(deactivate_days or 0)
+        self.delete_days = float(delete_days or 0)
+        self.exempt = frozenset(exempt)
+
+    @classmethod
+    def from_config(cls):
+        return cls(Config.LIFECYCLE_DEACTIVATE_DAYS, Config.LIFECYCLE_DELETE_DAYS, Config.LIFECYCLE_EXEMPT)
+
+    @property
+    def enabled(self):
+        return bool(self.deactivate_days or self.delete_days)
+
+    def to_dict(self):
+        return {"deactivate_days": self.deactivate_days, "delete_days": self.delete_days,
+                "exempt": sorted(self.exempt)}
+
+
+def _dates(values):
+    return pd.to_datetime(pd.Series(values, dtype=object), utc=True, format='ISO8601', errors='coerce')
+
+
+def _frame(users):
+    """The columns the rules look at, one row per user."""
+    users = list(users)
+    frame = pd.DataFrame({
+        'pk': np.fromiter((user.pk for user in users), dtype=np.int64, count=len(users)),
+        'username': [user.username for user in users],
+        'email': [user.email for user in users],
+        'type': [user.type for user in users],
+        'is_active': np.fromiter((user.is_active for user in users), dtype=bool, count=len(users)),
+        'exempt': np.fromiter((bool(user.attributes.get(EXEMPT_ATTRIBUTE)) for user in users),
+                              dtype=bool, count=len(users)),
+    })
+    frame['last_active'] = _dates([user.last_login or user.date_joined for user in users])
+    frame['deactivated_at'] = _dates([user.attributes.get(DEACTIVATED_AT) for user in users])
+    return frame
+
+
+def _due(frame, policy, now):
+    """Boolean masks of the rows due for deactivation and for deletion at now."""
+    # An account reactivated after the policy deactivated it gets a fresh deactivate_days from the stamp
+    stamped = frame['deactivated_at']
+    idle = (now - frame['last_active'].mask(stamped > frame['last_active'], stamped)).dt.total_seconds() / DAY
+    protected = frame['exempt'] | frame['type'].isin(EXEMPT_TYPES) | frame['username'].isin(policy.exempt)
+    candidates = ~protected & frame['last_active'].notna()
+    deactivate = pd.Series(False, index=frame.index)
+    delete = pd.Series(False, index=frame.index)
+    if policy.deactivate_days:
+        deactivate = candidates & frame['is_active'] & (idle >= policy.deactivate_days)
+    if policy.delete_days:
+        # Only users the policy deactivated are deleted, counting from its stamp; users deactivated by
+        # hand have none, and a stamp older than a later login is from an earlier cycle
+        since = (now - stamped).dt.total_seconds() / DAY
+        delete = candidates & ~frame['is_active'] & (stamped >= frame['last_active']) & (since >= policy.delete_days)
+    return deactivate, delete, idle
+
+
+_frame_cache = (None, None)  # (snapshot version, frame)
+_frame_lock = threading.Lock()
+
+
+def _snapshot_frame():
+    global _frame_cache
+    snapshot = latest_snapshot()
+    with _frame_lock:
+        if _frame_cache[0] != snapshot.version:
+            _frame_cache = (snapshot.version, _frame(snapshot.users().values()))
+        return _frame_cache[1]
+
+
+class Plan:
+    """Users the policy would act on, longest idle first: deactivate and delete DataFrames."""
+
+    COLUMNS = ['pk', 'username', 'email', 'last_active', 'idle_days', 'deactivated_at']
+
+    def __init__(self, policy, now, deactivate, delete):
+        self.policy = policy
+        self.now = now
+        self.deactivate = deactivate
+        self.delete = delete
+
+
+def evaluate(policy, now=None):
+    """Apply the policy to the local snapshot without changing anything."""
+    now = now or datetime.now(timezone.utc)
+    frame = _snapshot_frame()
+    deactivate, delete, idle = _due(frame, policy, now)
+    frame = frame.assign(idle_days=idle.round().astype('Int64'))
+
+    def rows(mask):
+        return frame.loc[mask, Plan.COLUMNS].sort_values('idle_days', ascending=False).reset_index(drop=True)
+    return Plan(policy, now, rows(deactivate), rows(delete))
+
+
+def _still_due(user, policy, stage, now):
+    """Re-check one freshly fetched user against the same rules before acting on them."""
+    deactivate, delete, _ = _due(_frame([user]), policy, now)
+    return bool((deactivate if stage == 'deactivate' else delete).iloc[0])
+
+
+_run_lock = threading.Lock()
+
+
+def run_policy(policy, auth_api_url, headers, dry_run=False, max_actions=None, rate=None, trigger="manual"):
+    """Carry out the policy as one paced batch job and return its report (also appended to LIFECYCLE_REPORTS).
+
+    Deactivations go first, then deletions, longest idle first, up to max_actions
+    (LIFECYCLE_MAX_PER_RUN); the rest is deferred to the next run. Each user is
+    fetched again and re-checked right before the write, so a stale local DB
+    cannot cause a wrong deactivation. Writes are paced at rate per second
+    (LIFECYCLE_RATE) on top of the shared Authentik limit, at bulk priority.
+    Returns None if another run is in progress.
+    """
+    if not _run_lock.acquire(blocking=False):
+        logging.warning("Lifecycle run skipped: another run is in progress.")
+        return None
+    try:
+        return _run(policy, auth_api_url, headers, dry_run, max_actions, rate, trigger)
+    finally:
+        _run_lock.release()
+
+
+def _run(policy, auth_api_url, headers, dry_run, max_actions, rate, trigger):
+    started = time.time()
+    plan = evaluate(policy)
+    limit = Config.LIFECYCLE_MAX_PER_RUN if max_actions is None else max_actions
+    # Deactivation is reversible, so a backlog of deletions never holds it up
+    work = [('deactivate', row) for row in plan.deactivate.itertuples()] + \
+           [('delete', row) for row in plan.delete.itertuples()]
+    deferred = work[limit:] if limit else []
+    work = work[:limit] if limit else work
+    report = {
+        "id": uuid.uuid4().hex[:12],
+        "trigger": trigger,
+        "dry_run": dry_run,
+        "started": datetime.fromtimestamp(started, timezone.utc).isoformat(timespec='seconds'),
+        "policy": policy.to_dict(),
+        "planned": {"deactivate": len(plan.deactivate), "delete": len(plan.delete)},
+        "deactivated": [],
+        "deleted": [],
+        "skipped": [],
+        "failed": [],
+        "deferred": len(deferred),
+    }
+    if dry_run:
+        report["deactivated"] = [row.username for stage, row in work if stage == 'deactivate']
+        report["deleted"] = [row.username for stage, row in work if stage == 'delete']
+    else:
+        pacer = RequestScheduler(rate or Config.LIFECYCLE_RATE, 1)
+        stamp = plan.now.isoformat(timespec='seconds')
+        with audit_actor('lifecycle') if trigger == 'schedule' else nullcontext(), \
+                api_priority(PRIORITY_BULK), batched_store_writes():
+            for stage, row in work:
+                pacer.acquire()
+                user = get_user(auth_api_url, headers, row.pk)
+                if user is None:
+                    report["failed"].append({"username": row.username, "stage": stage, "reason": "could not be read"})
+                    continue
+                if not _still_due(user, policy, stage, datetime.now(timezone.utc)):
+                    report["skipped"].append({"username": row.username, "stage": stage, "reason": "no longer due"})
+                    continue
+                pacer.acquire()
+                if stage == 'delete':
+                    ok = delete_user(auth_api_url, headers, row.pk)
+                else:
+                    ok = update_user_attributes(auth_api_url, headers, row.pk, {DEACTIVATED_AT: stamp},
+                                                is_active=False, current=user) is not None
+                if ok:
+                    report["deleted" if stage == 'delete' else "deactivated"].append(row.username)
+                else:
+                    report["failed"].append({"username": row.username, "stage": stage, "reason": "write failed"})
+    report["finished"] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    report["seconds"] = round(time.time() - started, 1)
+    _save_report(report)
+    logging.info("Lifecycle run %s (%s%s): deactivated %d, deleted %d, skipped %d, failed %d, deferred %d.",
+                 report["id"], trigger, ", dry run" if dry_run else "", len(report["deactivated"]),
+                 len(report["deleted"]), len(report["skipped"]), len(report["failed"]), report["deferred"])
+    return report
+
+
+def _save_report(report):
+    try:
+        with open(Config.LIFECYCLE_REPORTS, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(report, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logging.error(f"Could not save lifecycle report {report['id']}: {e}")
+
+
+def recent_reports(limit=20):
+    """The newest run reports first."""
+    if not os.path.exists(Config.LIFECYCLE_REPORTS):
+        return []
+    with open(Config.LIFECYCLE_REPORTS, encoding='utf-8') as file:
+        lines = file.readlines()[-limit:]
+    reports = []
+    for line in reversed(lines):
+        try:
+            reports.append(json.loads(line))
+        except ValueError:
+            continue
+    return reports
+
+
+_schedule_thread = None
+_schedule_lock = threading.Lock()
+
+
+def _scheduled(interval):
+    headers = {
+        'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}",
+        'Content-Type': 'application/json'
+    }
+    while True:
+        time.sleep(interval)
+        policy = LifecyclePolicy.from_config()
+        if not policy.enabled:
+            continue
+        try:
+            run_policy(policy, Config.AUTHENTIK_API_URL, headers, trigger="schedule")
+        except Exception as e:
+            logging.error(f"Scheduled lifecycle run failed: {e}")
+
+
+def start_lifecycle_schedule(interval_hours):
+    """Run the configured policy every interval_hours from a daemon thread; safe to call on every rerun.
+
+    The first run happens one interval after start, not at start-up.
+    """
+    global _schedule_thread
+    if not interval_hours or not LifecyclePolicy.from_config().enabled:
+        return None
+    with _schedule_lock:
+        if _schedule_thread is None:
+            _schedule_thread = threading.Thread(target=_scheduled, args=(interval_hours * 3600,),
+                                                name="lifecycle-schedule", daemon=True)
+            _schedule_thread.start()
+            logging.info(f"Lifecycle policy scheduled every {interval_hours:g}h.")
+    return _schedule_thread
@@ -0,0 +1,142 @@
+# utils/logs.py
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+from datetime import datetime, timezone
+from auth.cassette import REDACTED, redact
+from utils.config import Config
+
+# key: value / key=value pairs whose value must not reach a log line
+_SECRET_PAIR = re.compile(
+    r"""(?i)(['"]?(?:password|new_password|secret|webhook_secret|token|api[_-]?key|authorization)['"]?\s*[:=]\s*)"""
+    r"""(?:'[^']*'|"[^"]*"|(?:bearer\s+)?[^\s,;}&]+)""")
+_BEARER = re.compile(r"(?i)\b(bearer\s+)[A-Za-z0-9._~+/=-]+")
+
+
+def redact_text(text):
+    """Mask secret values in an already formatted message."""
+    return _BEARER.sub(rf"\g<1>{REDACTED}", _SECRET_PAIR.sub(rf"\g<1>'{REDACTED}'", text))
+
+
+def _message(record):
+    """The record's message with secrets masked, both in dict/list arguments and in the text."""
+    if isinstance(record.args, dict):
+        record.args = redact(record.args)
+    elif record.args:
+        record.args = tuple(redact(arg) if isinstance(arg, (dict, list)) else arg for arg in record.args)
+    return redact_text(record.getMessage())
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without formatting them.
+
+    The stock handler renders the message in the caller; here only exception
+    text is captured (tracebacks hold frames), so the %-formatting of a record
+    happens on the listener thread. Arguments must therefore not be mutated
+    after the logging call. A full queue drops the record rather than block.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, thread and exception."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _message(record),
+            "thread": record.threadName,
+        }
+        if record.exc_text:
+            entry["exc"] = redact_text(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The previous console format, with secrets masked."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def formatMessage(self, record):
+        record.message = _message(record)
+        if record.exc_text:
+            record.exc_text = redact_text(record.exc_text)
+        return super().formatMessage(record)
+
+    def formatException(self, exc_info):
+        return redact_text(super().formatException(exc_info))
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as plain, gzip.open(dest, 'wb') as packed:
+        shutil.copyfileobj(plain, packed)
+    os.remove(source)
+
+
+def _file_handler(path, max_bytes, backups):
+    """Size-rotated log file whose rotated copies are gzipped (app.log.1.gz, ...)."""
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding='utf-8', delay=True)
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging():
+    """Route all logging through a queue to a JSON file and the console; safe to call on every rerun.
+
+    Callers only pay for enqueueing a record. Formatting, redaction of passwords and
+    tokens, rotation, compression and disk writes all happen on the listener thread.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+        console = logging.StreamHandler()
+        console.setFormatter(TextFormatter())
+        handlers = [console]
+        if Config.LOG_FILE:
+            handlers.append(_file_handler(Config.LOG_FILE, Config.LOG_MAX_BYTES, Config.LOG_BACKUPS))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+        handler = _QueueHandler(log_queue)
+        root = logging.getLogger()
+        # Replace the basicConfig console handler other modules set up at import time
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(Config.LOG_LEVEL)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
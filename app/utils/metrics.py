@@ -0,0 +1,259 @@
+# utils/metrics.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers a fast local DB search up to a full 100k-user sync
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Current value per label set, either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+        self._function = None
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, *labels):
+        return self._values.get(self._key(labels))
+
+    def set_function(self, function):
+        """function() returns a number, or a {label tuple: number} dict for labelled gauges."""
+        self._function = function
+        return self
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logging.warning(f"Metric {self.name} could not be read: {e}")
+                return []
+            if value is None:
+                return []
+            values = value.items() if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, seconds, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += seconds
+
+    def _samples(self):
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        lines = []
+        for key, counts in values:
+            running = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                running += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [le])} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {running}")
+        return lines
+
+
+class Registry:
+    """All metrics of the process; rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        # Modules may be re-imported by Streamlit, so registering twice returns the same metric
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Metrics recorded from more than one module
+api_requests = registry.counter(
+    "app_api_requests_total", "Outbound API calls by service, method, endpoint template and status.",
+    ("service", "method", "endpoint", "status"))
+api_duration = registry.histogram(
+    "app_api_request_duration_seconds", "Outbound API call duration, including 429 waits.",
+    ("service", "endpoint"))
+cache_requests = registry.counter(
+    "app_cache_requests_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+rerun_duration = registry.histogram(
+    "app_rerun_duration_seconds", "Streamlit script rerun duration by page.", ("page",))
+sync_duration = registry.histogram(
+    "app_sync_duration_seconds", "Full Authentik to local DB sync duration.", ("outcome",))
+last_sync = registry.gauge("app_last_sync_timestamp_seconds", "Unix time of the last successful sync.")
+
+# Sessions that reran within this many seconds count as active
+SESSION_IDLE_SECONDS = 300
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_seen(session_id):
+    """Mark a browser session as active; called once per rerun."""
+    now = time.monotonic()
+    with _sessions_lock:
+        _sessions[session_id] = now
+        if len(_sessions) > 1000:
+            for stale in [key for key, seen in _sessions.items() if now - seen > SESSION_IDLE_SECONDS]:
+                del _sessions[stale]
+
+
+def _active_sessions():
+    cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+    with _sessions_lock:
+        return sum(1 for seen in _sessions.values() if seen >= cutoff)
+
+
+def _sync_lag():
+    value = last_sync.get()
+    return time.time() - value if value else None
+
+
+registry.gauge("app_active_sessions", f"Browser sessions that reran in the last {SESSION_IDLE_SECONDS}s.") \
+    .set_function(_active_sessions)
+registry.gauge("app_sync_lag_seconds", "Seconds since the last successful sync.").set_function(_sync_lag)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would drown the app log
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics on a side port from a daemon thread; safe to call on every rerun."""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _Handler)
+            except OSError as e:
+                logging.error(f"Metrics endpoint could not listen on {host}:{port}: {e}")
+                _server = False
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logging.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return _server or None
@@ -0,0 +1,337 @@
+# benchmarks/fake_authentik.py
+# Local stand-in for the Authentik, Shlink and webhook endpoints the app calls,
+# so auth/api.py can be measured and exercised offline.
+#
+# Usage: python benchmarks/fake_authentik.py --users 10000 --latency 0.05 --error-rate 0.01 --throttle-rate 0.02
+# then point the app at it:
+#   AUTHENTIK_API_URL=http://127.0.0.1:9000/api/v3
+#   SHLINK_URL=http://127.0.0.1:9000/rest/v3/short-urls
+#   WEBHOOK_URL=http://127.0.0.1:9000/webhook
+#
+# In-process use:
+#   server = FakeAuthentik(users=1000).start()
+#   ... server.url, server.requests, server.webhooks ...
+#   server.stop()
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+API = "/api/v3"
+USER_PATH = re.compile(rf"^{API}/core/users/(\d+)/(?:(set_password|recovery|force_password_reset)/)?$")
+
+# Query parameters Authentik filters the user list on
+USER_FILTERS = ('username', 'email', 'name', 'type', 'path', 'is_active', 'is_superuser')
+
+
+def make_users(count):
+    """Plain generated users; pass your own list for realistic data."""
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "pk": pk,
+            "username": f"user-{pk}",
+            "name": f"User {pk}",
+            "email": f"user-{pk}@example.org",
+            "is_active": pk % 7 != 0,
+            "last_login": (start + timedelta(days=pk % 600)).isoformat() if pk % 5 else None,
+            "date_joined": (start + timedelta(minutes=pk * 13)).isoformat(),
+            "type": "external" if pk % 10 == 0 else "internal",
+            "path": "users",
+            "is_superuser": False,
+            "groups": [],
+            "attributes": {"intro": f"Intro for user {pk}"} if pk % 3 == 0 else {},
+        }
+        for pk in range(1, count + 1)
+    ]
+
+
+def _paginate(items, query, page_size_default=20):
+    page_size = max(1, int(query.get('page_size', [page_size_default])[0]))
+    page = max(1, int(query.get('page', [1])[0]))
+    total_pages = max(1, -(-len(items) // page_size))
+    start = (page - 1) * page_size
+    return {
+        "pagination": {
+            "next": page + 1 if page < total_pages else 0,
+            "previous": page - 1 if page > 1 else 0,
+            "count": len(items),
+            "current": page,
+            "total_pages": total_pages,
+            "start_index": start + 1 if items else 0,
+            "end_index": min(start + page_size, len(items)),
+        },
+        "results": items[start:start + page_size],
+    }
+
+
+def _matches_search(user, term):
+    term = term.lower()
+    fields = (user['username'], user.get('name') or '', user.get('email') or '',
+              json.dumps(user.get('attributes', {}), ensure_ascii=False))
+    return any(term in field.lower() for field in fields)
+
+
+class FakeAuthentik:
+    """In-memory Authentik/Shlink/webhook server with injectable latency, errors and 429s.
+
+    latency is added to every request (plus up to jitter seconds). error_rate and
+    throttle_rate are the chances that a request gets a 503 or a 429 with
+    Retry-After instead of being handled. requests counts calls per endpoint
+    template and status, for asserting how many calls an operation made.
+    """
+
+    def __init__(self, users=1000, events=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=1, seed=None, host="127.0.0.1", port=0):
+        self.lock = threading.Lock()
+        user_list = make_users(users) if isinstance(users, int) else users
+        self.users = {user['pk']: dict(user) for user in user_list}
+        self.next_pk = max(self.users, default=0) + 1
+        self.events = list(events or [])
+        self.invitations = {}
+        self.short_urls = {}
+        self.webhooks = []
+        self.passwords = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = Counter()  # (method, endpoint template, status) -> count
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables pointing the app at this server."""
+        return {
+            "AUTHENTIK_API_URL": f"{self.url}{API}",
+            "SHLINK_URL": f"{self.url}/rest/v3/short-urls",
+            "WEBHOOK_URL": f"{self.url}/webhook",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-authentik", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def request_count(self, endpoint=None, method=None):
+        return sum(n for (m, e, _), n in self.requests.items()
+                   if (endpoint is None or e == endpoint) and (method is None or m == method))
+
+    def _fault(self):
+        """Status to fail this request with, or None to handle it."""
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def _event(self, action, user, **context):
+        self.events.append({
+            "pk": str(uuid.uuid4()),
+            "user": {"pk": user['pk'], "username": user['username'], "email": user.get('email')},
+            "action": action,
+            "app": "authentik.core",
+            "context": context,
+            "client_ip": "127.0.0.1",
+            "created": datetime.now(timezone.utc).isoformat(),
+        })
+
+    # Route handlers return (status, body, endpoint template)
+
+    def list_users(self, query):
+        users = list(self.users.values())
+        if 'search' in query:
+            users = [u for u in users if _matches_search(u, query['search'][0])]
+        for key in USER_FILTERS:
+            if key in query:
+                value = query[key][0]
+                users = [u for u in users if str(u.get(key)).lower() == value.lower()]
+        return 200, _paginate(users, query), "/core/users/"
+
+    def create_user(self, body):
+        if any(u['username'] == body.get('username') for u in self.users.values()):
+            return 400, {"username": ["This field must be unique."]}, "/core/users/"
+        user = {"pk": self.next_pk, "name": "", "email": "", "is_active": True, "last_login": None,
+                "date_joined": datetime.now(timezone.utc).isoformat(), "type": "internal",
+                "path": "users", "is_superuser": False, "groups": [], "attributes": {}, **body}
+        self.users[user['pk']] = user
+        self.next_pk += 1
+        self._event("model_created", user, model={"app": "authentik_core", "model_name": "user", "pk": user['pk']})
+        return 201, user, "/core/users/"
+
+    def user_detail(self, method, pk, action, body):
+        template = f"/core/users/{{pk}}/{action + '/' if action else ''}"
+        user = self.users.get(pk)
+        if user is None:
+            return 404, {"detail": "Not found."}, template
+        if action == 'set_password':
+            self.passwords[pk] = body.get('password')
+            return 204, None, template
+        if action == 'recovery':
+            return 200, {"link": f"{self.url}/if/flow/recovery/?token={uuid.uuid4().hex}"}, template
+        if action == 'force_password_reset':
+            return 204, None, template
+        if method == 'GET':
+            return 200, user, template
+        if method == 'PATCH':
+            user.update(body)
+            self._event("model_updated", user, model={"app": "authentik_core", "model_name": "user", "pk": pk})
+            return 200, user, template
+        if method == 'DELETE':
+            del self.users[pk]
+            self._event("model_deleted", user, model={"app": "authentik_core", "model_name": "user", "pk": pk})
+            return 204, None, template
+        return 405, {"detail": "Method not allowed."}, template
+
+    def invitations_endpoint(self, method, query, body):
+        template = "/stages/invitation/invitations/"
+        if method == 'POST':
+            invite = {"pk": str(uuid.uuid4()), "name": body.get('name'), "expires": body.get('expires'),
+                      "fixed_data": body.get('fixed_data', {}), "single_use": body.get('single_use', True),
+                      "flow": body.get('flow')}
+            self.invitations[invite['pk']] = invite
+            return 201, invite, template
+        invites = list(self.invitations.values())
+        if 'name' in query:
+            invites = [i for i in invites if i['name'] == query['name'][0]]
+        return 200, _paginate(invites, query), template
+
+    def events_endpoint(self, query):
+        events = self.events
+        if 'action' in query:
+            events = [e for e in events if e['action'] == query['action'][0]]
+        if 'username' in query:
+            events = [e for e in events if e['user'].get('username') == query['username'][0]]
+        # Newest first, like Authentik's default ordering
+        return 200, _paginate(list(reversed(events)), query), "/events/events/"
+
+    def shlink(self, body):
+        slug = body.get('customSlug') or uuid.uuid4().hex[:8]
+        self.short_urls[slug] = body.get('longUrl')
+        return 200, {"shortUrl": f"{self.url}/s/{slug}", "shortCode": slug, "longUrl": body.get('longUrl')}, "shlink"
+
+    def route(self, method, path, query, body):
+        if path == "/_stats":
+            # Test hook: request counts per endpoint; POST resets them
+            counts = [{"method": m, "endpoint": e, "status": st, "count": n} for (m, e, st), n in self.requests.items()]
+            if method == 'POST':
+                self.requests.clear()
+            return 200, counts, None
+        if path.startswith(API):
+            match = USER_PATH.match(path)
+            if match:
+                return self.user_detail(method, int(match.group(1)), match.group(2), body)
+            rest = path[len(API):]
+            if rest == "/core/users/":
+                return self.list_users(query) if method == 'GET' else self.create_user(body)
+            if rest == "/stages/invitation/invitations/":
+                return self.invitations_endpoint(method, query, body)
+            if rest in ("/events", "/events/", "/events/events/"):
+                return self.events_endpoint(query)
+        elif path.startswith("/rest/") and path.rstrip('/').endswith("short-urls"):
+            return self.shlink(body)
+        elif path.rstrip('/') == "/webhook":
+            self.webhooks.append(body)
+            return 200, {"ok": True}, "webhook"
+        return 404, {"detail": "Not found."}, path
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this keep-alive responses stall on Nagle + delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b""
+                status = fake._fault() if parsed.path != "/_stats" else None
+                if status == 429:
+                    fake.requests[(self.command, "throttled", 429)] += 1
+                    return self._send(429, {"detail": "Request was throttled."}, {"Retry-After": str(fake.retry_after)})
+                if status:
+                    fake.requests[(self.command, "error", status)] += 1
+                    return self._send(status, {"detail": "Injected failure."})
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    return self._send(400, {"detail": "Invalid JSON."})
+                with fake.lock:
+                    status, payload, endpoint = fake.route(self.command, parsed.path, parse_qs(parsed.query), body)
+                    if endpoint is not None:
+                        fake.requests[(self.command, endpoint, status)] += 1
+                self._send(status, payload)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Authentik, Shlink and webhook server.")
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra seconds per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, help="Seed for the synthetic directory and injected faults")
+    parser.add_argument('--plain', action='store_true', help="Serve uniform user-N records instead of synthetic ones")
+    args = parser.parse_args()
+    from synthetic import generate_users
+    users = args.users if args.plain else generate_users(args.users, seed=args.seed or 0)
+    server = FakeAuthentik(users=users, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed,
+                           port=args.port)
+    for key, value in server.env().items():
+        print(f"{key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps({f"{m} {e} {s}": n for (m, e, s), n in server.requests.most_common()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# benchmarks/load_test.py
+# Simulate concurrent admin sessions against the Streamlit app and the fake Authentik server.
+#
+# Usage: python benchmarks/load_test.py --sessions 1 2 4 8 16 --duration 30 --users 10000 --latency 0.02
+#
+# Every session is a Streamlit AppTest instance running app/main.py in this process, the
+# way the real server runs one script thread per browser tab, so CPU and memory are shared
+# just as they would be in one container. Sessions loop over a weighted mix of scripts:
+#   search        List and Manage Users -> type a term -> Search
+#   bulk          search, then a merged bulk PATCH of up to 20 of the results
+#   create_user   Create User -> first/last name -> Submit
+#   create_invite Create Invite -> label -> Submit
+# AgGrid row selection cannot be driven headlessly, so the bulk script sends the same
+# apply_user_updates call display_user_list makes for its selection instead of clicking Apply.
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'app'))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_authentik import FakeAuthentik  # noqa: E402
+from synthetic import generate_users  # noqa: E402
+from run import _env  # noqa: E402
+
+SCRIPTS = {"search": 0.5, "bulk": 0.2, "create_user": 0.15, "create_invite": 0.15}
+SEARCH_TERMS = ["john", "maria-g", "proton.me", "osint", "müller", "d", "zoë", "nosuchuser"]
+
+
+def _rss_mb():
+    """Current resident set size (Linux); falls back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]  # noqa: E731
+    return {"n": len(ordered), "p50_ms": round(statistics.median(ordered) * 1000, 1),
+            "p95_ms": round(pick(0.95) * 1000, 1), "p99_ms": round(pick(0.99) * 1000, 1)}
+
+
+class Session:
+    """One simulated admin: an AppTest instance plus a seeded choice of scripts."""
+
+    def __init__(self, number, seed):
+        from streamlit.testing.v1 import AppTest
+        self.number = number
+        self.rng = random.Random(seed)
+        self.at = AppTest.from_file(os.path.join(APP_DIR, "main.py"), default_timeout=120)
+        self.samples = []  # (script, seconds) per rerun
+        self.errors = 0
+        self.created = 0
+
+    def _rerun(self, script, element=None):
+        start = time.perf_counter()
+        (element or self.at).run()
+        self.samples.append((script, time.perf_counter() - start))
+        if self.at.exception or self.at.error:
+            self.errors += 1
+
+    def _operation(self, script, operation):
+        self.at.selectbox(key="operation_selection").set_value(operation)
+        self._rerun(script)
+
+    def _submit(self, script, label):
+        button = next(b for b in self.at.button if b.label == label)
+        self._rerun(script, button.click())
+
+    def search(self, script="search"):
+        self._operation(script, "List and Manage Users")
+        self.at.text_input(key="username_input").input(self.rng.choice(SEARCH_TERMS))
+        self._submit(script, "Search")
+
+    def bulk(self):
+        from auth.api import apply_user_updates, stage_user_update, api_priority, PRIORITY_BULK
+        from utils.config import Config
+        from utils.directory import resolve_users, batched_store_writes
+        self.search("bulk")
+        users = resolve_users(self.at.session_state["user_query"])[:20] if "user_query" in self.at.session_state else []
+        if not users:
+            return
+        headers = {'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}", 'Content-Type': 'application/json'}
+        updates = {}
+        for user in users:
+            stage_user_update(updates, user.pk, attributes={"intro": f"load test {self.number}"})
+        start = time.perf_counter()
+        with api_priority(PRIORITY_BULK), batched_store_writes():
+            apply_user_updates(Config.AUTHENTIK_API_URL, headers, updates, {user.pk: user for user in users})
+        self.samples.append(("bulk", time.perf_counter() - start))
+
+    def create_user(self):
+        self._operation("create_user", "Create User")
+        self.created += 1
+        self.at.text_input(key="first_name_input").input(f"Load{self.number}")
+        self.at.text_input(key="last_name_input").input(f"Tester{self.created}")
+        self._rerun("create_user")  # on_change fills in the username
+        self._submit("create_user", "Submit")
+
+    def create_invite(self):
+        self._operation("create_invite", "Create Invite")
+        self.at.text_input(key="invite_label").input(f"load-{self.number}-{len(self.samples)}")
+        self._submit("create_invite", "Submit")
+
+    def run(self, deadline):
+        self._rerun("first_load")
+        names, weights = zip(*SCRIPTS.items())
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+
+
+def run_level(count, duration, seed, server):
+    base_rss = _rss_mb()
+    sessions = [Session(i, seed * 1000 + i) for i in range(count)]
+    server.requests.clear()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=session.run, args=(deadline,), name=f"session-{i}")
+               for i, session in enumerate(sessions)]
+    for thread in threads:
+        thread.start()
+    peak_rss = base_rss
+    while any(thread.is_alive() for thread in threads):
+        peak_rss = max(peak_rss, _rss_mb())
+        time.sleep(0.2)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    samples = [sample for session in sessions for sample in session.samples]
+    by_script = {}
+    for script, seconds in samples:
+        by_script.setdefault(script, []).append(seconds)
+    return {
+        "sessions": count,
+        "wall_s": round(wall, 2),
+        "reruns": len(samples),
+        "throughput_rps": round(len(samples) / wall, 2),
+        "cpu_cores": round(cpu / wall, 2),
+        "rss_mb": round(peak_rss, 1),
+        "rss_per_session_mb": round((peak_rss - base_rss) / count, 1),
+        "errors": sum(session.errors for session in sessions),
+        "authentik_requests": sum(server.requests.values()),
+        "rerun": _percentiles([seconds for _, seconds in samples]),
+        "by_script": {script: _percentiles(values) for script, values in sorted(by_script.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the Streamlit app.")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="Concurrency levels")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds per level")
+    parser.add_argument('--users', type=int, default=10000, help="Synthetic directory size")
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake Authentik latency per request (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    server = FakeAuthentik(users=generate_users(args.users, seed=args.seed), latency=args.latency, seed=args.seed).start()
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    os.environ.update(_env(server.env(), workdir, rate=1000))
+    os.environ["LOCAL_DB"] = os.path.join(workdir, "users.csv")
+    sys.path.insert(0, APP_DIR)
+    os.chdir(workdir)  # app.log and journals stay out of the repo
+
+    import logging
+    from utils.helpers import update_LOCAL_DB
+    update_LOCAL_DB()
+    logging.disable(logging.WARNING)
+
+    results = []
+    print(f"{'sessions':>8}{'reruns/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'cores':>7}{'MB/sess':>9}{'errors':>8}")
+    for count in args.sessions:
+        result = run_level(count, args.duration, args.seed, server)
+        results.append(result)
+        rerun = result['rerun']
+        print(f"{count:>8}{result['throughput_rps']:>10}{rerun.get('p50_ms', 0):>9}{rerun.get('p95_ms', 0):>9}"
+              f"{rerun.get('p99_ms', 0):>9}{result['cpu_cores']:>7}{result['rss_per_session_mb']:>9}{result['errors']:>8}")
+    server.stop()
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({"users": args.users, "latency": args.latency, "levels": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
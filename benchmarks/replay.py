@@ -0,0 +1,164 @@
+# benchmarks/replay.py
+# Record the app's HTTP traffic once, then replay it to time the client side alone.
+#
+# Usage:
+#   python benchmarks/replay.py --record traffic.jsonl --users 10000   # against the fake server
+#   python benchmarks/replay.py traffic.jsonl                          # replay at full speed
+#   python benchmarks/replay.py traffic.jsonl --latency 1              # with the recorded latency
+#
+# A cassette can also be recorded from a real deployment by running the app with
+# HTTP_CASSETTE=traffic.jsonl; only paths and query strings are matched on replay, so the
+# host does not matter. Tokens and passwords are redacted in the file (see auth/cassette.py).
+#
+# Each workload runs in a child process with the network replaced by the cassette, and
+# reports wall and CPU time (p50 over --repeat runs) plus the peak Python allocation of
+# one extra run under tracemalloc.
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_authentik import API, FakeAuthentik  # noqa: E402
+from synthetic import generate_users  # noqa: E402
+from run import _env  # noqa: E402
+
+WORKLOADS = ('sync', 'search', 'bulk_update', 'create_user')
+SEARCH_TERMS = ["john", "maria-g", "proton.me", "osint", "müller", "nosuchuser"]
+# Any host works on replay; this one fails loudly if something bypasses the cassette
+REPLAY_URL = "http://cassette.invalid"
+
+
+def _workload(name):
+    """The function for one workload, set up inside the child."""
+    from utils.config import Config
+    from utils.helpers import update_LOCAL_DB
+    from auth.api import (list_users, user_query_cache, apply_user_updates, stage_user_update, create_user,
+                          api_priority, PRIORITY_BULK)
+    from utils.directory import batched_store_writes, latest_snapshot
+
+    headers = {'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}", 'Content-Type': 'application/json'}
+    url = Config.AUTHENTIK_API_URL
+
+    if name == 'sync':
+        return update_LOCAL_DB
+    if name == 'search':
+        def search():
+            user_query_cache.clear()
+            for term in SEARCH_TERMS:
+                list_users(url, headers, term)
+        return search
+    if name == 'bulk_update':
+        update_LOCAL_DB()
+        snapshot = latest_snapshot()
+        selected = sorted(snapshot.users())[:200] if snapshot else []
+
+        def bulk_update():
+            updates = {}
+            for pk in selected:
+                stage_user_update(updates, pk, attributes={"intro": "replay"})
+            with api_priority(PRIORITY_BULK), batched_store_writes():
+                apply_user_updates(url, headers, updates, {pk: snapshot.get(pk) for pk in selected})
+        return bulk_update
+    if name == 'create_user':
+        numbers = itertools.count()
+
+        def create():
+            # Fresh names every pass, or the write journal would answer repeats without any work
+            for i in itertools.islice(numbers, 20):
+                create_user(f"replay-user{i}", f"Replay User{i}", f"replay{i}@example.org")
+        return create
+    raise SystemExit(f"Unknown workload {name}")
+
+
+def child(name, repeat):
+    import logging
+    logging.disable(logging.WARNING)
+    run = _workload(name)
+    if repeat == 0:  # recording: one pass is the traffic
+        run()
+        print(json.dumps({}))
+        return
+    wall, cpu = [], []
+    for _ in range(repeat):
+        start, start_cpu = time.perf_counter(), time.process_time()
+        run()
+        wall.append(time.perf_counter() - start)
+        cpu.append(time.process_time() - start_cpu)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    wall.sort()
+    cpu.sort()
+    print(json.dumps({"wall_ms": round(wall[len(wall) // 2] * 1000, 2), "cpu_ms": round(cpu[len(cpu) // 2] * 1000, 2),
+                      "peak_alloc_kb": round(peak / 1024, 1), "repeat": repeat}))
+
+
+def _spawn(name, env, workdir, repeat):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, "--repeat", str(repeat)],
+                          env=env, cwd=workdir, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def record(cassette, workloads, users, latency, seed):
+    if os.path.exists(cassette):
+        os.remove(cassette)
+    server = FakeAuthentik(users=generate_users(users, seed=seed), latency=latency, seed=seed).start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = _env(server.env(), workdir, rate=1000)
+            env.update({"HTTP_CASSETTE": cassette, "HTTP_CASSETTE_MODE": "record"})
+            for name in workloads:
+                _spawn(name, env, workdir, repeat=0)
+    finally:
+        server.stop()
+    with open(cassette) as file:
+        print(f"Recorded {sum(1 for _ in file)} exchanges to {cassette}")
+
+
+def replay(cassette, workloads, latency, repeat):
+    server_env = {"AUTHENTIK_API_URL": f"{REPLAY_URL}{API}", "SHLINK_URL": f"{REPLAY_URL}/rest/v3/short-urls",
+                  "WEBHOOK_URL": f"{REPLAY_URL}/webhook"}
+    print(f"{'workload':<16}{'wall ms':>10}{'cpu ms':>10}{'peak KB':>12}")
+    for name in workloads:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = _env(server_env, workdir, rate=1000)
+            env.update({"HTTP_CASSETTE": cassette, "HTTP_CASSETTE_MODE": "replay",
+                        "HTTP_REPLAY_LATENCY": str(latency)})
+            result = _spawn(name, env, workdir, repeat)
+        print(f"{name:<16}{result['wall_ms']:>10}{result['cpu_ms']:>10}{result['peak_alloc_kb']:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record HTTP traffic to a cassette or replay it to time the client side.")
+    parser.add_argument('cassette', nargs='?', help="Cassette file (JSONL)")
+    parser.add_argument('--record', action='store_true', help="Record a new cassette against the fake server")
+    parser.add_argument('--workload', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument('--users', type=int, default=10000, help="Synthetic directory size when recording")
+    parser.add_argument('--server-latency', type=float, default=0.0, help="Fake server latency when recording (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help="Replay latency scale: 0 full speed, 1 as recorded")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.repeat)
+    cassette = os.path.abspath(args.cassette)
+    if args.record:
+        return record(cassette, args.workload, args.users, args.server_latency, args.seed)
+    return replay(cassette, args.workload, args.latency, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
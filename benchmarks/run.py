@@ -0,0 +1,263 @@
+# benchmarks/run.py
+# Benchmark the app's hot paths against the local fake Authentik server.
+#
+# Usage:
+#   python benchmarks/run.py                                  # full suite
+#   python benchmarks/run.py --scenario sync search_local_db --sizes 1000 10000
+#   python benchmarks/run.py --label v1.4 --fail-on-regression
+#
+# Each scenario runs in a fresh child process so its peak RSS is its own. Results
+# (wall time, peak RSS, Authentik requests by endpoint) are appended to
+# benchmarks/history.jsonl together with the git commit, and compared with the
+# previous run of the same scenario and size.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..', 'app'))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_authentik import FakeAuthentik  # noqa: E402
+from synthetic import generate_users, most_common_base  # noqa: E402
+
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, 'history.jsonl')
+
+# Scenarios that scale with the directory size run at every --sizes value; the rest at --size
+SCALING = ('list_users', 'sync')
+SCENARIOS = ('list_users', 'sync', 'load_local_db', 'search_local_db', 'create_unique_username',
+             'user_metrics', 'bulk_update', 'bulk_delete')
+
+
+
+def directory(size, seed):
+    """The synthetic directory for a size; the same seed gives the same users every run."""
+    return generate_users(size, seed=seed)
+
+
+def _env(server_env, workdir, rate):
+    env = dict(os.environ)
+    # Required settings; values only need to be present
+    for key in ("AUTHENTIK_API_TOKEN", "MAIN_GROUP_ID", "BASE_DOMAIN", "FLOW_ID",
+                "SHLINK_API_TOKEN", "WEBHOOK_SECRET"):
+        env.setdefault(key, "benchmark")
+    env.update(server_env)
+    env.update({
+        "LOCAL_DB": os.path.join(workdir, "users.csv"),
+        "WRITE_JOURNAL": os.path.join(workdir, "write_journal.jsonl"),
+        "PENDING_OPS": os.path.join(workdir, "pending_ops.json"),
+        "WEBHOOK_ENABLED": "false",
+        "AUTHENTIK_RATE_LIMIT": str(rate),
+        "AUTHENTIK_RATE_BURST": str(rate),
+        "PYTHONPATH": APP_DIR,
+    })
+    return env
+
+
+def _timings(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+        "repeat": repeat,
+    }
+
+
+# Child side: import the app, set up, reset the server's counters, then time the scenario
+
+def child(scenario, repeat, stats_url, collide):
+    import logging
+    logging.disable(logging.WARNING)
+    from utils.config import Config
+    from utils.helpers import update_LOCAL_DB, load_LOCAL_DB, search_LOCAL_DB, create_unique_username
+    from auth.api import (list_users, user_query_cache, apply_user_updates, stage_user_update, delete_user,
+                          api_priority, PRIORITY_BULK)
+
+    headers = {'Authorization': f"Bearer {Config.AUTHENTIK_API_TOKEN}", 'Content-Type': 'application/json'}
+    url = Config.AUTHENTIK_API_URL
+
+    def setup_store():
+        update_LOCAL_DB()
+        from utils.directory import latest_snapshot
+        return latest_snapshot()
+
+    if scenario == 'list_users':
+        def run():
+            user_query_cache.clear()
+            return {"users": len(list_users(url, headers))}
+    elif scenario == 'sync':
+        def run():
+            update_LOCAL_DB()
+            return {"rows": len(load_LOCAL_DB())}
+    elif scenario == 'load_local_db':
+        setup_store()
+        def run():
+            return _timings(load_LOCAL_DB, repeat)
+    elif scenario == 'search_local_db':
+        setup_store()
+        queries = ["user-1", "example.org", "intro for", "no-such-user", ""]
+        def run():
+            return {query or "(all)": _timings(lambda: search_LOCAL_DB(query), repeat) for query in queries}
+    elif scenario == 'create_unique_username':
+        setup_store()
+        def run():
+            return {"base": collide, "result": create_unique_username(collide),
+                    **_timings(lambda: create_unique_username(collide), repeat)}
+    elif scenario == 'user_metrics':
+        # The Summary counts, as sync_LOCAL_DB takes them while users stream past
+        from utils.history import UserMetrics
+        users = list_users(url, headers)
+        def run():
+            return _timings(lambda: UserMetrics.of(users), repeat)
+    elif scenario in ('bulk_update', 'bulk_delete'):
+        # Mirrors display_user_list: staged merged PATCHes, sequential deletes, batched store writes
+        from utils.directory import batched_store_writes
+        snapshot = setup_store()
+        selected = [pk for pk in range(1, min(len(snapshot), 200) + 1) if pk in snapshot]
+        def run():
+            with api_priority(PRIORITY_BULK), batched_store_writes():
+                if scenario == 'bulk_delete':
+                    return {"deleted": sum(bool(delete_user(url, headers, pk)) for pk in selected[:50])}
+                updates = {}
+                for pk in selected:
+                    stage_user_update(updates, pk, is_active=False)
+                    stage_user_update(updates, pk, attributes={"intro": "benchmark"})
+                results = apply_user_updates(url, headers, updates, {pk: snapshot.get(pk) for pk in selected})
+                return {"updated": sum(1 for user in results.values() if user)}
+    else:
+        raise SystemExit(f"Unknown scenario {scenario}")
+
+    urllib.request.urlopen(urllib.request.Request(stats_url, method='POST')).read()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    extra = run()
+    wall = time.perf_counter() - start
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    requests = json.loads(urllib.request.urlopen(stats_url).read())
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    print(json.dumps({
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(rss_peak * scale / 2 ** 20, 1),
+        "setup_rss_mb": round(rss_before * scale / 2 ** 20, 1),
+        "requests": {f"{r['method']} {r['endpoint']} {r['status']}": r['count'] for r in requests},
+        "result": extra,
+    }))
+
+
+# Parent side: run the fake server, spawn one child per scenario, keep the history
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _previous(history_path, scenario, size):
+    last = None
+    if os.path.exists(history_path):
+        with open(history_path) as file:
+            for line in file:
+                record = json.loads(line)
+                if record['scenario'] == scenario and record['size'] == size:
+                    last = record
+    return last
+
+
+def run_scenario(scenario, size, args):
+    users = directory(size, args.seed)
+    server = FakeAuthentik(users=users, latency=args.latency).start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", scenario,
+                 "--repeat", str(args.repeat), "--stats-url", f"{server.url}/_stats",
+                 "--collide", most_common_base(users)],
+                env=_env(server.env(), workdir, args.rate), cwd=workdir, capture_output=True, text=True,
+            )
+    finally:
+        server.stop()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{scenario} at {size} users failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync, search and bulk-action hot paths.")
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Directory sizes for list_users and sync")
+    parser.add_argument('--size', type=int, default=10000, help="Directory size for the other scenarios")
+    parser.add_argument('--repeat', type=int, default=20, help="Samples for latency scenarios")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake server latency per request (s)")
+    parser.add_argument('--rate', type=float, default=1000, help="AUTHENTIK_RATE_LIMIT for the app")
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    parser.add_argument('--label', help="Tag for this run, e.g. a release")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Slowdown that counts as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic directory seed")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--collide', help=argparse.SUPPRESS)
+    parser.add_argument('--stats-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.repeat, args.stats_url, args.collide)
+
+    commit = _git_commit()
+    regressions = []
+    print(f"{'scenario':<24}{'size':>8}{'wall s':>10}{'peak MB':>10}{'requests':>10}  vs previous")
+    for scenario in args.scenario:
+        for size in (args.sizes if scenario in SCALING else [args.size]):
+            result = run_scenario(scenario, size, args)
+            previous = _previous(args.history, scenario, size)
+            record = {
+                "ts": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                "commit": commit,
+                "label": args.label,
+                "python": platform.python_version(),
+                "host": platform.node(),
+                "scenario": scenario,
+                "size": size,
+                "seed": args.seed,
+                "latency": args.latency,
+                **result,
+            }
+            with open(args.history, 'a') as file:
+                file.write(json.dumps(record) + "\n")
+
+            delta = ""
+            if previous and previous['wall_s']:
+                change = result['wall_s'] / previous['wall_s'] - 1
+                delta = f"{change:+.0%} wall, {result['peak_rss_mb'] - previous['peak_rss_mb']:+.1f} MB ({previous['commit']})"
+                if change > args.threshold:
+                    regressions.append(f"{scenario}@{size}")
+                    delta += "  REGRESSION"
+            print(f"{scenario:<24}{size:>8}{result['wall_s']:>10.3f}{result['peak_rss_mb']:>10.1f}"
+                  f"{sum(result['requests'].values()):>10}  {delta}")
+
+    if regressions:
+        print(f"Slower than the previous run by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# benchmarks/synthetic.py
+# Deterministic, Authentik-shaped user directories with realistic distributions.
+#
+# Usage:
+#   python benchmarks/synthetic.py --count 10000 --seed 7 --json users.json --local-db users.csv
+#
+# In code:
+#   users = generate_users(10000, seed=7)          # list of API-shaped dicts
+#   FakeAuthentik(users=users)                     # serve them
+#   write_local_db(users, "users.csv")             # or load them into the helpers.py store
+import argparse
+import json
+import os
+import random
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+# Fixed so the same seed always gives the same dates
+DEFAULT_NOW = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+# Ordered by frequency; names are drawn with a Zipf-like skew so common
+# bases (john-d, maria-g) collide the way they do in a real community
+FIRST_NAMES = [
+    "John", "Maria", "David", "Sarah", "Michael", "Anna", "James", "Laura", "Daniel", "Emma",
+    "Chris", "Jessica", "Alex", "Sam", "José", "Zoë", "Łukasz", "Søren", "Chloé", "Mateus",
+    "Björn", "Aoife", "Siobhán", "Nguyễn", "Đức", "Åsa", "Renée", "François", "Jürgen", "Ørjan",
+    "Ясмина", "Дмитрий", "Αλέξανδρος", "Мария", "李", "王芳", "さくら", "지민", "محمد", "Fatimah",
+    "Priya", "Arjun", "Oluwaseun", "Chidi", "Kwame", "Amara", "Tomás", "Inés", "Kaito", "Mei",
+]
+LAST_NAMES = [
+    "Doe", "Davis", "Garcia", "Smith", "Johnson", "Dubois", "Müller", "Nowak", "Kowalski", "Hansen",
+    "O'Brien", "Nguyen", "Tran", "Lefèvre", "Øvergård", "Šimić", "Çelik", "Yılmaz", "Ivanov", "Петров",
+    "Παπαδόπουλος", "Kim", "Park", "Tanaka", "Suzuki", "Chen", "Wang", "Okafor", "Mensah", "Silva",
+    "Pereira", "Rossi", "Bianchi", "Fernández", "López", "Schmidt", "Nakamura", "Singh", "Patel", "Haddad",
+]
+EMAIL_DOMAINS = ["gmail.com", "proton.me", "outlook.com", "yahoo.com", "fastmail.com", "example.org", "mail.ru", "gmx.de"]
+
+INTRO_FRAGMENTS = [
+    "I work in network engineering and run a small homelab.",
+    "Interested in RF, SDR and anything with an antenna.",
+    "Former infantry, now doing cloud security.",
+    "Mostly here to learn about OSINT and threat intel.",
+    "I build drones on weekends and break them on Sundays.",
+    "Software developer, Python and Rust, some embedded C.",
+    "Looking for study partners for the OSCP.",
+    "Came over from the Signal group after the last meetup.",
+    "Red team lead; happy to talk tooling and reporting.",
+    "Student in CS, interested in reverse engineering.",
+    "Ham radio operator, callsign on request. 73!",
+    "Je travaille dans la cybersécurité à Lyon.",
+    "Ich interessiere mich für Funktechnik und Linux.",
+    "Aficionado a la electrónica y la impresión 3D.",
+    "Hobbyist photographer and occasional CTF player 🏴‍☠️.",
+]
+
+
+_ZIPF_CACHE = {}
+
+
+def _zipf_weights(n, skew):
+    key = (n, skew)
+    if key not in _ZIPF_CACHE:
+        total = 0.0
+        cumulative = []
+        for rank in range(1, n + 1):
+            total += 1 / rank ** skew
+            cumulative.append(total)
+        _ZIPF_CACHE[key] = cumulative
+    return _ZIPF_CACHE[key]
+
+
+def _weighted_index(rng, n, skew=1.1):
+    """Zipf-like pick from 0..n-1: low indexes are much more common."""
+    return rng.choices(range(n), cum_weights=_zipf_weights(n, skew))[0]
+
+
+def _intro(rng):
+    # 1-5 sentences, roughly 50-450 characters
+    return " ".join(rng.sample(INTRO_FRAGMENTS, k=min(len(INTRO_FRAGMENTS), 1 + int(rng.expovariate(0.7)))))
+
+
+def _iso(moment):
+    return moment.isoformat().replace('+00:00', 'Z')
+
+
+def generate_users(count, seed=0, now=DEFAULT_NOW, years=4, external_share=0.15,
+                   intro_share=0.6, invited_share=0.7):
+    """Return count Authentik-shaped user dicts, identical for the same arguments.
+
+    - usernames follow the app's first-last_initial convention with numeric suffixes on
+      collision (john-d, john-d1, ...); names mix ASCII and Unicode scripts
+    - date_joined is skewed towards recent years (the community is growing)
+    - last_login is recent for most users, dormant for a long tail, never for some
+    - about 12% are inactive, more often among dormant accounts
+    - intro and invited_by attributes; inviters are earlier members with a few prolific ones
+    """
+    rng = random.Random(seed)
+    span = timedelta(days=365 * years)
+    start = now - span
+    taken = Counter()
+    users = []
+    inviters = []  # usernames, repeated once per invite so prolific inviters get picked more
+
+    # Join dates are generated first and sorted so pks increase with date_joined, as in Authentik
+    joined = sorted(start + span * (rng.random() ** 0.5) for _ in range(count))
+
+    for pk, date_joined in enumerate(joined, start=1):
+        first = FIRST_NAMES[_weighted_index(rng, len(FIRST_NAMES))]
+        last = LAST_NAMES[_weighted_index(rng, len(LAST_NAMES), skew=0.9)]
+        base = f"{first.lower()}-{last[0].lower()}".replace(" ", "-")
+        suffix = taken[base]
+        taken[base] += 1
+        username = base if suffix == 0 else f"{base}{suffix}"
+
+        tenure = now - date_joined
+        roll = rng.random()
+        if roll < 0.08:
+            last_login = None  # never finished onboarding
+            dormant = True
+        elif roll < 0.65:
+            last_login = now - min(tenure, timedelta(days=rng.expovariate(1 / 10)))
+            dormant = False
+        else:
+            last_login = now - tenure * rng.random()
+            dormant = now - last_login > timedelta(days=180)
+        is_active = rng.random() > (0.3 if dormant else 0.04)
+
+        attributes = {}
+        if rng.random() < intro_share:
+            attributes["intro"] = _intro(rng)
+        if inviters and rng.random() < invited_share:
+            inviter = rng.choice(inviters)
+            attributes["invited_by"] = inviter
+            inviters.append(inviter)
+        if rng.random() < 0.3:
+            inviters.append(username)
+
+        email_local = username.encode("ascii", "ignore").decode().strip("-") or f"user{pk}"
+        users.append({
+            "pk": pk,
+            "username": username,
+            "name": f"{first} {last}",
+            "email": "" if rng.random() < 0.03 else f"{email_local}@{rng.choice(EMAIL_DOMAINS)}",
+            "is_active": is_active,
+            "last_login": _iso(last_login) if last_login else None,
+            "date_joined": _iso(date_joined),
+            "is_superuser": False,
+            "groups": [],
+            "path": "users",
+            "type": "external" if rng.random() < external_share else "internal",
+            "uid": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "attributes": attributes,
+        })
+    return users
+
+
+def most_common_base(users):
+    """The username base with the most numbered variants, e.g. 'john-d'."""
+    bases = Counter(user['username'].rstrip('0123456789') for user in users)
+    return bases.most_common(1)[0][0]
+
+
+def to_user_records(users):
+    """Decode generated dicts into the app's User structs."""
+    sys.path.insert(0, APP_DIR)
+    import msgspec
+    from auth.models import User
+    return msgspec.convert(users, list[User])
+
+
+def write_local_db(users, path):
+    """Write generated users to a local DB file with the app's own writer."""
+    for key in ("AUTHENTIK_API_TOKEN", "MAIN_GROUP_ID", "BASE_DOMAIN", "FLOW_ID", "SHLINK_API_TOKEN",
+                "SHLINK_URL", "AUTHENTIK_API_URL", "WEBHOOK_URL", "WEBHOOK_SECRET"):
+        os.environ.setdefault(key, "synthetic")
+    os.environ["LOCAL_DB"] = path
+    records = to_user_records(users)
+    from utils.config import Config
+    from utils.helpers import write_LOCAL_DB
+    Config.LOCAL_DB = path
+    return write_LOCAL_DB(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Authentik user directory.")
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the users as a JSON list")
+    parser.add_argument('--local-db', help="Write the users to a local DB CSV")
+    args = parser.parse_args()
+
+    users = generate_users(args.count, seed=args.seed)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(users, file, ensure_ascii=False)
+    if args.local_db:
+        write_local_db(users, args.local_db)
+
+    active = sum(user['is_active'] for user in users)
+    print(f"{len(users)} users (seed {args.seed}): {active} active, "
+          f"{sum(user['type'] == 'external' for user in users)} external, "
+          f"{sum(user['last_login'] is None for user in users)} never logged in, "
+          f"{len({user['username'].rstrip('0123456789') for user in users})} username bases, "
+          f"most collisions on '{most_common_base(users)}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/user_memory.py
+# Compare memory per user for raw API dicts vs decoded User records.
+# Usage: python benchmarks/user_memory.py [user_count]
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from auth.models import decode_user_page  # noqa: E402
+
+
+def raw_user(i):
+    """An Authentik-shaped user with the fields the app ignores."""
+    return {
+        "pk": i,
+        "username": f"user-{i}",
+        "name": f"User Number {i}",
+        "is_active": i % 7 != 0,
+        "last_login": "2024-05-01T12:00:00.000000Z",
+        "date_joined": "2023-01-15T08:30:00.000000Z",
+        "is_superuser": False,
+        "groups": ["3f1c2b9e-8a2d-4c1e-9d7a-1234567890ab"],
+        "groups_obj": [{
+            "pk": "3f1c2b9e-8a2d-4c1e-9d7a-1234567890ab",
+            "num_pk": 1,
+            "name": "members",
+            "is_superuser": False,
+            "parent": None,
+            "parent_name": None,
+            "attributes": {},
+        }],
+        "email": f"user-{i}@example.org",
+        "avatar": "data:image/svg+xml;base64," + "A" * 400,
+        "attributes": {"intro": "Works on networks and radios. " * 3, "invited_by": "someone"},
+        "uid": "b" * 64,
+        "path": "users",
+        "type": "internal",
+        "uuid": "c0ffee00-0000-4000-8000-%012d" % i,
+    }
+
+
+def measure(label, build, count):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {current / count:>8.0f} B/user retained   {peak / count:>8.0f} B/user peak")
+    return data
+
+
+def main(count=10000):
+    body = json.dumps({"pagination": {"next": 0, "count": count},
+                       "results": [raw_user(i) for i in range(count)]}).encode()
+    print(f"{count} users, {len(body) / count:.0f} B/user on the wire")
+    measure("json dicts", lambda: json.loads(body)['results'], count)
+    measure("User records", lambda: decode_user_page(body).results, count)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,48 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [os.path.join(ROOT_DIR, 'app'), os.path.join(ROOT_DIR, 'benchmarks')]
+
+# Config is read at import time, so point every store at a scratch directory first
+WORKDIR = tempfile.mkdtemp(prefix='authentik-tests-')
+for key in ("AUTHENTIK_API_TOKEN", "MAIN_GROUP_ID", "BASE_DOMAIN", "FLOW_ID", "SHLINK_API_TOKEN",
+            "SHLINK_URL", "AUTHENTIK_API_URL", "WEBHOOK_URL", "WEBHOOK_SECRET"):
+    os.environ.setdefault(key, "test")
+os.environ.update({
+    "LOCAL_DB": os.path.join(WORKDIR, "users.csv"),
+    "WRITE_JOURNAL": os.path.join(WORKDIR, "write_journal.jsonl"),
+    "PENDING_OPS": os.path.join(WORKDIR, "pending_ops.json"),
+    "AUDIT_DB": os.path.join(WORKDIR, "audit.db"),
+    "EVENTS_DB": os.path.join(WORKDIR, "events.db"),
+    "METRICS_HISTORY_DB": os.path.join(WORKDIR, "metrics_history.db"),
+    "LIFECYCLE_REPORTS": os.path.join(WORKDIR, "lifecycle_runs.jsonl"),
+    "LOG_FILE": "",
+    "WEBHOOK_ENABLED": "false",
+    "AUTHENTIK_RATE_LIMIT": "1000",
+    "AUTHENTIK_RATE_BURST": "1000",
+})
+
+
+@pytest.fixture
+def fake_authentik():
+    """Start a fake Authentik server; call with the users (or a count) it should hold."""
+    from fake_authentik import FakeAuthentik
+    servers = []
+
+    def start(users=0, **options):
+        server = FakeAuthentik(users=users, **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def headers():
+    return {'Authorization': "Bearer test", 'Content-Type': 'application/json'}
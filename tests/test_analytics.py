@@ -0,0 +1,47 @@
+# tests/test_analytics.py
+import math
+import os
+from datetime import datetime, timezone
+import pytest
+from auth.events import EventStore
+from auth.models import Event, User
+from utils import analytics
+from utils.config import Config
+from utils.helpers import write_LOCAL_DB
+
+
+def _day(month, day=15):
+    """A UTC datetime in the month index month (year * 12 + month - 1)."""
+    return datetime(month // 12, month % 12 + 1, day, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def short_history(monkeypatch, tmp_path):
+    """Users who joined over the last 6 months, with logins stored for the last 2 only."""
+    now = analytics.current_month()
+    users = [User(pk=cohort * 100 + i, username=f"u{cohort}-{i}", date_joined=_day(cohort, 1).isoformat())
+             for cohort in range(now - 5, now + 1) for i in range(4)]
+    monkeypatch.setattr(Config, 'LOCAL_DB', os.path.join(tmp_path, "users.csv"))
+    write_LOCAL_DB(users)
+    store = EventStore(os.path.join(tmp_path, "events.db"))
+    store.append([Event(pk=f"{user.pk}-{month}", action="login", created=_day(month, 1).isoformat(),
+                        user={"pk": user.pk, "username": user.username})
+                  for month in (now - 1, now) for user in users if user.pk // 100 <= month])
+    monkeypatch.setattr(analytics, 'event_store', store)
+    monkeypatch.setattr(analytics, '_logins', None)
+    analytics._cache.clear()
+    return now
+
+
+def test_retention_is_unknown_before_the_first_stored_login(short_history):
+    now = short_history
+    matrix = analytics.retention_matrix(months=6)
+
+    for row, cohort in enumerate(range(now - 5, now + 1)):
+        for offset in range(6):
+            value = matrix.iloc[row][offset]
+            if cohort + offset > now or cohort + offset < now - 1:
+                assert math.isnan(value), (cohort, offset)
+            else:
+                assert value == 1.0, (cohort, offset)
+    assert list(matrix['users']) == [4] * 6
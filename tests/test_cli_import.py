@@ -0,0 +1,25 @@
+# tests/test_cli_import.py
+import csv
+import json
+import os
+from fake_authentik import API
+from utils.config import Config
+import cli
+
+
+def test_import_rejects_rows_without_email(fake_authentik, monkeypatch, tmp_path, capsys):
+    server = fake_authentik(0)
+    monkeypatch.setattr(Config, 'AUTHENTIK_API_URL', f"{server.url}{API}")
+    path = os.path.join(tmp_path, "new_users.csv")
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['username', 'name', 'email'])
+        writer.writeheader()
+        writer.writerow({"username": "alice", "name": "Alice", "email": "alice@example.org"})
+        writer.writerow({"username": "bob", "name": "Bob", "email": ""})
+
+    assert cli.main(['--json', 'import', path]) == 1
+
+    results = {r['requested']: r for r in json.loads(capsys.readouterr().out)}
+    assert results['bob'] == {"requested": "bob", "username": None, "pk": None, "password": None, "error": "no email"}
+    assert results['alice']['username'] == "alice"
+    assert sorted(user['email'] for user in server.users.values()) == ["alice@example.org"]
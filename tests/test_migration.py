@@ -0,0 +1,27 @@
+# tests/test_migration.py
+from fake_authentik import API, make_users
+from auth.migration import migrate_users
+
+
+def test_migration_changes_every_user_it_filters_on(fake_authentik, headers):
+    users = [dict(user, type="external") for user in make_users(2000)]
+    server = fake_authentik(users)
+
+    summary = migrate_users(f"{server.url}{API}", headers, {"type": "external"}, {"type": "internal"},
+                            concurrency=8)
+
+    assert summary["matched"] == 2000
+    assert summary["migrated"] == 2000
+    assert summary["failed"] == []
+    assert [pk for pk, user in server.users.items() if user["type"] == "external"] == []
+
+
+def test_dry_run_writes_nothing(fake_authentik, headers):
+    server = fake_authentik([dict(user, type="external") for user in make_users(50)])
+
+    summary = migrate_users(f"{server.url}{API}", headers, {"type": "external"}, {"type": "internal"},
+                            dry_run=True)
+
+    assert summary["matched"] == 50
+    assert summary["migrated"] == 0
+    assert all(user["type"] == "external" for user in server.users.values())
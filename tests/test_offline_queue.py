@@ -0,0 +1,47 @@
+# tests/test_offline_queue.py
+import os
+import time
+import pytest
+from fake_authentik import API
+from auth.breaker import breakers, CLOSED
+from auth.offline_queue import PendingOps, DONE
+from utils.config import Config
+
+
+@pytest.fixture
+def authentik_breaker(monkeypatch):
+    breaker = breakers['authentik']
+    monkeypatch.setattr(breaker, 'cooldown_seconds', 0.2)
+    yield breaker
+    with breaker.lock:
+        breaker.state = CLOSED
+        breaker.trial_in_flight = False
+        breaker.calls.clear()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_replay_probes_after_cooldown_without_other_traffic(fake_authentik, authentik_breaker, monkeypatch, tmp_path):
+    server = fake_authentik(10)
+    monkeypatch.setattr(Config, 'AUTHENTIK_API_URL', f"{server.url}{API}")
+    queue = PendingOps(os.path.join(tmp_path, "pending_ops.json"))
+    queue.enqueue('delete_user', {"user_id": 5}, "delete user-5")
+    authentik_breaker._open(time.monotonic())
+
+    queue.replay_in_background()
+    assert queue.pending_count() == 1  # Still cooling down: nothing is tried
+
+    time.sleep(0.3)
+    queue.replay_in_background()
+
+    assert _wait_for(lambda: queue.pending_count() == 0)
+    assert [op['state'] for op in queue.list()] == [DONE]
+    assert 5 not in server.users
+    assert authentik_breaker.status()['state'] == CLOSED